@@ -1,9 +1,32 @@
-from flask import Flask, redirect, request, jsonify, send_from_directory, make_response # 移除了 session
-from neo4j import GraphDatabase, basic_auth
+from flask import Flask, redirect, request, jsonify, send_from_directory, make_response, g, has_request_context # 移除了 session
+from flask.logging import default_handler as flask_default_log_handler
+from neo4j import GraphDatabase, basic_auth, unit_of_work
+from neo4j.exceptions import Neo4jError
 from neo4j.graph import Relationship, Node
+import atexit
+import copy
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import logging.handlers
+import math
 import os
+import queue
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv # 保留 dotenv
 import mimetypes
+from werkzeug.exceptions import NotFound
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_cors import CORS
 
@@ -34,22 +57,269 @@ NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.environ.get("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "neo4j_password") # 请确保这里是你的实际密码
 # 从环境变量中获取前端URL
+# 托管事务遇到瞬时错误时，驱动自动重试的最长总时间（秒）
+NEO4J_TX_RETRY_SECONDS = float(os.environ.get("NEO4J_TX_RETRY_SECONDS", "10"))
+# 按标签/关系类型生成的语句文本与执行统计中记录的语句文本各自最多保留的条数（LRU）
+CYPHER_STATEMENT_CACHE_SIZE = int(os.environ.get("CYPHER_STATEMENT_CACHE_SIZE", "1000"))
 FRONTEND_URL = os.getenv('FRONTEND_PUBLIC_URL')
 if not FRONTEND_URL:
     # 如果环境变量没有设置，给一个默认值或抛出错误，防止应用在配置不正确时运行
     raise ValueError("FRONTEND_PUBLIC_URL environment variable not set!")
 
+# --- 日志配置 ---
+# LOG_LEVEL: 日志级别; LOG_FORMAT: json 或 text; LOG_FILE: 日志文件（为空时输出到 stderr）;
+# LOG_SAMPLE_RATE: 高频请求日志的采样比例; LOG_QUEUE_SIZE: 日志队列长度，队列满时丢弃新记录。
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_FILE = os.environ.get("LOG_FILE", "")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# --- 后台任务配置 ---
+# JOB_WORKERS: 后台任务线程数; DELETE_BATCH_SIZE: 分批删除时每个事务删除的关系数;
+# HUB_DELETE_THRESHOLD: 节点关系数超过该值时，删除操作转为后台任务。
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+DELETE_BATCH_SIZE = int(os.environ.get("DELETE_BATCH_SIZE", "1000"))
+HUB_DELETE_THRESHOLD = int(os.environ.get("HUB_DELETE_THRESHOLD", "500"))
+JOB_HISTORY_LIMIT = int(os.environ.get("JOB_HISTORY_LIMIT", "200"))
+
+# --- 内存图副本配置 ---
+# GRAPH_REPLICA_ENABLED: 是否在进程内维护图副本并由其直接响应读接口;
+# GRAPH_REPLICA_RECONCILE_SECONDS: 全量重新加载（修正带外修改）的间隔;
+# GRAPH_REPLICA_COMPACT_THRESHOLD: 增量写入达到该数量后重建 CSR。
+GRAPH_REPLICA_ENABLED = os.environ.get("GRAPH_REPLICA_ENABLED", "false").lower() == "true"
+GRAPH_REPLICA_RECONCILE_SECONDS = int(os.environ.get("GRAPH_REPLICA_RECONCILE_SECONDS", "300"))
+GRAPH_REPLICA_COMPACT_THRESHOLD = int(os.environ.get("GRAPH_REPLICA_COMPACT_THRESHOLD", "1000"))
+
+# --- 路径查找配置 ---
+# PATH_DEFAULT_DEPTH/PATH_MAX_DEPTH: 默认与允许的最大路径跳数; PATH_MAX_K: 最多返回的路径条数;
+# PATH_MAX_EXPANDED_NODES/PATH_TIME_LIMIT_MS: 单次查询展开节点数与耗时的硬上限;
+# PATH_CACHE_SIZE: 按图版本缓存的查询结果条数。
+PATH_DEFAULT_DEPTH = int(os.environ.get("PATH_DEFAULT_DEPTH", "6"))
+PATH_MAX_DEPTH = int(os.environ.get("PATH_MAX_DEPTH", "10"))
+PATH_MAX_K = int(os.environ.get("PATH_MAX_K", "5"))
+PATH_MAX_EXPANDED_NODES = int(os.environ.get("PATH_MAX_EXPANDED_NODES", "5000"))
+PATH_TIME_LIMIT_MS = int(os.environ.get("PATH_TIME_LIMIT_MS", "2000"))
+PATH_CACHE_SIZE = int(os.environ.get("PATH_CACHE_SIZE", "1024"))
+
+# --- 图版本配置 ---
+# GRAPH_VERSION_TTL_SECONDS: 图版本号保存在 Neo4j 中，进程内复用最近读取值的时长（秒）；
+# 其他进程的写入最多在这段时间后被本进程看到。
+GRAPH_VERSION_TTL_SECONDS = float(os.environ.get("GRAPH_VERSION_TTL_SECONDS", "1"))
+
+# --- 学生视图快照配置 ---
+# SNAPSHOT_ENABLED: 是否在写入后生成图谱快照文件; SNAPSHOT_DIR: 快照目录（可交给 Nginx 等直接托管）;
+# SNAPSHOT_DEBOUNCE_SECONDS: 合并连续写入的等待时间; SNAPSHOT_KEEP_VERSIONS: 保留的历史版本数。
+SNAPSHOT_ENABLED = os.environ.get("SNAPSHOT_ENABLED", "false").lower() == "true"
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+SNAPSHOT_DEBOUNCE_SECONDS = float(os.environ.get("SNAPSHOT_DEBOUNCE_SECONDS", "2"))
+SNAPSHOT_KEEP_VERSIONS = int(os.environ.get("SNAPSHOT_KEEP_VERSIONS", "3"))
+
+# --- 图统计配置 ---
+# STATS_ENABLED: 是否维护增量统计; STATS_RECOUNT_SECONDS: 全量重算（修正偏差）的间隔。
+STATS_ENABLED = os.environ.get("STATS_ENABLED", "true").lower() == "true"
+STATS_RECOUNT_SECONDS = int(os.environ.get("STATS_RECOUNT_SECONDS", "600"))
+
+# --- 字段投影配置 ---
+# NODE_SUMMARY_FIELDS: fields=summary 时节点保留的属性（id 与 labels 总会保留）;
+# NODE_DETAIL_BATCH_LIMIT: 批量获取节点详情时一次允许的最大节点数。
+NODE_SUMMARY_FIELDS = tuple(f.strip() for f in os.environ.get("NODE_SUMMARY_FIELDS", "name,title,init").split(",") if f.strip())
+NODE_DETAIL_BATCH_LIMIT = int(os.environ.get("NODE_DETAIL_BATCH_LIMIT", "200"))
+
+# --- 准入控制配置 ---
+# ADMISSION_ENABLED: 是否按查询类别限制并发; ADMISSION_QUEUE_WAIT_SECONDS: 请求排队等待的最长时间;
+# ADMISSION_<类别>_CONCURRENCY/_QUEUE/_TIMEOUT: 各类别（init/heavy/light/write）的并发数、
+# 等待队列长度与 Neo4j 事务超时（秒）。队列已满或等待超时的请求立即返回 503 + Retry-After。
+# init 类别只服务 LTI 启动后加载的初始图谱，与全图等重查询分开计数，启动高峰不会被全图请求挤掉。
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_QUEUE_WAIT_SECONDS = float(os.environ.get("ADMISSION_QUEUE_WAIT_SECONDS", "5"))
+ADMISSION_INIT_CONCURRENCY = int(os.environ.get("ADMISSION_INIT_CONCURRENCY", "4"))
+ADMISSION_INIT_QUEUE = int(os.environ.get("ADMISSION_INIT_QUEUE", "64"))
+ADMISSION_INIT_TIMEOUT = float(os.environ.get("ADMISSION_INIT_TIMEOUT", "15"))
+ADMISSION_HEAVY_CONCURRENCY = int(os.environ.get("ADMISSION_HEAVY_CONCURRENCY", "2"))
+ADMISSION_HEAVY_QUEUE = int(os.environ.get("ADMISSION_HEAVY_QUEUE", "8"))
+ADMISSION_HEAVY_TIMEOUT = float(os.environ.get("ADMISSION_HEAVY_TIMEOUT", "30"))
+ADMISSION_LIGHT_CONCURRENCY = int(os.environ.get("ADMISSION_LIGHT_CONCURRENCY", "8"))
+ADMISSION_LIGHT_QUEUE = int(os.environ.get("ADMISSION_LIGHT_QUEUE", "64"))
+ADMISSION_LIGHT_TIMEOUT = float(os.environ.get("ADMISSION_LIGHT_TIMEOUT", "5"))
+ADMISSION_WRITE_CONCURRENCY = int(os.environ.get("ADMISSION_WRITE_CONCURRENCY", "4"))
+ADMISSION_WRITE_QUEUE = int(os.environ.get("ADMISSION_WRITE_QUEUE", "32"))
+ADMISSION_WRITE_TIMEOUT = float(os.environ.get("ADMISSION_WRITE_TIMEOUT", "15"))
+
+
+# --- 日志 ---
+# 描述: 日志记录在调用线程中只做入队（不格式化、不做 I/O），由后台 QueueListener 线程
+#       负责格式化并写出；高频的成功请求日志按 LOG_SAMPLE_RATE 采样；
+#       每个请求结束时输出一行带耗时的汇总记录。
+
+# 在高频路径的日志调用中传入 extra=SAMPLED，使其参与采样
+SAMPLED = {"sampled": True}
+
+_REQUEST_FIELDS = ("request_id", "method", "path", "endpoint", "status", "duration_ms", "bytes", "timings")
+
+
+class JsonLogFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON，附带请求上下文字段（如果有）。"""
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for field in _REQUEST_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """在调用线程中给日志记录附加当前请求的 request_id（只取一个属性，开销很小）。"""
+    def filter(self, record):
+        if not hasattr(record, "request_id") and has_request_context():
+            record.request_id = g.get("request_id")
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """对标记为 sampled 的低级别记录按比例采样；WARNING 及以上级别总是保留。"""
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+def _copy_log_value(value):
+    if isinstance(value, (dict, list, set)):
+        return value.copy()
+    return value
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把原始记录放入队列的 QueueHandler：不在调用线程中格式化消息，
+    队列满时直接丢弃并计数，不会阻塞请求线程。
+    入队的是记录的浅拷贝，其中 dict/list/set 类型的参数和 timings 也各复制一层，
+    这样调用方在记录之后修改这些对象不会改变后台线程格式化出的内容。
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if isinstance(record.args, dict):
+            record.args = _copy_log_value(record.args)
+        elif record.args:
+            record.args = tuple(_copy_log_value(arg) for arg in record.args)
+        if getattr(record, "timings", None) is not None:
+            record.timings = dict(record.timings)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging():
+    """
+    主要功能: 为 app.logger 安装非阻塞的队列日志管线。
+    工作逻辑: app.logger -> (RequestContextFilter, SamplingFilter) -> NonBlockingQueueHandler -> 队列
+              -> QueueListener 后台线程 -> 输出处理器（LOG_FILE 或 stderr，JSON 或文本格式）。
+    返回:
+        NonBlockingQueueHandler: 入队处理器（可读取 dropped 计数）。
+    影响: 移除 Flask 默认的同步日志处理器；启动日志后台线程并在进程退出时刷新。
+          werkzeug 的日志也改走同一队列，并只保留 WARNING 及以上级别：
+          逐请求的访问日志已由请求汇总日志取代，不再同步写 stderr。
+    """
+    if LOG_FILE:
+        output = logging.handlers.WatchedFileHandler(LOG_FILE, encoding="utf-8")
+    else:
+        output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonLogFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    app.logger.removeHandler(flask_default_log_handler)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(LOG_LEVEL)
+    app.logger.propagate = False
+
+    werkzeug_logger = logging.getLogger("werkzeug")
+    werkzeug_logger.addHandler(handler)
+    werkzeug_logger.setLevel(logging.WARNING)
+    werkzeug_logger.propagate = False
+    return handler
+
+
+log_queue_handler = configure_logging()
+
+
+def add_request_timing(name, seconds):
+    """在当前请求的汇总日志中累加一项耗时（例如数据库时间）；不在请求上下文中时忽略。"""
+    if has_request_context():
+        timings = g.setdefault("timings", {})
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+
+
+@app.after_request
+def log_request_summary(response):
+    """每个请求输出一行汇总：方法、路由、状态码、总耗时、响应大小以及各项分段耗时。"""
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    timings = {name: round(ms, 2) for name, ms in g.get("timings", {}).items()}
+    level = logging.WARNING if response.status_code >= 500 else logging.INFO
+    app.logger.log(level, "%s %s %s %.1fms", request.method, request.path, response.status_code, duration_ms,
+                   extra={
+                       "method": request.method,
+                       "path": request.path,
+                       "endpoint": request.endpoint,
+                       "status": response.status_code,
+                       "duration_ms": duration_ms,
+                       "bytes": response.calculate_content_length(),
+                       "timings": timings or None,
+                   })
+    response.headers["X-Request-ID"] = g.request_id
+    return response
+
 
 # --- Neo4j Driver 初始化 ---
 # 描述: 创建一个全局的 Neo4j driver 实例用于后续的数据库会话。
 # 参数: NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
 # 影响: 应用启动时会尝试连接 Neo4j。
 try:
-    driver = GraphDatabase.driver(NEO4J_URI, auth=basic_auth(NEO4J_USER, NEO4J_PASSWORD))
+    driver = GraphDatabase.driver(NEO4J_URI, auth=basic_auth(NEO4J_USER, NEO4J_PASSWORD),
+                                  max_transaction_retry_time=NEO4J_TX_RETRY_SECONDS)
     driver.verify_connectivity() # 应用启动时验证连接
     app.logger.info("Successfully connected to Neo4j.")
 except Exception as e:
-    app.logger.error(f"Failed to connect to Neo4j: {e}", exc_info=True)
+    app.logger.error("Failed to connect to Neo4j: %s", e, exc_info=True)
     driver = None # 标记 driver 无效
 
 def get_db_session():
@@ -64,6 +334,549 @@ def get_db_session():
         raise ConnectionError("Neo4j driver not initialized or connection failed.")
     return driver.session()
 
+# --- Cypher 查询层 ---
+# 描述: 所有数据库访问都通过这里的固定语句集合执行。
+#       - 语句文本固定且完全参数化（属性通过 $props 整体传入），Neo4j 只需为每条语句规划一次；
+#         只有标签和关系类型无法参数化，它们先经 validate_identifier 校验，再生成按名称缓存的语句。
+#       - 读/写分别走 session.execute_read / execute_write（托管事务），
+#         瞬时错误（死锁、集群切换等）由驱动按 NEO4J_TX_RETRY_SECONDS 自动重试。
+#       - 每个写事务在提交前递增 (:GraphMeta) 节点上的图版本号，版本号与数据一起提交（见 GraphVersion）；
+#         GraphMeta 节点不出现在图谱、标签列表和统计中，GraphMeta 也不能作为标签使用。
+#       - 每条语句的执行次数、首条记录可用前耗时（规划 + 启动执行）与流式读取耗时
+#         都记录在 query_metrics 中，通过 /api/metrics 查看。
+#       - 标签来自客户端请求，生成的语句与 query_metrics 记录的语句文本都只按 LRU 保留
+#         CYPHER_STATEMENT_CACHE_SIZE 条，任意标签的请求不会让内存无限增长。
+
+CYPHER = {
+    # 读取
+    "init_nodes": "MATCH (n) WHERE n.init = '1' OR n.init = 1 RETURN n",
+    "all_nodes": "MATCH (n) WHERE NOT n:GraphMeta RETURN n",
+    "neighbourhood": """
+        MATCH (start_n)-[r]-(end_n)
+        WHERE elementId(start_n) IN $node_ids
+        RETURN r, start_n, end_n
+    """,
+    "expand": """
+        MATCH (startNode)-[r]-(neighbor)
+        WHERE elementId(startNode) = $node_id
+        RETURN
+          elementId(r) AS rel_id,
+          type(r) AS rel_type,
+          properties(r) AS rel_props,
+          elementId(startNode) AS source_id,
+          elementId(neighbor) AS neighbor_id,
+          labels(neighbor) AS neighbor_labels,
+          properties(neighbor) AS neighbor_props
+    """,
+    "labels": "CALL db.labels() YIELD label WHERE label <> 'GraphMeta' RETURN label",
+    "node_exists": "MATCH (n) WHERE elementId(n) = $id RETURN count(n) > 0 AS exists",
+    "node_degree": """
+        MATCH (n) WHERE elementId(n) = $node_id
+        RETURN COUNT { (n)--() } AS degree
+    """,
+    "existing_node_ids": "MATCH (n) WHERE elementId(n) IN $ids RETURN elementId(n) AS id",
+    "nodes_by_id": "MATCH (n) WHERE elementId(n) IN $ids RETURN n",
+    "relationships_by_id": "MATCH ()-[r]->() WHERE elementId(r) IN $ids RETURN r",
+    "path_adjacency": """
+        MATCH (n)-[r]-(m)
+        WHERE elementId(n) IN $ids AND ($rel_types IS NULL OR type(r) IN $rel_types)
+        RETURN elementId(n) AS node_id, elementId(r) AS rel_id, elementId(m) AS neighbor_id
+    """,
+    "dump_nodes": "MATCH (n) WHERE NOT n:GraphMeta RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props",
+    "dump_relationships": """
+        MATCH (a)-[r]->(b)
+        RETURN elementId(r) AS id, elementId(a) AS source, elementId(b) AS target,
+               type(r) AS type, properties(r) AS props
+    """,
+    "count_nodes": """
+        MATCH (n) WHERE NOT n:GraphMeta
+        RETURN elementId(n) AS id, labels(n) AS labels, coalesce(n.name, n.title) AS name
+    """,
+    # 图版本（见 GraphVersion）
+    "graph_version": "MATCH (m:GraphMeta {id: 'graph'}) RETURN m.epoch + '-' + toString(m.version) AS version",
+    "count_relationships": """
+        MATCH (a)-[r]->(b)
+        RETURN elementId(r) AS id, elementId(a) AS source, elementId(b) AS target, type(r) AS type
+    """,
+    # 写入
+    "bump_graph_version": """
+        MERGE (m:GraphMeta {id: 'graph'})
+        ON CREATE SET m.epoch = randomUUID(), m.version = 0
+        SET m.version = m.version + 1
+        RETURN m.epoch + '-' + toString(m.version) AS version
+    """,
+    "graph_meta_constraint": "CREATE CONSTRAINT graph_meta_id IF NOT EXISTS FOR (m:GraphMeta) REQUIRE m.id IS UNIQUE",
+    "update_node": "MATCH (n) WHERE elementId(n) = $node_id SET n += $props RETURN n",
+    "delete_node": "MATCH (n) WHERE elementId(n) = $node_id DETACH DELETE n RETURN count(n) AS deleted",
+    "delete_relationship": "MATCH ()-[r]->() WHERE elementId(r) = $rel_id DELETE r RETURN count(r) AS deleted",
+    "delete_relationship_batch": """
+        MATCH (n)-[r]-() WHERE elementId(n) = $node_id
+        WITH DISTINCT r LIMIT $batch_size
+        WITH r, elementId(r) AS rel_id
+        DELETE r
+        RETURN collect(rel_id) AS deleted_ids
+    """,
+}
+
+# 含标签/关系类型的语句模板，{name} 处填入经过校验的标识符
+CYPHER_TEMPLATES = {
+    "search_nodes": "MATCH (n:{name}) WHERE toLower(n[$property]) CONTAINS toLower($keyword) RETURN n",
+    "create_node": "CREATE (n:{name}) SET n = $props RETURN n",
+    "create_relationship": """
+        MATCH (a) WHERE elementId(a) = $source_id
+        MATCH (b) WHERE elementId(b) = $target_id
+        CREATE (a)-[r_new:{name}]->(b) SET r_new = $props
+        RETURN r_new, a, b
+    """,
+}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# 应用内部使用的标签，不允许客户端读写
+RESERVED_IDENTIFIERS = frozenset({"GraphMeta"})
+_templated_statements = OrderedDict()
+_templated_statements_lock = threading.Lock()
+
+
+def validate_identifier(value, kind):
+    """
+    主要功能: 校验将被拼接进 Cypher 的标签或关系类型。
+    参数:
+        value (str): 标签或关系类型。
+        kind (str): 用于错误信息，例如 "label"。
+    返回: 校验通过的 value。
+    影响: 不合法或为保留名称（RESERVED_IDENTIFIERS）时抛出 ValueError（路由将其转换为 HTTP 400）。
+    """
+    if not isinstance(value, str) or not _IDENTIFIER_RE.match(value):
+        raise ValueError(f"Invalid {kind}: {value!r}. Only letters, digits and underscores are allowed.")
+    if value in RESERVED_IDENTIFIERS:
+        raise ValueError(f"Invalid {kind}: {value!r} is reserved.")
+    return value
+
+
+def cypher_statement(name, identifier=None):
+    """返回命名语句的文本；模板语句按 (名称, 标识符) 做 LRU 缓存，保证相同输入得到完全相同的文本。"""
+    if identifier is None:
+        return CYPHER[name]
+    key = (name, identifier)
+    with _templated_statements_lock:
+        statement = _templated_statements.get(key)
+        if statement is not None:
+            _templated_statements.move_to_end(key)
+            return statement
+    statement = CYPHER_TEMPLATES[name].replace("{name}", validate_identifier(identifier, "identifier"))
+    with _templated_statements_lock:
+        _templated_statements[key] = statement
+        while len(_templated_statements) > CYPHER_STATEMENT_CACHE_SIZE:
+            _templated_statements.popitem(last=False)
+    return statement
+
+
+class QueryMetrics:
+    """
+    主要功能: 按语句名称汇总执行统计。
+    工作逻辑: Neo4j 的结果摘要提供 result_available_after（规划 + 开始执行到首条记录可用）与
+              result_consumed_after（流式读取全部记录）两段时间。
+              本进程看不到 Neo4j 的计划缓存：缓存在服务端、由所有客户端共享，并且可能被淘汰。
+              这里只统计语句文本是否已被本进程执行过（最近 CYPHER_STATEMENT_CACHE_SIZE 条文本内）：
+              statement_reuse_rate 为重复文本的执行占比，反映语句文本是否足够固定，
+              是计划缓存命中率的上限而不是命中率本身；first_seen_* 与 repeat_* 的首条记录耗时之差
+              可以粗略看出规划的开销。
+    """
+    def __init__(self, max_texts=CYPHER_STATEMENT_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._by_name = {}
+        self._seen_texts = OrderedDict()
+        self._max_texts = max_texts
+
+    def record(self, name, text, wall_ms, available_ms, consumed_ms):
+        with self._lock:
+            first = text not in self._seen_texts
+            if first:
+                self._seen_texts[text] = None
+                if len(self._seen_texts) > self._max_texts:
+                    self._seen_texts.popitem(last=False)
+            else:
+                self._seen_texts.move_to_end(text)
+            m = self._by_name.setdefault(name, {
+                "executions": 0, "first_seen_executions": 0, "wall_ms": 0.0,
+                "available_after_ms": 0.0, "first_seen_available_after_ms": 0.0, "consumed_after_ms": 0.0,
+            })
+            m["executions"] += 1
+            m["wall_ms"] += wall_ms
+            m["available_after_ms"] += available_ms or 0
+            m["consumed_after_ms"] += consumed_ms or 0
+            if first:
+                m["first_seen_executions"] += 1
+                m["first_seen_available_after_ms"] += available_ms or 0
+
+    def snapshot(self):
+        with self._lock:
+            statements = {}
+            executions = first_seen = 0
+            for name, m in sorted(self._by_name.items()):
+                n, f = m["executions"], m["first_seen_executions"]
+                executions += n
+                first_seen += f
+                repeat = n - f
+                statements[name] = {
+                    "executions": n,
+                    "first_seen_executions": f,
+                    "mean_wall_ms": round(m["wall_ms"] / n, 3),
+                    "mean_available_after_ms": round(m["available_after_ms"] / n, 3),
+                    "mean_consumed_after_ms": round(m["consumed_after_ms"] / n, 3),
+                    "mean_first_seen_available_after_ms": round(m["first_seen_available_after_ms"] / f, 3) if f else None,
+                    "mean_repeat_available_after_ms": round((m["available_after_ms"] - m["first_seen_available_after_ms"]) / repeat, 3) if repeat else None,
+                }
+            return {
+                "distinct_statement_texts": len(self._seen_texts),
+                "executions": executions,
+                "statement_reuse_rate": round(1 - first_seen / executions, 4) if executions else None,
+                "statements": statements,
+            }
+
+
+query_metrics = QueryMetrics()
+
+
+class QueryRunner:
+    """在一个托管事务内按名称执行语句，并记录每条语句的统计。"""
+    def __init__(self, tx):
+        self._tx = tx
+
+    def run(self, name, identifier=None, **params):
+        """执行命名语句并返回全部记录（list）。"""
+        text = cypher_statement(name, identifier)
+        started = time.perf_counter()
+        result = self._tx.run(text, params)
+        records = list(result)
+        summary = result.consume()
+        wall_ms = (time.perf_counter() - started) * 1000
+        query_metrics.record(name, text, wall_ms,
+                             getattr(summary, "result_available_after", None),
+                             getattr(summary, "result_consumed_after", None))
+        return records
+
+    def single(self, name, identifier=None, **params):
+        records = self.run(name, identifier, **params)
+        return records[0] if records else None
+
+
+def _execute(access_mode, work, timeout):
+    """access_mode: "read"、"write"（同时递增图版本号）或 "schema"（写事务，不递增版本号）。"""
+    def transaction_function(tx):
+        q = QueryRunner(tx)
+        result = work(q)
+        if access_mode == "write":
+            return result, q.single("bump_graph_version")["version"]
+        return result, None
+    # 未显式指定时，使用当前请求所属查询类别的超时
+    if timeout is None and has_request_context():
+        timeout = g.get("query_timeout")
+    if timeout:
+        transaction_function = unit_of_work(timeout=timeout)(transaction_function)
+
+    started = time.perf_counter()
+    try:
+        with get_db_session() as session:
+            if access_mode == "read":
+                result, version = session.execute_read(transaction_function)
+            else:
+                result, version = session.execute_write(transaction_function)
+    except Neo4jError as e:
+        if "TransactionTimedOut" in (e.code or "") and has_request_context() and g.get("admission"):
+            admission.record_query_timeout(g.admission[0])
+        raise
+    finally:
+        add_request_timing("db", time.perf_counter() - started)
+    if version is not None:
+        graph_version.observe(version)
+        _last_write.version = version
+    return result
+
+
+_last_write = threading.local()
+
+
+def last_write_version():
+    """当前线程最近一次写事务提交时的图版本号；record_graph_change 用它标记变更。"""
+    return getattr(_last_write, "version", None)
+
+
+def read_transaction(work, timeout=None):
+    """
+    主要功能: 在一个只读托管事务中执行 work(q)，q 为 QueryRunner。
+    参数:
+        work (callable): 接收 QueryRunner 并返回结果的函数；瞬时错误时可能被重试多次，
+                         因此不应有事务之外的副作用。
+        timeout (float, 可选): 事务超时时间（秒），传给 Neo4j 服务端。
+    返回: work 的返回值。
+    """
+    return _execute("read", work, timeout)
+
+
+def write_transaction(work, timeout=None):
+    """与 read_transaction 相同，但在写事务中执行；提交时图版本号随之递增。"""
+    return _execute("write", work, timeout)
+
+
+def query_read(name, identifier=None, timeout=None, **params):
+    """在单独的只读事务中执行一条命名语句，返回全部记录。"""
+    return read_transaction(lambda q: q.run(name, identifier, **params), timeout)
+
+
+def query_write(name, identifier=None, timeout=None, **params):
+    """在单独的写事务中执行一条命名语句，返回全部记录。"""
+    return write_transaction(lambda q: q.run(name, identifier, **params), timeout)
+
+
+# --- 准入控制 ---
+# 描述: 按查询类别（init: 初始图谱; heavy: 全图/搜索/路径; light: 展开/标签; write: 写操作）
+#       分别限制并发，使少数大查询无法占满所有工作线程和连接池中的 Neo4j 连接。
+#       - 达到并发上限的请求进入该类别的优先级队列，数值小的优先；
+#       - 队列已满时，新请求若比队列中最差的等待者优先，则挤出该等待者（它收到 503），否则自身被拒绝；
+#       - 队列已满或等待超过 ADMISSION_QUEUE_WAIT_SECONDS 时返回 503 和 Retry-After；
+#       - 被准入的请求的数据库事务使用该类别的超时（经 _execute 传给 Neo4j）。
+#       内存图副本就绪时读接口不访问数据库，快照存在时快照接口直接发送文件，这两种情况不占用名额。
+
+# 端点 -> (查询类别, 优先级)
+ADMISSION_ROUTES = {
+    "get_full_graph_data": ("init", 0),  # init=false 时为 ("heavy", 2)，见 classify_request
+    "get_graph_snapshot": ("init", 0),  # 全图快照为 ("heavy", 2)；仅在回退为实时构建时需要准入
+    "search_subgraph": ("heavy", 1),
+    "find_path": ("heavy", 1),
+    "expand_node": ("light", 1),
+    "get_node_labels": ("light", 1),
+    "get_node_detail": ("light", 1),
+    "get_node_details_batch": ("light", 1),
+    "create_new_node": ("write", 1),
+    "update_existing_node": ("write", 1),
+    "delete_existing_node": ("write", 1),
+    "create_new_relationship": ("write", 1),
+    "delete_existing_relationship": ("write", 1),
+}
+
+# 副本就绪时直接由副本响应、无需准入的端点
+REPLICA_SERVED_ENDPOINTS = {"get_full_graph_data", "get_graph_snapshot", "search_subgraph", "find_path",
+                            "expand_node", "get_node_detail", "get_node_details_batch"}
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入（队列已满或排队超时）。retry_after 为建议的重试等待秒数。"""
+    def __init__(self, query_class, reason, retry_after):
+        super().__init__(f"{query_class} queries are overloaded ({reason})")
+        self.query_class = query_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "event", "granted", "evicted")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.evicted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class QueryClassLimiter:
+    """
+    主要功能: 单个查询类别的并发限制与优先级等待队列。
+    工作逻辑: 有空闲名额且无人排队时直接准入；否则按 (优先级, 到达顺序) 进入堆，
+              释放名额时直接移交给堆顶的等待者。队列已满时，优先级更高的新请求挤出
+              最差的等待者（优先级最低、到达最晚），被挤出者以 queue_full 拒绝。
+              Retry-After 按平均占用时长与排队长度估算。
+    """
+    def __init__(self, name, concurrency, queue_size, query_timeout, wait_seconds):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.query_timeout = query_timeout
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._seq = 0
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.evicted = 0
+        self.rejected_timeout = 0
+        self.query_timeouts = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self._avg_hold = None
+
+    def _retry_after(self):
+        hold = self._avg_hold or 1.0
+        return max(1, math.ceil(hold * (len(self._waiters) + 1) / self.concurrency))
+
+    def acquire(self, priority):
+        """获取一个名额，返回排队等待的秒数；无法准入时抛出 AdmissionRejected。"""
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return 0.0
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq)
+            if len(self._waiters) >= self.queue_size:
+                worst = max(self._waiters, default=None)
+                if worst is None or not waiter < worst:
+                    self.rejected_full += 1
+                    raise AdmissionRejected(self.name, "queue_full", self._retry_after())
+                self._waiters.remove(worst)
+                heapq.heapify(self._waiters)
+                worst.evicted = True
+                worst.event.set()
+                self.rejected_full += 1
+                self.evicted += 1
+            heapq.heappush(self._waiters, waiter)
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+        started = time.perf_counter()
+        waiter.event.wait(self.wait_seconds)
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.total_wait += waited
+            # 名额的移交与挤出都在锁内完成，因此这里读到的 granted/evicted 是确定的
+            if waiter.evicted:
+                raise AdmissionRejected(self.name, "queue_full", self._retry_after())
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self.rejected_timeout += 1
+                raise AdmissionRejected(self.name, "queue_timeout", self._retry_after())
+            self.admitted += 1
+        return waited
+
+    def release(self, held_seconds):
+        with self._lock:
+            self._avg_hold = held_seconds if self._avg_hold is None else 0.8 * self._avg_hold + 0.2 * held_seconds
+            if self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.active -= 1
+
+    def record_query_timeout(self):
+        with self._lock:
+            self.query_timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "query_timeout_seconds": self.query_timeout,
+                "active": self.active,
+                "waiting": len(self._waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected_queue_full": self.rejected_full,
+                "evicted_from_queue": self.evicted,
+                "rejected_queue_timeout": self.rejected_timeout,
+                "query_timeouts": self.query_timeouts,
+                "mean_queue_wait_ms": round(self.total_wait / self.queued * 1000, 2) if self.queued else None,
+                "mean_hold_ms": round(self._avg_hold * 1000, 2) if self._avg_hold is not None else None,
+            }
+
+
+class AdmissionController:
+    """按类别名称管理 QueryClassLimiter，并根据请求端点决定类别与优先级。"""
+    def __init__(self, limiters):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    def classify_request(self):
+        """返回 (类别, 优先级)；不需要准入控制的请求返回 None。"""
+        route = ADMISSION_ROUTES.get(request.endpoint)
+        if route is None:
+            return None
+        if request.endpoint in REPLICA_SERVED_ENDPOINTS and graph_replica.ready:
+            return None
+        query_class, priority = route
+        if request.endpoint == "get_full_graph_data" and request.args.get('init', 'true').lower() != 'true':
+            query_class, priority = "heavy", 2
+        elif request.endpoint == "get_graph_snapshot":
+            kind = request.view_args.get("kind")
+            if kind not in SnapshotWriter.KINDS or request_snapshot_file(kind):
+                return None
+            query_class, priority = snapshot_query_class(kind)
+        return query_class, priority
+
+    def acquire(self, query_class, priority):
+        return self.limiters[query_class].acquire(priority)
+
+    def release(self, query_class, held_seconds):
+        self.limiters[query_class].release(held_seconds)
+
+    def query_timeout(self, query_class):
+        return self.limiters[query_class].query_timeout
+
+    def record_query_timeout(self, query_class):
+        self.limiters[query_class].record_query_timeout()
+
+    def snapshot(self):
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+admission = AdmissionController([
+    QueryClassLimiter("init", ADMISSION_INIT_CONCURRENCY, ADMISSION_INIT_QUEUE,
+                      ADMISSION_INIT_TIMEOUT, ADMISSION_QUEUE_WAIT_SECONDS),
+    QueryClassLimiter("heavy", ADMISSION_HEAVY_CONCURRENCY, ADMISSION_HEAVY_QUEUE,
+                      ADMISSION_HEAVY_TIMEOUT, ADMISSION_QUEUE_WAIT_SECONDS),
+    QueryClassLimiter("light", ADMISSION_LIGHT_CONCURRENCY, ADMISSION_LIGHT_QUEUE,
+                      ADMISSION_LIGHT_TIMEOUT, ADMISSION_QUEUE_WAIT_SECONDS),
+    QueryClassLimiter("write", ADMISSION_WRITE_CONCURRENCY, ADMISSION_WRITE_QUEUE,
+                      ADMISSION_WRITE_TIMEOUT, ADMISSION_QUEUE_WAIT_SECONDS),
+])
+
+
+@app.before_request
+def admit_request():
+    """为访问数据库的请求获取所属类别的名额；无法准入时直接返回 503。"""
+    if not ADMISSION_ENABLED:
+        return None
+    decision = admission.classify_request()
+    if decision is None:
+        return None
+    return admit(*decision)
+
+
+def admit(query_class, priority):
+    """
+    为当前请求获取 query_class 的名额，并设置 g.admission 与 g.query_timeout（由 release_admission 释放）。
+    返回: 无法准入时返回 503 响应，否则返回 None。
+    """
+    try:
+        waited = admission.acquire(query_class, priority)
+    except AdmissionRejected as rejected:
+        response = jsonify({"error": "Server is busy, please retry later.",
+                            "query_class": rejected.query_class, "reason": rejected.reason})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(rejected.retry_after)
+        return response
+    g.admission = (query_class, time.perf_counter())
+    g.query_timeout = admission.query_timeout(query_class)
+    add_request_timing("queue", waited)
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    admitted = g.pop("admission", None)
+    if admitted:
+        query_class, started = admitted
+        admission.release(query_class, time.perf_counter() - started)
+
+
 # --- 辅助函数 ---
 
 def serialize_node_for_cytoscape(node):
@@ -82,23 +895,96 @@ def serialize_node_for_cytoscape(node):
         app.logger.warning("serialize_node_for_cytoscape: Received a None node object.")
         return None # 或者根据需要处理
 
+    return build_node_element(str(node.element_id), list(node.labels), dict(node.items()))
+
+
+def build_node_element(node_id, labels, properties):
+    """
+    主要功能: 由节点的 elementId、标签列表和属性字典构建 Cytoscape 节点元素。
+    工作逻辑: 与 serialize_node_for_cytoscape 相同的规则，供不持有 Neo4j Node
+              对象的调用方（如内存图副本）复用。如果缺少 'name' 或 'title'，
+              则使用第一个标签或 "Node" 作为默认显示名称。
+    参数:
+        node_id (str): 节点 elementId。
+        labels (list): 标签列表。
+        properties (dict): 节点属性。
+    返回:
+        dict: 包含 {"data": {...node_attributes...}} 的字典。
+    """
     node_data = {
-        "id": str(node.element_id),
-        "labels": list(node.labels)
+        "id": node_id,
+        "labels": list(labels)
     }
     # 复制节点属性
-    for key in node.keys():
-        node_data[key] = node[key]
+    node_data.update(properties)
     
     if 'name' not in node_data and 'title' not in node_data:
-        if node.labels:
-            node_data['name'] = list(node.labels)[0]
+        if labels:
+            node_data['name'] = labels[0]
         else:
             node_data['name'] = "Node" # 默认名称
             
     return {"data": node_data}
 
 
+def build_relationship_element(rel_id, source_id, target_id, rel_type, properties):
+    """
+    主要功能: 由关系的各个字段构建 Cytoscape 边元素，格式与
+              serialize_relationship_for_cytoscape 的返回值一致。
+    """
+    return {
+        "data": {
+            "id": rel_id,
+            "source": source_id,
+            "target": target_id,
+            "label": rel_type,
+            **properties
+        }
+    }
+
+
+def requested_node_fields():
+    """
+    主要功能: 解析读接口的 fields 查询参数。
+    工作逻辑:
+        - 缺省或 fields=all: 返回 None，表示节点携带全部属性（与原有行为一致）。
+        - fields=summary: 只保留 NODE_SUMMARY_FIELDS 中的属性（渲染所需）。
+        - fields=a,b,c: 只保留列出的属性。
+    返回:
+        tuple | None: 需要保留的节点属性名。
+    """
+    fields = request.args.get('fields', '').strip()
+    if not fields or fields == 'all':
+        return None
+    if fields == 'summary':
+        return NODE_SUMMARY_FIELDS
+    return tuple(f.strip() for f in fields.split(',') if f.strip())
+
+
+def project_graph_payload(payload, fields):
+    """
+    主要功能: 按 fields 裁剪响应中节点的属性，长文本等属性留给 /api/nodes/<id> 按需获取。
+    工作逻辑: 每个节点只保留 id、labels 与 fields 中存在的属性；边与其他字段原样保留。
+              总是生成新的字典，不修改传入的 payload（它可能来自副本或缓存）。
+    参数:
+        payload (dict): 含 "nodes" 列表的响应数据。
+        fields (tuple | None): 需要保留的属性；None 时原样返回。
+    返回:
+        dict: 裁剪后的响应数据。
+    """
+    if fields is None:
+        return payload
+    projected_nodes = []
+    for element in payload.get("nodes", []):
+        data = element["data"]
+        node_data = {"id": data["id"], "labels": data.get("labels", [])}
+        for key in fields:
+            if key in data:
+                node_data[key] = data[key]
+        projected_nodes.append({"data": node_data})
+    return {**payload, "nodes": projected_nodes}
+
+
 def serialize_relationship_for_cytoscape(rel):
     """
     主要功能: 将 Neo4j 关系对象转换为 Cytoscape.js 前端兼容的字典格式。
@@ -116,12 +1002,12 @@ def serialize_relationship_for_cytoscape(rel):
 
     if not hasattr(rel, 'start_node') or rel.start_node is None or \
        not hasattr(rel.start_node, 'element_id') or not rel.start_node.element_id:
-        app.logger.error(f"serialize_relationship_for_cytoscape: Relationship (element_id: {getattr(rel, 'element_id', 'N/A')}) has invalid start_node or start_node.element_id.")
+        app.logger.error("serialize_relationship_for_cytoscape: Relationship (element_id: %s) has invalid start_node or start_node.element_id.", getattr(rel, 'element_id', 'N/A'))
         raise ValueError("Relationship has invalid start_node information.")
 
     if not hasattr(rel, 'end_node') or rel.end_node is None or \
        not hasattr(rel.end_node, 'element_id') or not rel.end_node.element_id:
-        app.logger.error(f"serialize_relationship_for_cytoscape: Relationship (element_id: {getattr(rel, 'element_id', 'N/A')}) has invalid end_node or end_node.element_id.")
+        app.logger.error("serialize_relationship_for_cytoscape: Relationship (element_id: %s) has invalid end_node or end_node.element_id.", getattr(rel, 'element_id', 'N/A'))
         raise ValueError("Relationship has invalid end_node information.")
 
     properties = {}
@@ -129,17 +1015,10 @@ def serialize_relationship_for_cytoscape(rel):
         for key in rel.keys():
             properties[key] = rel[key]
     except Exception as e_props:
-        app.logger.warning(f"serialize_relationship_for_cytoscape: Could not access relationship properties for rel (element_id: {getattr(rel, 'element_id', 'N/A')}). Error: {e_props}")
+        app.logger.warning("serialize_relationship_for_cytoscape: Could not access relationship properties for rel (element_id: %s). Error: %s", getattr(rel, 'element_id', 'N/A'), e_props)
 
-    return {
-        "data": {
-            "id": str(rel.element_id),
-            "source": str(rel.start_node.element_id),
-            "target": str(rel.end_node.element_id),
-            "label": rel.type,
-            **properties
-        }
-    }
+    return build_relationship_element(str(rel.element_id), str(rel.start_node.element_id),
+                                      str(rel.end_node.element_id), rel.type, properties)
 
 
 
@@ -150,8 +1029,6 @@ def is_student_role(roles_str, ext_roles_str=None):
         roles_str (str): LTI 'roles' 参数的值 (逗号分隔的字符串)。
         ext_roles_str (str, 可选): LTI 'ext_roles' 参数的值 (逗号分隔的字符串)。
     """
-    app.logger.info(f"Role_Debug: Input roles_str: '{roles_str}'")
-    app.logger.info(f"Role_Debug: Input ext_roles_str: '{ext_roles_str}'")
 
     raw_roles = []
     if roles_str:
@@ -160,7 +1037,7 @@ def is_student_role(roles_str, ext_roles_str=None):
         raw_roles.extend([r.strip().lower() for r in ext_roles_str.split(',') if r.strip()])
     
     unique_roles = sorted(list(set(raw_roles))) # 去重并排序，方便查看和调试
-    app.logger.info(f"Role_Debug: All unique roles (lowercase): {unique_roles}")
+    app.logger.debug("Role_Debug: roles_str=%r ext_roles_str=%r unique roles: %s", roles_str, ext_roles_str, unique_roles)
 
     # 初始化权限和角色标志
     is_admin = False
@@ -218,17 +1095,17 @@ def is_student_role(roles_str, ext_roles_str=None):
     if is_admin:
         effective_role = "Administrator"
         can_edit = True # 管理员通常有所有权限
-        app.logger.info("Role_Debug: User identified as Administrator.")
+        app.logger.debug("Role_Debug: User identified as Administrator.")
         return False
     elif is_instructor:
         effective_role = "Instructor"
         can_edit = True # 教师有编辑权限
-        app.logger.info("Role_Debug: User identified as Instructor.")
+        app.logger.debug("Role_Debug: User identified as Instructor.")
         return False
     elif is_student:
         effective_role = "Student"
         can_edit = False # 学生默认只读 (根据你的需求)
-        app.logger.info("Role_Debug: User identified as Student.")
+        app.logger.debug("Role_Debug: User identified as Student.")
         return True
     # else:
     #     # 如果上面主要角色都没匹配上，可以检查是否是普通用户等
@@ -255,6 +1132,1421 @@ def is_student_role(roles_str, ext_roles_str=None):
     # app.logger.info(f"Role_Debug: Determined permissions: {permissions}")
     # return permissions
 
+# --- 后台任务 ---
+
+class BackgroundJob:
+    """
+    主要功能: 记录一个后台长任务（如分批删除枢纽节点）的状态、进度与错误。
+    工作逻辑: 由 JobRunner 创建并在工作线程中更新；to_dict() 生成供
+              /api/jobs/<job_id> 返回的快照，并据已处理数量计算吞吐量。
+    参数:
+        kind (str): 任务类型，例如 "delete_node"。
+        params (dict): 任务参数，原样回显给调用方。
+    影响: 实例在多个线程间共享，所有状态修改都在 _lock 内完成。
+    """
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued" # queued -> running -> succeeded / failed
+        self.total = None
+        self.processed = 0
+        self.batches = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def mark_running(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+
+    def mark_finished(self, error=None):
+        with self._lock:
+            self.status = "failed" if error else "succeeded"
+            self.error = error
+            self.finished_at = time.time()
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def advance(self, count):
+        """记录一个已提交批次处理的条目数。"""
+        with self._lock:
+            self.processed += count
+            self.batches += 1
+
+    @property
+    def is_finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = (end - self.started_at) if self.started_at else 0.0
+            progress = None
+            if self.total:
+                progress = round(min(self.processed / self.total, 1.0), 4)
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "total": self.total,
+                "processed": self.processed,
+                "batches": self.batches,
+                "progress": progress,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobRunner:
+    """
+    主要功能: 在固定大小的线程池中执行后台长任务，并保存最近任务的状态。
+    工作逻辑: submit() 创建 BackgroundJob 并交给线程池执行；任务函数的签名为
+              func(job, **params)，通过 job.set_total()/job.advance() 汇报进度。
+              任务抛出的异常会被捕获并记录为失败，不会影响工作线程。
+              传入 key 时，同一 key 同时只会有一个未结束的任务，重复提交返回已有任务。
+              只保留最近 history_limit 个已结束的任务。
+    参数:
+        max_workers (int): 工作线程数。
+        history_limit (int): 保留的已结束任务数量上限。
+    影响: 创建常驻的工作线程。它们不是 daemon 线程，解释器退出时会等待正在执行的任务结束。
+    """
+    def __init__(self, max_workers, history_limit):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kg-job")
+        self._history_limit = history_limit
+        self._jobs = OrderedDict()
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, key=None, **params):
+        """提交任务并返回 (job, created)；key 对应的任务尚未结束时不再提交，created 为 False。"""
+        with self._lock:
+            existing = self._active_by_key.get(key) if key is not None else None
+            if existing is not None and not existing.is_finished:
+                return existing, False
+            job = BackgroundJob(kind, params)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active_by_key[key] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, key)
+        app.logger.info("Job %s (%s) queued with params %s", job.id, kind, params)
+        return job, True
+
+    def active(self, key):
+        """返回 key 对应的未结束任务，没有时返回 None。"""
+        with self._lock:
+            job = self._active_by_key.get(key)
+            return job if job is not None and not job.is_finished else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, key):
+        job.mark_running()
+        try:
+            func(job, **job.params)
+        except Exception as e:
+            app.logger.error("Job %s (%s) failed: %s", job.id, job.kind, e, exc_info=True)
+            job.mark_finished(error=str(e))
+        else:
+            job.mark_finished()
+            app.logger.info("Job %s (%s) finished: %s items in %s batches", job.id, job.kind, job.processed, job.batches)
+        finally:
+            if key is not None:
+                with self._lock:
+                    if self._active_by_key.get(key) is job:
+                        del self._active_by_key[key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self._history_limit)]:
+            del self._jobs[job_id]
+
+
+job_runner = JobRunner(max_workers=JOB_WORKERS, history_limit=JOB_HISTORY_LIMIT)
+
+
+def count_node_relationships(node_id):
+    """
+    主要功能: 统计节点的关系数（度）。
+    返回: int 关系数；节点不存在时返回 None。
+    """
+    record = read_transaction(lambda q: q.single("node_degree", node_id=node_id))
+    return record["degree"] if record else None
+
+
+def delete_node_in_batches(job, node_id, batch_size):
+    """
+    主要功能: 后台任务函数，分多个事务删除一个（枢纽）节点。
+    工作逻辑: 每个写事务最多删除 batch_size 条关系，直到关系删完，
+              最后在单独的事务中删除节点本身。每个批次提交后更新任务进度，
+              避免一个巨大的 DETACH DELETE 事务长时间占用内存和连接。
+    参数:
+        job (BackgroundJob): 当前任务，用于汇报进度。
+        node_id (str): 要删除节点的 elementId。
+        batch_size (int): 每个事务删除的关系数上限。
+    影响: 对数据库进行多次写操作。
+    """
+    degree = count_node_relationships(node_id)
+    if degree is None:
+        raise LookupError(f"Node {node_id} not found")
+    job.set_total(degree + 1)
+
+    while True:
+        deleted_ids = write_transaction(lambda q: q.single(
+            "delete_relationship_batch", node_id=node_id, batch_size=batch_size)["deleted_ids"])
+        for rel_id in deleted_ids:
+            record_graph_change("relationship_delete", id=rel_id)
+        if deleted_ids:
+            job.advance(len(deleted_ids))
+        if len(deleted_ids) < batch_size:
+            break
+
+    # 使用 DETACH 兜底：分批删除期间可能有新的关系被创建
+    job.advance(write_transaction(lambda q: q.single("delete_node", node_id=node_id)["deleted"]))
+    record_graph_change("node_delete", id=node_id)
+
+
+# --- 图版本 ---
+
+class GraphVersion:
+    """
+    主要功能: 图数据版本号，保存在 Neo4j 的 (:GraphMeta {id: 'graph'}) 节点上。
+    工作逻辑:
+        - 每个写事务在提交前递增 GraphMeta.version（见 _execute），版本号与数据一起提交，
+          连接同一数据库的所有进程看到同一个版本序列；
+        - 版本号形如 "<epoch>-<version>"，epoch 在 GraphMeta 创建时随机生成，
+          数据库清空重建后旧版本号不会与新版本号混淆；尚无 GraphMeta 时版本号为 "0"；
+        - current 在 ttl 秒内复用最近的值，过期后读取一次 Neo4j；本进程的写事务提交后
+          立即 observe() 新版本号，因此本进程总能看到自己的写入；
+        - 绕过 API 的修改（例如在 Neo4j Browser 中编辑）不会更新 GraphMeta，
+          由副本对账与统计重算发现差异后调用 bump()。
+    参数:
+        ttl (float): 复用最近读取值的时长（秒）。
+    影响: 用作按版本缓存结果的键。所有写事务都更新同一个 GraphMeta 节点，因此写事务在该节点上串行提交。
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._value = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(version):
+        """把 "<epoch>-<version>" 拆成 (epoch, int)；"0" 解析为 ("", 0)。"""
+        epoch, _, counter = version.rpartition("-")
+        return epoch, int(counter) if counter.isdigit() else 0
+
+    def observe(self, version):
+        """记录从 Neo4j 得到的版本号；同一 epoch 下不会退回到更早的版本（并发写入的提交顺序可能与返回顺序不同）。"""
+        with self._lock:
+            if self._value is not None:
+                epoch, counter = self.parse(version)
+                current_epoch, current_counter = self.parse(self._value)
+                if epoch == current_epoch and counter < current_counter:
+                    version = self._value
+            self._value = version
+            self._checked = time.monotonic()
+
+    def bump(self):
+        """在一个只更新 GraphMeta 的写事务中递增版本号，返回新版本号。"""
+        write_transaction(lambda q: None)
+        return self.current
+
+    @property
+    def current(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._checked < self.ttl:
+                return self._value
+        try:
+            record = read_transaction(lambda q: q.single("graph_version"))
+        except Exception as e:
+            app.logger.warning("Could not read graph version from Neo4j: %s", e)
+            with self._lock:
+                return self._value or "0"
+        self.observe(record["version"] if record else "0")
+        with self._lock:
+            return self._value
+
+
+graph_version = GraphVersion(GRAPH_VERSION_TTL_SECONDS)
+
+
+class VersionTracker:
+    """
+    主要功能: 记录一份进程内派生数据（图副本、图统计）反映到了哪个图版本。
+    工作逻辑:
+        - reset() 在全量加载后记下加载时读到的版本号；
+        - advance() 在应用一个带版本号的变更后调用。只有连续的版本号才会推进：
+          中间缺少的版本来自其他进程的写入（或尚未应用的本进程写入），
+          此时 covers() 对更新的版本返回 False，调用方据此判断需要重新加载；
+          先到的更高版本暂存起来，缺口补齐后一并推进。
+    影响: 非线程安全，由调用方在自己的锁内使用。
+    """
+    def __init__(self):
+        self.version = None
+        self._ahead = set()
+
+    def reset(self, version):
+        self.version = version
+        self._ahead = set()
+
+    def advance(self, version):
+        if version is None or self.version is None:
+            return
+        epoch, counter = GraphVersion.parse(version)
+        current_epoch, current = self._parse_tracked(epoch)
+        # 不同 epoch 说明数据库被重建，covers() 会判定落后并触发重新加载
+        if epoch != current_epoch or counter <= current:
+            return
+        self._ahead.add(counter)
+        while current + 1 in self._ahead:
+            current += 1
+            self._ahead.discard(current)
+        self.version = f"{epoch}-{current}"
+
+    def covers(self, version):
+        """已反映的版本不早于 version 时返回 True。"""
+        if self.version is None:
+            return False
+        epoch, counter = GraphVersion.parse(version)
+        current_epoch, current = self._parse_tracked(epoch)
+        return epoch == current_epoch and current >= counter
+
+    def _parse_tracked(self, epoch):
+        current_epoch, current = GraphVersion.parse(self.version)
+        # "0"（加载时还没有 GraphMeta 节点）等同于第一次写入所创建 epoch 的 0 号版本
+        if not current_epoch and current == 0:
+            current_epoch = epoch
+        return current_epoch, current
+
+
+def ensure_graph_meta_constraint():
+    """为 GraphMeta.id 建立唯一约束，避免多个进程同时首次写入时创建出多个 GraphMeta 节点。"""
+    try:
+        _execute("schema", lambda q: q.run("graph_meta_constraint"), None)
+    except Exception as e:
+        app.logger.warning("Could not create GraphMeta constraint: %s", e)
+
+
+# --- 内存图副本 ---
+
+def _is_init_value(value):
+    """与 Cypher 条件 n.init = '1' OR n.init = 1 等价的 Python 判断。"""
+    if isinstance(value, bool):
+        return False
+    return value == '1' or (isinstance(value, (int, float)) and value == 1)
+
+
+class _ReplicaState:
+    """
+    主要功能: 内存图副本的一份完整数据，采用 CSR（压缩稀疏行）邻接结构。
+    工作逻辑:
+        - 节点与关系都用连续整数下标表示，elementId -> 下标 通过 node_index/edge_index 查找。
+        - 标签集合与关系类型被驻留(intern)到 label_sets/rel_types 表中，
+          每个节点/关系只保存一个小整数。
+        - offsets/adjacency 两个 array 组成无向 CSR：节点 i 的关联关系下标位于
+          adjacency[offsets[i]:offsets[i+1]]。
+        - 构建之后的写入不重建 CSR，而是记录为增量：新增关系放在 extra_adjacency，
+          删除只清除 node_alive/edge_alive 标志。增量过多时由 GraphReplica 压缩重建。
+    影响: 非线程安全，由 GraphReplica 的锁保护。
+    """
+    def __init__(self):
+        self.label_sets = []
+        self.label_set_index = {}
+        self.rel_types = []
+        self.rel_type_index = {}
+
+        self.node_ids = []
+        self.node_index = {}
+        self.node_labels = array('I')
+        self.node_props = []
+        self.node_alive = bytearray()
+
+        self.edge_ids = []
+        self.edge_index = {}
+        self.edge_src = array('I')
+        self.edge_dst = array('I')
+        self.edge_type = array('I')
+        self.edge_props = []
+        self.edge_alive = bytearray()
+
+        self.offsets = array('I', [0])
+        self.adjacency = array('I')
+        self.csr_node_count = 0
+        self.extra_adjacency = {}
+        self.delta_count = 0
+
+    @classmethod
+    def build(cls, nodes, relationships):
+        """
+        由节点与关系的记录构建一份新的 CSR 数据。
+        nodes: 可迭代的 (element_id, labels, properties)。
+        relationships: 可迭代的 (element_id, source_id, target_id, type, properties)，
+                       端点不存在的关系会被忽略。
+        """
+        state = cls()
+        for node_id, labels, props in nodes:
+            state._append_node(node_id, labels, props)
+
+        degree = [0] * len(state.node_ids)
+        for rel_id, source_id, target_id, rel_type, props in relationships:
+            src = state.node_index.get(source_id)
+            dst = state.node_index.get(target_id)
+            if src is None or dst is None:
+                continue
+            state._append_edge(rel_id, src, dst, rel_type, props)
+            degree[src] += 1
+            degree[dst] += 1
+
+        offsets = array('I', [0]) * (len(degree) + 1)
+        running = 0
+        for i, d in enumerate(degree):
+            offsets[i] = running
+            running += d
+        offsets[len(degree)] = running
+
+        adjacency = array('I', [0]) * running
+        cursor = array('I', offsets)
+        for e in range(len(state.edge_ids)):
+            for endpoint in (state.edge_src[e], state.edge_dst[e]):
+                adjacency[cursor[endpoint]] = e
+                cursor[endpoint] += 1
+
+        state.offsets = offsets
+        state.adjacency = adjacency
+        state.csr_node_count = len(degree)
+        return state
+
+    def _intern_labels(self, labels):
+        key = tuple(sys.intern(label) for label in labels)
+        index = self.label_set_index.get(key)
+        if index is None:
+            index = len(self.label_sets)
+            self.label_sets.append(key)
+            self.label_set_index[key] = index
+        return index
+
+    def _intern_type(self, rel_type):
+        index = self.rel_type_index.get(rel_type)
+        if index is None:
+            index = len(self.rel_types)
+            self.rel_types.append(sys.intern(rel_type))
+            self.rel_type_index[rel_type] = index
+        return index
+
+    def _append_node(self, node_id, labels, props):
+        index = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.node_index[node_id] = index
+        self.node_labels.append(self._intern_labels(labels))
+        self.node_props.append({sys.intern(k): v for k, v in props.items()})
+        self.node_alive.append(1)
+        return index
+
+    def _append_edge(self, rel_id, src, dst, rel_type, props):
+        index = len(self.edge_ids)
+        self.edge_ids.append(rel_id)
+        self.edge_index[rel_id] = index
+        self.edge_src.append(src)
+        self.edge_dst.append(dst)
+        self.edge_type.append(self._intern_type(rel_type))
+        self.edge_props.append({sys.intern(k): v for k, v in props.items()})
+        self.edge_alive.append(1)
+        return index
+
+    # --- 读取 ---
+
+    def incident_edges(self, node):
+        """按下标遍历节点所有存活的关联关系下标（自环会出现两次，与 Cypher 无向匹配一致）。"""
+        if node < self.csr_node_count:
+            adjacency = self.adjacency
+            for k in range(self.offsets[node], self.offsets[node + 1]):
+                e = adjacency[k]
+                if self.edge_alive[e]:
+                    yield e
+        for e in self.extra_adjacency.get(node, ()):
+            if self.edge_alive[e]:
+                yield e
+
+    def other_end(self, edge, node):
+        src = self.edge_src[edge]
+        return self.edge_dst[edge] if src == node else src
+
+    def labels_of(self, node):
+        return self.label_sets[self.node_labels[node]]
+
+    def live_nodes(self):
+        alive = self.node_alive
+        return (i for i in range(len(self.node_ids)) if alive[i])
+
+    def node_element(self, node):
+        return build_node_element(self.node_ids[node], list(self.labels_of(node)), self.node_props[node])
+
+    def edge_element(self, edge):
+        return build_relationship_element(self.edge_ids[edge], self.node_ids[self.edge_src[edge]],
+                                          self.node_ids[self.edge_dst[edge]],
+                                          self.rel_types[self.edge_type[edge]], self.edge_props[edge])
+
+    # --- 增量写入 ---
+
+    def upsert_node(self, node_id, labels, props):
+        index = self.node_index.get(node_id)
+        if index is None:
+            index = self._append_node(node_id, labels, props)
+        else:
+            self.node_labels[index] = self._intern_labels(labels)
+            self.node_props[index] = {sys.intern(k): v for k, v in props.items()}
+        self.delta_count += 1
+        return index
+
+    def delete_node(self, node_id):
+        index = self.node_index.pop(node_id, None)
+        if index is None:
+            return
+        for e in list(self.incident_edges(index)):
+            self._kill_edge(e)
+        self.node_alive[index] = 0
+        self.node_props[index] = {}
+        self.extra_adjacency.pop(index, None)
+        self.delta_count += 1
+
+    def upsert_relationship(self, rel_id, source_id, target_id, rel_type, props):
+        src = self.node_index.get(source_id)
+        dst = self.node_index.get(target_id)
+        if src is None or dst is None:
+            return None
+        index = self.edge_index.get(rel_id)
+        if index is not None:
+            self.edge_type[index] = self._intern_type(rel_type)
+            self.edge_props[index] = {sys.intern(k): v for k, v in props.items()}
+        else:
+            index = self._append_edge(rel_id, src, dst, rel_type, props)
+            self.extra_adjacency.setdefault(src, []).append(index)
+            self.extra_adjacency.setdefault(dst, []).append(index)
+        self.delta_count += 1
+        return index
+
+    def delete_relationship(self, rel_id):
+        index = self.edge_index.get(rel_id)
+        if index is not None:
+            self._kill_edge(index)
+            self.delta_count += 1
+
+    def _kill_edge(self, edge):
+        self.edge_alive[edge] = 0
+        self.edge_props[edge] = {}
+        self.edge_index.pop(self.edge_ids[edge], None)
+
+    def content(self):
+        """返回与存储布局无关的图内容，用于比较两份副本是否一致。"""
+        nodes = {self.node_ids[i]: (self.labels_of(i), self.node_props[i]) for i in self.live_nodes()}
+        relationships = {
+            self.edge_ids[e]: (self.node_ids[self.edge_src[e]], self.node_ids[self.edge_dst[e]],
+                               self.rel_types[self.edge_type[e]], self.edge_props[e])
+            for e in range(len(self.edge_ids)) if self.edge_alive[e]
+        }
+        return nodes, relationships
+
+    def compacted(self):
+        """丢弃已删除的元素与增量，重建一份紧凑的 CSR。"""
+        nodes = [(self.node_ids[i], self.labels_of(i), self.node_props[i]) for i in self.live_nodes()]
+        relationships = [
+            (self.edge_ids[e], self.node_ids[self.edge_src[e]], self.node_ids[self.edge_dst[e]],
+             self.rel_types[self.edge_type[e]], self.edge_props[e])
+            for e in range(len(self.edge_ids)) if self.edge_alive[e]
+        ]
+        return _ReplicaState.build(nodes, relationships)
+
+
+class GraphReplica:
+    """
+    主要功能: 进程内的只读图副本，直接响应 /api/graph、/api/search、/api/expand。
+    工作逻辑:
+        - load() 从 Neo4j 读取全部节点与关系构建 _ReplicaState，然后原子替换。
+        - 写接口在 Neo4j 提交成功后调用 apply()，把变更同步到副本。
+        - 加载期间收到的变更会先缓存，替换完成后重放，避免丢失并发写入。
+        - 增量超过 compact_threshold 时在进程内压缩重建 CSR。
+        - 副本记录自己反映到的图版本（VersionTracker）：加载时读取 GraphMeta 的版本，
+          apply() 时按变更携带的版本推进。其他进程的写入会让当前图版本超过副本的版本，
+          此时 ready 为 False 并请求后台线程立即重新加载，重新加载完成前路由直接查询 Neo4j，
+          副本的旧数据不会以新版本号被缓存（路径缓存、快照、浏览器缓存）。
+        - start_reconcile_loop() 启动后台线程，定期（或被请求时立即）重新加载以修正带外修改
+          （例如直接在 Neo4j Browser 中修改的数据）。只有在此期间图版本没有变化、内容却不同时
+          才是带外修改，调用 record_out_of_band_change() 递增图版本号；
+          其他进程经 API 的写入已经递增过版本号，不再重复报告。
+        - 尚未加载、加载失败或落后于当前图版本时 ready 为 False，路由回退到直接查询 Neo4j。
+    参数:
+        compact_threshold (int): 触发压缩重建的增量操作数。
+    影响: 在内存中保存整张图；后台线程会周期性地全量读取数据库。
+    """
+    def __init__(self, compact_threshold=1000):
+        self._lock = threading.RLock()
+        self._state = _ReplicaState()
+        self._compact_threshold = compact_threshold
+        self._loading = False
+        self._pending_changes = []
+        self._loaded = False
+        self._tracker = VersionTracker()
+        self._reload_requested = threading.Event()
+        self.loaded_at = None
+        self.last_error = None
+
+    @property
+    def ready(self):
+        """已加载且不落后于当前图版本时为 True；落后时请求重新加载并返回 False。"""
+        if not self._loaded:
+            return False
+        current = graph_version.current
+        with self._lock:
+            if self._tracker.covers(current):
+                return True
+        self._reload_requested.set()
+        return False
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._tracker.version
+
+    # --- 加载与同步 ---
+
+    def load(self):
+        """从 Neo4j 全量加载并替换当前副本。返回 (节点数, 关系数)。"""
+        with self._lock:
+            self._loading = True
+            self._pending_changes = []
+        try:
+            started = time.perf_counter()
+            # 先读版本号再读数据：读取期间提交的写入最多让副本显得落后而多加载一次，
+            # 不会让旧数据被标上新版本号
+            version_record, node_records, rel_records = read_transaction(
+                lambda q: (q.single("graph_version"), q.run("dump_nodes"), q.run("dump_relationships")))
+            loaded_version = version_record["version"] if version_record else "0"
+            nodes = [(record["id"], record["labels"], record["props"]) for record in node_records]
+            relationships = [
+                (record["id"], record["source"], record["target"], record["type"], record["props"])
+                for record in rel_records
+            ]
+            state = _ReplicaState.build(nodes, relationships)
+        except Exception as e:
+            with self._lock:
+                self._loading = False
+                self._pending_changes = []
+                self.last_error = str(e)
+            raise
+
+        with self._lock:
+            previous, previous_tracker, was_loaded = self._state, self._tracker, self._loaded
+            self._state = state
+            self._tracker = VersionTracker()
+            self._tracker.reset(loaded_version)
+            pending, self._pending_changes = self._pending_changes, []
+            self._loading = False
+            for change in pending:
+                self._apply_locked(change)
+            # 旧副本已包含截至 loaded_version 的全部写入（加载期间的写入也同时应用到了新旧副本），
+            # 此时内容仍不同即说明有带外修改；旧副本落后时，差异来自其他进程的写入
+            drifted = (was_loaded and previous_tracker.covers(loaded_version)
+                       and self._state.content() != previous.content())
+            self._loaded = True
+            self.loaded_at = time.time()
+            self.last_error = None
+        app.logger.info("Graph replica loaded %s nodes and %s relationships in %.1f ms", len(nodes), len(relationships), (time.perf_counter() - started) * 1000)
+        if drifted:
+            record_out_of_band_change("replica reconcile")
+        return len(nodes), len(relationships)
+
+    def start_reconcile_loop(self, interval_seconds):
+        """启动后台线程：立即加载一次，之后每 interval_seconds 秒或在副本落后时重新加载。"""
+        def loop():
+            while True:
+                try:
+                    self.load()
+                except Exception as e:
+                    app.logger.error("Graph replica reconcile failed: %s", e, exc_info=True)
+                # 加载期间发现的落后由加载本身处理；之后再次落后时 ready 会重新请求
+                self._reload_requested.clear()
+                self._reload_requested.wait(interval_seconds)
+
+        thread = threading.Thread(target=loop, name="kg-replica-reconcile", daemon=True)
+        thread.start()
+        return thread
+
+    def apply(self, change):
+        """
+        把一个已提交的写操作同步到副本。
+        change (dict): 由 record_graph_change 生成，包含 "op" 与对应字段。
+        """
+        with self._lock:
+            if self._loading:
+                self._pending_changes.append(change)
+            if not self._loaded:
+                return
+            self._apply_locked(change)
+
+    def _apply_locked(self, change):
+        state = self._state
+        op = change["op"]
+        self._tracker.advance(change.get("version"))
+        if op == "node_upsert":
+            state.upsert_node(change["id"], change["labels"], change["properties"])
+        elif op == "node_delete":
+            state.delete_node(change["id"])
+        elif op == "relationship_upsert":
+            state.upsert_relationship(change["id"], change["source"], change["target"],
+                                      change["type"], change["properties"])
+        elif op == "relationship_delete":
+            state.delete_relationship(change["id"])
+        if state.delta_count >= self._compact_threshold:
+            self._state = state.compacted()
+
+    def status(self):
+        ready = self.ready
+        with self._lock:
+            state = self._state
+            return {
+                "enabled": True,
+                "ready": ready,
+                "loaded": self._loaded,
+                "version": self._tracker.version,
+                "loaded_at": self.loaded_at,
+                "nodes": len(state.node_index),
+                "relationships": len(state.edge_index),
+                "label_sets": len(state.label_sets),
+                "relationship_types": len(state.rel_types),
+                "pending_delta": state.delta_count,
+                "last_error": self.last_error,
+            }
+
+    # --- 读取（返回值格式与对应路由的 Neo4j 实现一致） ---
+
+    def _neighbourhood(self, state, center_nodes):
+        nodes_dict = {}
+        edges_list = []
+        processed = set()
+        for node in center_nodes:
+            nodes_dict[node] = state.node_element(node)
+        for node in center_nodes:
+            for e in state.incident_edges(node):
+                other = state.other_end(e, node)
+                if other not in nodes_dict:
+                    nodes_dict[other] = state.node_element(other)
+                if e not in processed:
+                    edges_list.append(state.edge_element(e))
+                    processed.add(e)
+        return list(nodes_dict.values()), edges_list
+
+    def graph_payload(self, load_init_only):
+        with self._lock:
+            state = self._state
+            if load_init_only:
+                centers = [i for i in state.live_nodes() if _is_init_value(state.node_props[i].get('init'))]
+            else:
+                centers = list(state.live_nodes())
+            nodes, edges = self._neighbourhood(state, centers)
+        return {"nodes": nodes, "edges": edges}
+
+    def search_payload(self, label, property_name, keyword):
+        keyword = keyword.lower()
+        with self._lock:
+            state = self._state
+            centers = []
+            for i in state.live_nodes():
+                if label not in state.labels_of(i):
+                    continue
+                value = state.node_props[i].get(property_name)
+                if isinstance(value, str) and keyword in value.lower():
+                    centers.append(i)
+            nodes, edges = self._neighbourhood(state, centers)
+            center_ids = [state.node_ids[i] for i in centers]
+        return {"nodes": nodes, "edges": edges, "center_node_ids": center_ids}
+
+    def existing_nodes(self, node_ids):
+        with self._lock:
+            return {node_id for node_id in node_ids if node_id in self._state.node_index}
+
+    def adjacency(self, node_ids, rel_types=None):
+        """返回 {节点ID: [(关系ID, 邻居ID), ...]}，可按关系类型过滤。"""
+        with self._lock:
+            state = self._state
+            result = {}
+            for node_id in node_ids:
+                node = state.node_index.get(node_id)
+                if node is None:
+                    continue
+                result[node_id] = [
+                    (state.edge_ids[e], state.node_ids[state.other_end(e, node)])
+                    for e in state.incident_edges(node)
+                    if not rel_types or state.rel_types[state.edge_type[e]] in rel_types
+                ]
+        return result
+
+    def elements(self, node_ids, rel_ids):
+        with self._lock:
+            state = self._state
+            nodes = [state.node_element(state.node_index[node_id]) for node_id in node_ids
+                     if node_id in state.node_index]
+            edges = [state.edge_element(state.edge_index[rel_id]) for rel_id in rel_ids
+                     if rel_id in state.edge_index]
+        return nodes, edges
+
+    def expand_payload(self, node_id):
+        with self._lock:
+            state = self._state
+            node = state.node_index.get(node_id)
+            nodes_dict = {}
+            edges_list = []
+            if node is not None:
+                for e in state.incident_edges(node):
+                    other = state.other_end(e, node)
+                    if other not in nodes_dict:
+                        nodes_dict[other] = state.node_element(other)
+                    edge = state.edge_element(e)
+                    # 与 Neo4j 实现保持一致：source 为被展开的节点
+                    edge["data"]["source"] = node_id
+                    edge["data"]["target"] = state.node_ids[other]
+                    edges_list.append(edge)
+        return {"nodes": list(nodes_dict.values()), "edges": edges_list}
+
+
+graph_replica = GraphReplica(compact_threshold=GRAPH_REPLICA_COMPACT_THRESHOLD)
+
+
+def record_graph_change(op, **change):
+    """
+    主要功能: 写操作在 Neo4j 提交成功后调用，把变更通知给进程内的派生数据。
+    参数:
+        op (str): "node_upsert" / "node_delete" / "relationship_upsert" / "relationship_delete"，
+                  或 "version_bump"（只递增了版本号、没有数据变化）。
+        change: 对应字段，例如 id、labels、properties、source、target、type。
+    影响: 更新内存图副本与图统计（如已启用）；安排重新生成快照（如已启用）。
+          图版本号已在写事务中递增；变更带上该版本号（version），副本与统计据此判断是否有遗漏。
+    """
+    change["op"] = op
+    change["version"] = last_write_version()
+    if GRAPH_REPLICA_ENABLED:
+        graph_replica.apply(change)
+    if STATS_ENABLED:
+        graph_stats.apply(change)
+    if SNAPSHOT_ENABLED:
+        snapshot_writer.schedule()
+
+
+def record_out_of_band_change(detected_by):
+    """
+    主要功能: 后台全量读取发现数据库被绕过 API 修改时调用。
+    影响: 递增 Neo4j 中的图版本号（所有进程的路径缓存、快照与前端缓存随之失效）；
+          安排重新生成快照（如已启用）。
+    """
+    app.logger.warning("Out-of-band graph changes detected by %s", detected_by)
+    try:
+        graph_version.bump()
+    except Exception as e:
+        app.logger.error("Failed to bump graph version: %s", e, exc_info=True)
+        return
+    # 本进程的副本与统计已与数据库一致，让它们随这个版本号推进，而不是因版本缺口再加载一次
+    record_graph_change("version_bump")
+
+
+def record_node_upsert(node):
+    record_graph_change("node_upsert", id=node.element_id, labels=list(node.labels), properties=dict(node.items()))
+
+
+def record_relationship_upsert(rel):
+    record_graph_change("relationship_upsert", id=rel.element_id, source=rel.start_node.element_id,
+                        target=rel.end_node.element_id, type=rel.type, properties=dict(rel.items()))
+
+
+# --- 图统计 ---
+
+class GraphStats:
+    """
+    主要功能: 增量维护的图统计：各标签/关系类型的数量、每个节点的度、度分布、孤立节点与最大枢纽。
+    工作逻辑:
+        - 写操作提交后通过 apply() 增量更新计数器，/api/stats 直接读取，不访问数据库。
+        - 节点按度数分组保存（nodes_by_degree），孤立节点另存一个有序集合（orphans），
+          apply() 以 O(1) 维护它们；snapshot() 只需对不同的度数值排序，不遍历全部节点，
+          因此不会长时间持有写操作也需要的锁。
+        - recount() 从 Neo4j 只读取 ID、标签和关系端点重新计算全部计数，
+          用于修正带外修改造成的偏差；重算期间收到的变更在替换后重放。
+        - 与 GraphReplica 一样用 VersionTracker 记录计数反映到的图版本：其他进程写入后
+          ready 为 False 并请求立即重算。只有此前的计数已覆盖重算时读到的版本、结果却不同时
+          才是带外修改，调用 record_out_of_band_change()。
+        - degree_of() 为删除枢纽节点等逻辑提供免查询的度数查找。
+    影响: 在内存中保存每个节点的标签、名称、度和关联关系 ID。
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._recounting = False
+        self._pending_changes = []
+        self._loaded = False
+        self._tracker = VersionTracker()
+        self._recount_requested = threading.Event()
+        self.last_recount_at = None
+        self.last_recount_drift = None
+
+    @property
+    def ready(self):
+        """已完成重算且不落后于当前图版本时为 True；落后时请求重算并返回 False。"""
+        if not self._loaded:
+            return False
+        current = graph_version.current
+        with self._lock:
+            if self._tracker.covers(current):
+                return True
+        self._recount_requested.set()
+        return False
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._tracker.version
+
+    def _reset(self):
+        self.node_labels = {}
+        self.node_names = {}
+        self.node_rels = {}
+        self.rels = {}
+        self.label_counts = Counter()
+        self.rel_type_counts = Counter()
+        self.nodes_by_degree = {}
+        self.orphans = {}
+
+    # --- 增量更新 ---
+
+    def _add_node(self, node_id, labels, name):
+        if node_id in self.node_labels:
+            self.label_counts.subtract(self.node_labels[node_id])
+        else:
+            self.node_rels[node_id] = set()
+            self._move_degree(node_id, None, 0)
+        self.node_labels[node_id] = tuple(labels)
+        self.node_names[node_id] = name
+        self.label_counts.update(labels)
+
+    def _remove_node(self, node_id):
+        if node_id not in self.node_labels:
+            return
+        for rel_id in list(self.node_rels[node_id]):
+            self._remove_rel(rel_id)
+        self.label_counts.subtract(self.node_labels.pop(node_id))
+        self.node_names.pop(node_id, None)
+        self.node_rels.pop(node_id)
+        self._move_degree(node_id, 0, None)
+
+    def _move_degree(self, node_id, old, new):
+        """把节点从度数 old 的分组移到度数 new 的分组（None 表示不在任何分组中）。"""
+        if old is not None:
+            group = self.nodes_by_degree[old]
+            group.discard(node_id)
+            if not group:
+                del self.nodes_by_degree[old]
+        if new is not None:
+            self.nodes_by_degree.setdefault(new, set()).add(node_id)
+        if new == 0:
+            self.orphans[node_id] = None
+        else:
+            self.orphans.pop(node_id, None)
+
+    def _shift_degree(self, node_id, delta):
+        degree = len(self.node_rels[node_id])
+        self._move_degree(node_id, degree - delta, degree)
+
+    def _add_rel(self, rel_id, source_id, target_id, rel_type):
+        if rel_id in self.rels or source_id not in self.node_rels or target_id not in self.node_rels:
+            return
+        self.rels[rel_id] = (source_id, target_id, rel_type)
+        self.rel_type_counts[rel_type] += 1
+        for node_id in {source_id, target_id}:
+            self.node_rels[node_id].add(rel_id)
+            self._shift_degree(node_id, 1)
+
+    def _remove_rel(self, rel_id):
+        info = self.rels.pop(rel_id, None)
+        if info is None:
+            return
+        source_id, target_id, rel_type = info
+        self.rel_type_counts[rel_type] -= 1
+        for node_id in {source_id, target_id}:
+            self.node_rels[node_id].discard(rel_id)
+            self._shift_degree(node_id, -1)
+
+    def apply(self, change):
+        """把一个已提交的写操作（record_graph_change 生成的 dict）计入统计。"""
+        with self._lock:
+            if self._recounting:
+                self._pending_changes.append(change)
+            self._apply_locked(change)
+
+    def _apply_locked(self, change):
+        op = change["op"]
+        self._tracker.advance(change.get("version"))
+        if op == "node_upsert":
+            props = change["properties"]
+            # 与 count_nodes 的 coalesce(n.name, n.title) 一致：只有 name 为 null 时才取 title
+            name = props.get("name")
+            self._add_node(change["id"], change["labels"], name if name is not None else props.get("title"))
+        elif op == "node_delete":
+            self._remove_node(change["id"])
+        elif op == "relationship_upsert":
+            self._add_rel(change["id"], change["source"], change["target"], change["type"])
+        elif op == "relationship_delete":
+            self._remove_rel(change["id"])
+
+    # --- 全量重算 ---
+
+    def recount(self):
+        """从 Neo4j 重新计算全部统计并替换当前计数。"""
+        with self._lock:
+            self._recounting = True
+            self._pending_changes = []
+        try:
+            version_record, nodes, rels = read_transaction(
+                lambda q: (q.single("graph_version"), q.run("count_nodes"), q.run("count_relationships")))
+        except Exception:
+            with self._lock:
+                self._recounting = False
+                self._pending_changes = []
+            raise
+
+        recounted_version = version_record["version"] if version_record else "0"
+        with self._lock:
+            before = (len(self.node_labels), len(self.rels))
+            previous = (self.node_labels, self.node_names, self.rels)
+            # 此前的计数落后于读到的版本时，差异来自其他进程的写入，不计为偏差
+            was_current = self._loaded and self._tracker.covers(recounted_version)
+            self._reset()
+            self._tracker = VersionTracker()
+            self._tracker.reset(recounted_version)
+            for record in nodes:
+                self._add_node(record["id"], record["labels"], record["name"])
+            for record in rels:
+                self._add_rel(record["id"], record["source"], record["target"], record["type"])
+            pending, self._pending_changes = self._pending_changes, []
+            self._recounting = False
+            for change in pending:
+                self._apply_locked(change)
+            after = (len(self.node_labels), len(self.rels))
+            drifted = was_current and previous != (self.node_labels, self.node_names, self.rels)
+            self.last_recount_drift = {
+                "nodes": after[0] - before[0] if was_current else 0,
+                "relationships": after[1] - before[1] if was_current else 0,
+            }
+            self._loaded = True
+            self.last_recount_at = time.time()
+        if any(self.last_recount_drift.values()):
+            app.logger.warning("Graph stats recount corrected drift: %s", self.last_recount_drift)
+        if drifted:
+            record_out_of_band_change("stats recount")
+
+    def start_recount_loop(self, interval_seconds):
+        """启动后台线程：立即重算一次，之后每 interval_seconds 秒或在统计落后时重算。"""
+        def loop():
+            while True:
+                try:
+                    self.recount()
+                except Exception as e:
+                    app.logger.error("Graph stats recount failed: %s", e, exc_info=True)
+                self._recount_requested.clear()
+                self._recount_requested.wait(interval_seconds)
+
+        thread = threading.Thread(target=loop, name="kg-stats-recount", daemon=True)
+        thread.start()
+        return thread
+
+    # --- 读取 ---
+
+    def degree_of(self, node_id):
+        """返回节点的度；统计未就绪（含落后于当前图版本）或节点未知时返回 None。"""
+        if not self.ready:
+            return None
+        with self._lock:
+            rels = self.node_rels.get(node_id)
+            return len(rels) if rels is not None else None
+
+    def snapshot(self, top_n, orphan_limit):
+        """生成 /api/stats 的数据；耗时只与不同度数值的个数、top_n 和 orphan_limit 有关。"""
+        ready = self.ready
+        with self._lock:
+            # 按 2 的幂分桶: "0", "1", "2-3", "4-7", ...
+            buckets = Counter()
+            for degree, group in self.nodes_by_degree.items():
+                if degree < 2:
+                    buckets[str(degree)] += len(group)
+                else:
+                    low = 1 << (degree.bit_length() - 1)
+                    buckets[f"{low}-{low * 2 - 1}"] += len(group)
+            hubs = []
+            for degree in sorted((d for d in self.nodes_by_degree if d > 0), reverse=True):
+                if len(hubs) >= top_n:
+                    break
+                hubs.extend((node_id, degree) for node_id in itertools.islice(self.nodes_by_degree[degree], top_n - len(hubs)))
+            orphans = list(itertools.islice(self.orphans, orphan_limit))
+            return {
+                "ready": ready,
+                "graph_version": self._tracker.version,
+                "node_count": len(self.node_labels),
+                "relationship_count": len(self.rels),
+                "labels": {label: count for label, count in self.label_counts.items() if count > 0},
+                "relationship_types": {t: count for t, count in self.rel_type_counts.items() if count > 0},
+                "degree_distribution": dict(sorted(buckets.items(), key=lambda item: int(item[0].split("-")[0]))),
+                "orphan_count": len(self.orphans),
+                "orphans": [
+                    {"id": node_id, "labels": list(self.node_labels[node_id]), "name": self.node_names.get(node_id)}
+                    for node_id in orphans
+                ],
+                "top_hubs": [
+                    {"id": node_id, "labels": list(self.node_labels[node_id]),
+                     "name": self.node_names.get(node_id), "degree": degree}
+                    for node_id, degree in hubs
+                ],
+                "last_recount_at": self.last_recount_at,
+                "last_recount_drift": self.last_recount_drift,
+            }
+
+
+graph_stats = GraphStats()
+
+
+# --- 路径查找 ---
+
+class _SearchBudget:
+    """记录一次路径查询已展开的节点数与截止时间，任一上限耗尽即停止搜索。"""
+    def __init__(self, max_expanded_nodes, time_limit_ms):
+        self.max_expanded_nodes = max_expanded_nodes
+        self.deadline = time.perf_counter() + time_limit_ms / 1000.0
+        self.expanded = 0
+        self.exhausted = False
+
+    def charge(self, count):
+        self.expanded += count
+        if self.expanded > self.max_expanded_nodes or time.perf_counter() > self.deadline:
+            self.exhausted = True
+        return not self.exhausted
+
+
+class _ReplicaPathSource:
+    """路径查找的数据源：直接读取内存图副本。"""
+    def __init__(self, replica, rel_types):
+        self.replica = replica
+        self.rel_types = rel_types
+
+    def existing(self, node_ids):
+        return self.replica.existing_nodes(node_ids)
+
+    def neighbours(self, node_ids):
+        return self.replica.adjacency(node_ids, self.rel_types)
+
+    def elements(self, node_ids, rel_ids):
+        return self.replica.elements(node_ids, rel_ids)
+
+
+class _Neo4jPathSource:
+    """路径查找的数据源：每一层 BFS 前沿用一次批量查询从 Neo4j 读取邻接关系。"""
+    def __init__(self, rel_types):
+        self.rel_types = list(rel_types) if rel_types else None
+
+    def existing(self, node_ids):
+        return {record["id"] for record in query_read("existing_node_ids", ids=list(node_ids))}
+
+    def neighbours(self, node_ids):
+        adjacency = {}
+        for record in query_read("path_adjacency", ids=list(node_ids), rel_types=self.rel_types):
+            adjacency.setdefault(record["node_id"], []).append((record["rel_id"], record["neighbor_id"]))
+        return adjacency
+
+    def elements(self, node_ids, rel_ids):
+        node_records, rel_records = read_transaction(lambda q: (
+            q.run("nodes_by_id", ids=list(node_ids)), q.run("relationships_by_id", ids=list(rel_ids))))
+        nodes = [serialize_node_for_cytoscape(record["n"]) for record in node_records]
+        edges = [serialize_relationship_for_cytoscape(record["r"]) for record in rel_records]
+        return nodes, edges
+
+
+class _AdjacencyCache:
+    """
+    在一次请求内缓存已读取的邻接表，并支持按节点/关系排除（供 Yen 算法的偏离搜索使用），
+    这样 k 条路径的多轮搜索不会重复访问数据源。
+    """
+    def __init__(self, source):
+        self.source = source
+        self._adjacency = {}
+
+    def neighbours(self, node_ids, excluded_nodes=frozenset(), excluded_rels=frozenset()):
+        missing = [node_id for node_id in node_ids if node_id not in self._adjacency]
+        if missing:
+            fetched = self.source.neighbours(missing)
+            for node_id in missing:
+                self._adjacency[node_id] = fetched.get(node_id, [])
+        if not excluded_nodes and not excluded_rels:
+            return {node_id: self._adjacency[node_id] for node_id in node_ids}
+        return {
+            node_id: [(rel_id, nbr) for rel_id, nbr in self._adjacency[node_id]
+                      if rel_id not in excluded_rels and nbr not in excluded_nodes]
+            for node_id in node_ids
+        }
+
+
+def _bidirectional_shortest_path(source, target, adjacency, max_depth, budget,
+                                  excluded_nodes=frozenset(), excluded_rels=frozenset()):
+    """
+    主要功能: 有界双向 BFS，查找 source 到 target 的一条最短（跳数）路径，忽略关系方向。
+    工作逻辑: 两端各自维护前沿，每轮只展开较小的一侧的一整层（一次批量读取邻接表），
+              在该层中首次与另一侧相遇即得到最短路径。路径长度超过 max_depth
+              或预算（展开节点数/时间）耗尽时停止。
+    返回:
+        tuple(list, list) | None: (节点 ID 列表, 关系 ID 列表)；找不到时返回 None。
+    """
+    if source == target:
+        return [source], []
+    parents_forward = {source: None}
+    parents_backward = {target: None}
+    frontier_forward, frontier_backward = [source], [target]
+    depth = 0
+
+    while frontier_forward and frontier_backward and depth < max_depth:
+        forward = len(frontier_forward) <= len(frontier_backward)
+        if forward:
+            frontier, parents, other = frontier_forward, parents_forward, parents_backward
+        else:
+            frontier, parents, other = frontier_backward, parents_backward, parents_forward
+        if not budget.charge(len(frontier)):
+            return None
+
+        layer = adjacency.neighbours(frontier, excluded_nodes, excluded_rels)
+        next_frontier = []
+        meeting_node = None
+        for node in frontier:
+            for rel_id, neighbour in layer.get(node, ()):
+                if neighbour in parents:
+                    continue
+                parents[neighbour] = (node, rel_id)
+                if neighbour in other:
+                    meeting_node = neighbour
+                    break
+                next_frontier.append(neighbour)
+            if meeting_node is not None:
+                break
+
+        if meeting_node is not None:
+            node_ids, rel_ids = [meeting_node], []
+            step = parents_forward[meeting_node]
+            while step is not None:
+                node_ids.insert(0, step[0])
+                rel_ids.insert(0, step[1])
+                step = parents_forward[step[0]]
+            step = parents_backward[meeting_node]
+            while step is not None:
+                node_ids.append(step[0])
+                rel_ids.append(step[1])
+                step = parents_backward[step[0]]
+            return node_ids, rel_ids
+
+        if forward:
+            frontier_forward = next_frontier
+        else:
+            frontier_backward = next_frontier
+        depth += 1
+    return None
+
+
+def find_k_shortest_paths(source, target, adjacency, max_depth, k, budget):
+    """
+    主要功能: 用 Yen 算法在有界双向 BFS 之上求前 k 条无环最短路径。
+    参数:
+        adjacency (_AdjacencyCache): 带请求内缓存的邻接数据源。
+        max_depth (int): 路径最大跳数。
+        k (int): 需要的路径条数。
+        budget (_SearchBudget): 所有轮次共享的搜索预算。
+    返回:
+        list[tuple(list, list)]: 按长度排序的 (节点 ID 列表, 关系 ID 列表)。
+    """
+    first = _bidirectional_shortest_path(source, target, adjacency, max_depth, budget)
+    if first is None:
+        return []
+    found = [first]
+    candidates = []
+    seen = {tuple(first[1])}
+    tie_breaker = 0
+
+    while len(found) < k and not budget.exhausted:
+        last_nodes, last_rels = found[-1]
+        for i in range(len(last_nodes) - 1):
+            spur_node = last_nodes[i]
+            root_nodes, root_rels = last_nodes[:i + 1], last_rels[:i]
+            excluded_rels = {rels[i] for nodes, rels in found if nodes[:i + 1] == root_nodes}
+            excluded_nodes = set(root_nodes[:-1])
+            spur = _bidirectional_shortest_path(spur_node, target, adjacency, max_depth - i, budget,
+                                                excluded_nodes, excluded_rels)
+            if spur is None:
+                if budget.exhausted:
+                    break
+                continue
+            path = (root_nodes[:-1] + spur[0], root_rels + spur[1])
+            key = tuple(path[1])
+            if key not in seen:
+                seen.add(key)
+                tie_breaker += 1
+                heapq.heappush(candidates, (len(path[1]), tie_breaker, path))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[2])
+    return found
+
+
+class PathCache:
+    """
+    主要功能: 路径查询结果的 LRU 缓存，键中包含图版本号，
+              写操作使版本递增后旧结果自然失效并被逐出。
+    """
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+path_cache = PathCache(max_entries=PATH_CACHE_SIZE)
+
+
+# --- 学生视图快照 ---
+
+class SnapshotWriter:
+    """
+    主要功能: 把初始图谱与全图写成带版本号、预压缩的 JSON 快照文件，
+              供学生视图作为静态文件读取，使学生请求不再访问数据库。
+    工作逻辑:
+        - 写操作提交后调用 schedule()；后台线程等待 debounce_seconds 后再生成快照，
+          期间的多次写入被合并为一次。生成过程中又有写入时，会再生成一次。
+        - 每个快照写出 graph-<kind>.<version>.json 与对应的 .json.gz，
+          以及只含摘要属性（fields=summary）的 graph-<kind>-summary 变体；
+          先写入唯一命名的临时文件并 fsync，再 os.replace，读者不会看到写了一半的文件；
+          多个工作进程共用 SNAPSHOT_DIR 时也不会写到同一个临时文件。
+        - current 记录每种快照最新的文件名；只保留最近 keep_versions 个版本的文件。
+    参数:
+        directory (str): 快照目录。
+        debounce_seconds (float): 合并突发写入的等待时间。
+        keep_versions (int): 保留的历史版本数。
+    影响: 写磁盘；生成快照时调用 load_graph_payload（副本未就绪时会查询数据库）。
+    """
+    KINDS = {"init": True, "full": False}
+
+    def __init__(self, directory, debounce_seconds, keep_versions):
+        self.directory = directory
+        self.debounce_seconds = debounce_seconds
+        self.keep_versions = keep_versions
+        self.current = {}
+        self.version = None
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        thread = threading.Thread(target=self._loop, name="kg-snapshot-writer", daemon=True)
+        thread.start()
+        self._dirty.set() # 启动时立即生成一次
+        return thread
+
+    def schedule(self):
+        self._dirty.set()
+
+    def _loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.debounce_seconds)
+            self._dirty.clear()
+            try:
+                self.write_now()
+            except Exception as e:
+                app.logger.error("Failed to write graph snapshots: %s", e, exc_info=True)
+
+    def write_now(self):
+        version = graph_version.current
+        written = {}
+        for kind, load_init_only in self.KINDS.items():
+            payload = load_graph_payload(load_init_only)
+            for variant, fields in ((kind, None), (f"{kind}-summary", NODE_SUMMARY_FIELDS)):
+                body = app.json.dumps(project_graph_payload(payload, fields)).encode("utf-8")
+                filename = f"graph-{variant}.{version}.json"
+                self._write_atomic(filename, body)
+                self._write_atomic(filename + ".gz", gzip.compress(body, compresslevel=9))
+                written[variant] = filename
+        with self._lock:
+            self.current = written
+            self.version = version
+        self._prune()
+        app.logger.info("Wrote graph snapshots for version %s", version)
+
+    def get(self, kind):
+        with self._lock:
+            return self.current.get(kind)
+
+    def _write_atomic(self, filename, data):
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f".{filename}.", suffix=".tmp",
+                                         delete=False) as f:
+            tmp_path = f.name
+            try:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, os.path.join(self.directory, filename))
+
+    def _prune(self):
+        by_version = {}
+        for filename in os.listdir(self.directory):
+            if filename.startswith("graph-") and (filename.endswith(".json") or filename.endswith(".json.gz")):
+                path = os.path.join(self.directory, filename)
+                by_version.setdefault(filename.split(".")[1], []).append(path)
+        stale = sorted(by_version, key=lambda v: min(os.path.getmtime(p) for p in by_version[v]), reverse=True)
+        for version in stale[self.keep_versions:]:
+            if version == self.version:
+                continue
+            for path in by_version[version]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+snapshot_writer = SnapshotWriter(SNAPSHOT_DIR, SNAPSHOT_DEBOUNCE_SECONDS, SNAPSHOT_KEEP_VERSIONS)
+
+
 # --- API 端点 ---
 
 
@@ -297,7 +2589,7 @@ def direct_access_page():
     
     redirect_url = f"https://{frontend_host}?view_mode=editor"
     
-    app.logger.info(f"Direct access: redirecting to {redirect_url}")
+    app.logger.info("Direct access: redirecting to %s", redirect_url)
     
     return redirect(redirect_url)
 
@@ -318,7 +2610,6 @@ def lti_launch():
         if not is_student_role(roles_param, ext_roles_param):
             view_mode = 'editor'
     
-    print(f"LTI Launch: Determined view mode is '{view_mode}'")
 
     # # --- 关键修改：不再渲染模板，而是重定向 ---
     # # 获取前端的访问地址（即你的ngrok/cloudflare隧道地址）
@@ -332,7 +2623,7 @@ def lti_launch():
     # --- 核心修改：不再动态计算，而是直接使用配置好的URL ---
     redirect_url = f"{FRONTEND_URL}/?view_mode={view_mode}"
 
-    app.logger.info(f"Redirecting LTI launch to: {redirect_url}")
+    app.logger.info("LTI launch: view mode '%s', redirecting to %s", view_mode, redirect_url, extra=SAMPLED)
     
     return redirect(redirect_url)
 
@@ -340,6 +2631,71 @@ def lti_launch():
 
 # backend/app.py
 
+def load_graph_payload(load_init_only):
+    """
+    主要功能: 构建 /api/graph 的响应数据（初始图谱或全图）。
+    工作逻辑: 
+        - 内存图副本就绪时直接由副本生成。
+        - 否则查询 Neo4j：init=true 只加载带init:1属性的节点及其1跳邻居，
+          init=false 加载数据库中的所有节点和关系。
+    参数:
+        load_init_only (bool): 是否只加载初始图谱。
+    返回:
+        dict: {"nodes": [...], "edges": [...]}。
+    影响: 副本未就绪时对数据库进行只读查询。
+    """
+    if graph_replica.ready:
+        return graph_replica.graph_payload(load_init_only)
+
+    # 根据参数选择节点查询语句；两条语句在同一个只读事务中执行，结果彼此一致
+    if load_init_only:
+        app.logger.debug("Loading initial graph (init=true).")
+    else:
+        app.logger.debug("Loading FULL graph (init=false).")
+
+    def fetch(q):
+        center_records = q.run("init_nodes" if load_init_only else "all_nodes")
+        center_ids = list({record["n"].element_id for record in center_records})
+        if not center_ids:
+            return center_records, []
+        # 在全图模式下，这个查询会获取所有的关系
+        # 在初始图模式下，它只获取与init节点相连的关系
+        return center_records, q.run("neighbourhood", node_ids=center_ids)
+
+    init_nodes_result, edges_result = read_transaction(fetch)
+
+    nodes_dict = {}
+    for record in init_nodes_result:
+        node = record["n"]
+        if node.element_id not in nodes_dict:
+            nodes_dict[node.element_id] = serialize_node_for_cytoscape(node)
+
+    if not nodes_dict:
+        return {"nodes": [], "edges": []}
+
+    edges_list = []
+    processed_rel_ids = set()
+
+    for record in edges_result:
+        relationship_obj = record["r"]
+        start_node = record["start_n"]
+        end_node = record["end_n"]
+
+        # 确保两个端点都在我们的节点字典中
+        if start_node.element_id not in nodes_dict:
+            nodes_dict[start_node.element_id] = serialize_node_for_cytoscape(start_node)
+        if end_node.element_id not in nodes_dict:
+            nodes_dict[end_node.element_id] = serialize_node_for_cytoscape(end_node)
+
+        # 添加关系
+        if relationship_obj.element_id not in processed_rel_ids:
+            edges_list.append(serialize_relationship_for_cytoscape(relationship_obj))
+            processed_rel_ids.add(relationship_obj.element_id)
+
+    app.logger.info("Loaded %s nodes and %s edges", len(nodes_dict), len(edges_list), extra=SAMPLED)
+    return {"nodes": list(nodes_dict.values()), "edges": edges_list}
+
+
 @app.route('/api/graph', methods=['GET'])
 def get_full_graph_data():
     """
@@ -349,80 +2705,112 @@ def get_full_graph_data():
         - init=false: 加载数据库中的所有节点和关系。
     参数 (URL Query):
         init (str): 'true' 或 'false'。默认为 'true'。
+        fields (str, 可选): 'summary' 或逗号分隔的属性名，见 requested_node_fields。
     """
-    db = None
     try:
         # 1. 获取 init 查询参数，并设定默认值
         # request.args.get('init', 'true') 表示如果URL中没有init参数，则默认为 'true'
         # .lower() == 'true' 将其转换为布尔值
         load_init_only = request.args.get('init', 'true').lower() == 'true'
-        
-        db = get_db_session()
-        
-        # 2. 根据参数动态构建节点查询语句
-        if load_init_only:
-            app.logger.info("Loading initial graph (init=true).")
-            init_nodes_query = "MATCH (n) WHERE n.init = '1' OR n.init = 1 RETURN n"
-        else:
-            app.logger.info("Loading FULL graph (init=false).")
-            init_nodes_query = "MATCH (n) RETURN n"
-            
-        init_nodes_result = db.run(init_nodes_query)
-        
-        # --- 后续的数据处理逻辑与您提供的代码完全一致，因为它们足够健壮 ---
-        
-        nodes_dict = {}
-        init_node_ids = set() # 在全图模式下，这将包含所有节点的ID
-        for record in init_nodes_result:
-            node = record["n"]
-            serialized_node = serialize_node_for_cytoscape(node)
-            if serialized_node and node.element_id not in nodes_dict:
-                nodes_dict[node.element_id] = serialized_node
-                init_node_ids.add(node.element_id)
-        
-        if not init_node_ids:
-            return jsonify({"nodes": [], "edges": []})
-        
-        # 在全图模式下，这个查询会获取所有的关系
-        # 在初始图模式下，它只获取与init节点相连的关系
-        neighbor_query = """
-            MATCH (start_n)-[r]-(end_n)
-            WHERE elementId(start_n) IN $node_ids
-            RETURN r, start_n, end_n 
-        """
-        # 注意：我稍微优化了您的查询，不再需要 OR elementId(end_n)，
-        # 并且返回了完整的start_n和end_n节点对象，这样可以避免N+1查询问题。
-        
-        edges_result = list(db.run(neighbor_query, node_ids=list(init_node_ids)))
-        
-        edges_list = []
-        processed_rel_ids = set()
-        
-        for record in edges_result:
-            relationship_obj = record["r"]
-            start_node = record["start_n"]
-            end_node = record["end_n"]
-            
-            # 确保两个端点都在我们的节点字典中
-            if start_node.element_id not in nodes_dict:
-                nodes_dict[start_node.element_id] = serialize_node_for_cytoscape(start_node)
-            if end_node.element_id not in nodes_dict:
-                nodes_dict[end_node.element_id] = serialize_node_for_cytoscape(end_node)
-
-            # 添加关系
-            if relationship_obj.element_id not in processed_rel_ids:
-                edges_list.append(serialize_relationship_for_cytoscape(relationship_obj))
-                processed_rel_ids.add(relationship_obj.element_id)
-                
-        app.logger.info(f"Loaded {len(nodes_dict)} nodes and {len(edges_list)} edges")
-        return jsonify({"nodes": list(nodes_dict.values()), "edges": edges_list})
+        return jsonify(project_graph_payload(load_graph_payload(load_init_only), requested_node_fields()))
         
     except Exception as e:
-        app.logger.error(f"Unexpected error in get_full_graph_data: {str(e)}", exc_info=True)
+        app.logger.error("Unexpected error in get_full_graph_data: %s", e, exc_info=True)
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
-    finally:
-        if db:
-            db.close()
+
+
+@app.route('/api/graph/version', methods=['GET'])
+def get_graph_version():
+    """
+    主要功能: 返回当前图数据版本号，供前端判断本地（IndexedDB）缓存是否仍然有效。
+    工作逻辑: 读取 graph_version（最多每 GRAPH_VERSION_TTL_SECONDS 访问一次数据库）；
+              版本号同时作为 ETag，浏览器带 If-None-Match 重新验证时返回 304。
+    返回:
+        JSON: {"version": "<epoch>-<counter>"}。
+    """
+    version = graph_version.current
+    response = jsonify({"version": version})
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def snapshot_query_class(kind):
+    """快照需要实时构建时所属的 (查询类别, 优先级)。"""
+    return ("init", 0) if kind == "init" else ("heavy", 2)
+
+
+def request_snapshot_file(kind):
+    """
+    当前请求使用的快照文件名（None 表示实时构建）。每个请求只决定一次并保存在 g 中，
+    准入控制与路由因此看到同一个结果：决定实时构建的请求一定先获取了名额。
+    """
+    if "snapshot_file" not in g:
+        g.snapshot_file = snapshot_file(kind, requested_node_fields())
+    return g.snapshot_file
+
+
+def snapshot_file(kind, fields):
+    """
+    返回满足该字段投影的最新快照文件名；没有可用快照（需要实时构建）时返回 None。
+    快照的版本落后于当前图版本（例如其他进程写入了数据）时安排重新生成，并在此之前实时构建。
+    """
+    if not SNAPSHOT_ENABLED or fields not in (None, NODE_SUMMARY_FIELDS):
+        return None
+    if snapshot_writer.version != graph_version.current:
+        snapshot_writer.schedule()
+        return None
+    return snapshot_writer.get(kind if fields is None else f"{kind}-summary")
+
+
+@app.route('/api/snapshots/<kind>', methods=['GET'])
+def get_graph_snapshot(kind):
+    """
+    主要功能: 以静态文件的方式返回最新的图谱快照（学生视图使用）。
+    工作逻辑: 
+        - kind 为 'init'（初始图谱）或 'full'（全图）。
+        - 客户端接受 gzip 时直接发送预压缩的 .json.gz 文件，否则发送 .json 文件；
+          send_from_directory 使用 WSGI file_wrapper，服务器支持时走 sendfile，
+          并根据文件生成 ETag/Last-Modified 以支持 304。
+        - fields=summary 时返回只含摘要属性的快照变体；其他 fields 取值没有预生成文件，实时构建。
+        - 快照尚未生成（或未启用）时回退为实时构建，与 /api/graph 的结果一致；
+          快照文件已被（其他工作进程的）清理删除时同样回退为实时构建。
+    参数 (路径参数):
+        kind (str): 'init' 或 'full'。
+    参数 (URL Query):
+        fields (str, 可选): 节点属性投影，见 requested_node_fields。
+    """
+    if kind not in SnapshotWriter.KINDS:
+        return jsonify({"error": f"Unknown snapshot kind: {kind}"}), 404
+
+    fields = requested_node_fields()
+    filename = request_snapshot_file(kind)
+    response = None
+    if filename is not None:
+        try:
+            if 'gzip' in request.headers.get('Accept-Encoding', ''):
+                response = send_from_directory(SNAPSHOT_DIR, filename + ".gz", mimetype='application/json')
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = send_from_directory(SNAPSHOT_DIR, filename, mimetype='application/json')
+        except NotFound:
+            app.logger.warning("Snapshot file %s disappeared, building graph live", filename)
+            # 准入时本请求按发送文件处理、没有占用名额；实时构建前补上
+            if ADMISSION_ENABLED and not graph_replica.ready and not g.get("admission"):
+                rejected = admit(*snapshot_query_class(kind))
+                if rejected is not None:
+                    return rejected
+    if response is None:
+        try:
+            return jsonify(project_graph_payload(load_graph_payload(SnapshotWriter.KINDS[kind]), fields))
+        except Exception as e:
+            app.logger.error("Error building live graph for snapshot '%s': %s", kind, e, exc_info=True)
+            return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Graph-Version'] = filename.split(".")[1]
+    return response
 
 
 
@@ -431,7 +2819,7 @@ def create_new_node():
     """
     主要功能: 在 Neo4j 中创建一个新节点。
     工作逻辑:接收包含节点标签和属性的 JSON 数据。
-              构造并执行 CREATE Cypher 查询。
+              校验标签后执行固定的 CREATE 语句，属性作为 $props 整体传入。
               返回新创建节点序列化后的数据和 HTTP 201。
     参数 (来自请求JSON body):
         label (str, 可选): 节点的标签，默认为 "Node"。
@@ -441,39 +2829,103 @@ def create_new_node():
         失败时为错误信息 JSON 和相应的 HTTP 状态码。
     影响: 对数据库进行写操作 (创建节点)。
     """
-    db = None
     try:
         data = request.json
         node_label = data.get('label', 'Node').strip()
         if not node_label: node_label = 'Node' # 确保标签不为空
         properties = data.get('properties', {})
+        try:
+            validate_identifier(node_label, "label")
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
 
         if not properties.get('name') and not properties.get('title'):
             properties['name'] = f"New {node_label}"
 
-        db = get_db_session()
-        
-        prop_placeholders = ", ".join([f"{key}: ${key}" for key in properties.keys()])
-        query = f"CREATE (n:{node_label} {{{prop_placeholders}}}) RETURN n"
-        
-        app.logger.info(f"Executing node creation: {query} with params {properties}")
-        result = db.run(query, **properties).single()
+        app.logger.debug("Executing node creation for label %s with keys %s", node_label, list(properties))
+        result = write_transaction(lambda q: q.single("create_node", node_label, props=properties))
         
         if result and result["n"]:
+            record_node_upsert(result["n"])
             new_node_cytoscape = serialize_node_for_cytoscape(result["n"])
             return jsonify(new_node_cytoscape), 201
         else:
             app.logger.error("Failed to create node or 'n' not returned.")
             return jsonify({"error": "Failed to create node in DB"}), 500
     except ConnectionError as ce:
-        app.logger.error(f"Neo4j connection error in create_new_node: {str(ce)}", exc_info=True)
+        app.logger.error("Neo4j connection error in create_new_node: %s", ce, exc_info=True)
         return jsonify({"error": f"Database connection error: {str(ce)}"}), 503  
     except Exception as e:
-        app.logger.error(f"Error in create_new_node: {str(e)}", exc_info=True)
+        app.logger.error("Error in create_new_node: %s", e, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+def load_node_elements(node_ids):
+    """按 elementId 获取节点的完整 Cytoscape 元素（副本就绪时由副本提供），不存在的节点被忽略。"""
+    if graph_replica.ready:
+        nodes, _ = graph_replica.elements(node_ids, [])
+        return nodes
+    return [serialize_node_for_cytoscape(record["n"]) for record in query_read("nodes_by_id", ids=list(node_ids))]
+
+
+@app.route('/api/nodes/<node_id>', methods=['GET'])
+def get_node_detail(node_id):
+    """
+    主要功能: 返回单个节点的全部属性，供前端在选中节点时按需加载详情。
+    参数 (路径参数):
+        node_id (str): 节点 elementId。
+    返回:
+        JSON: {"data": {...}}，格式与图接口中的节点元素相同；节点不存在时返回 404。
+    影响: 副本未就绪时对数据库进行只读查询。
+    """
+    try:
+        nodes = load_node_elements([node_id])
+        if not nodes:
+            return jsonify({"error": f"Node {node_id} not found"}), 404
+        return jsonify(nodes[0])
+    except ConnectionError as ce:
+        app.logger.error("Neo4j connection error in get_node_detail: %s", ce, exc_info=True)
+        return jsonify({"error": f"Database connection error: {str(ce)}"}), 503
+    except Exception as e:
+        app.logger.error("Error in get_node_detail: %s", e, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/nodes/details', methods=['GET', 'POST'])
+def get_node_details_batch():
+    """
+    主要功能: 批量返回多个节点的全部属性。
+    工作逻辑: 只接受 POST。路由同时登记 GET 并返回 405，否则 werkzeug 会把
+              GET /api/nodes/details 匹配到 /api/nodes/<node_id>，当作 ID 为 "details" 的节点查询。
+    参数 (来自请求JSON body):
+        ids (list): 节点 elementId 列表，最多 NODE_DETAIL_BATCH_LIMIT 个。
+    返回:
+        JSON: {"nodes": [...], "missing": [...]}，missing 为不存在的节点 ID。
+    影响: 副本未就绪时对数据库进行一次只读查询。
+    """
+    if request.method != 'POST':
+        response = jsonify({"error": "Use POST with a JSON body {\"ids\": [...]}"})
+        response.status_code = 405
+        response.headers['Allow'] = 'POST'
+        return response
+    try:
+        data = request.json or {}
+        node_ids = data.get('ids')
+        if not isinstance(node_ids, list) or not all(isinstance(i, str) for i in node_ids):
+            return jsonify({"error": "'ids' must be a list of node IDs"}), 400
+        node_ids = list(dict.fromkeys(node_ids))
+        if len(node_ids) > NODE_DETAIL_BATCH_LIMIT:
+            return jsonify({"error": f"At most {NODE_DETAIL_BATCH_LIMIT} node IDs per request"}), 400
+
+        nodes = load_node_elements(node_ids) if node_ids else []
+        found = {node["data"]["id"] for node in nodes}
+        return jsonify({"nodes": nodes, "missing": [i for i in node_ids if i not in found]})
+    except ConnectionError as ce:
+        app.logger.error("Neo4j connection error in get_node_details_batch: %s", ce, exc_info=True)
+        return jsonify({"error": f"Database connection error: {str(ce)}"}), 503
+    except Exception as e:
+        app.logger.error("Error in get_node_details_batch: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if db:
-            db.close()
 
 
 @app.route('/api/nodes/<node_id>', methods=['PUT'])
@@ -481,7 +2933,7 @@ def update_existing_node(node_id):
     """
     主要功能: 更新 Neo4j 中已存在节点的属性。
     工作逻辑: 接收节点 elementId 和要更新的属性。
-              构造并执行 MATCH...SET Cypher 查询。
+              执行固定的 MATCH...SET n += $props 语句（值为 null 的属性会被删除）。
               返回更新后节点序列化后的数据和 HTTP 200。
     参数 (路径参数):
         node_id (str): 要更新节点的 elementId。
@@ -492,7 +2944,6 @@ def update_existing_node(node_id):
         失败时为错误信息 JSON 和相应的 HTTP 状态码。
     影响: 对数据库进行写操作 (更新节点属性)。
     """
-    db = None
     try:
         data = request.json
         properties_to_update = data.get('properties', {})
@@ -502,69 +2953,149 @@ def update_existing_node(node_id):
         if not properties_to_update:
             return jsonify({"error": "No properties provided for update"}), 400
 
-        db = get_db_session()
-        
-        set_clauses = [f"n.{key} = ${key}" for key in properties_to_update.keys()]
-        if not set_clauses:
-            return jsonify({"error": "No valid properties to update"}), 400
-
-        query_params = {"node_id": node_id, **properties_to_update}
-        query = f"""
-            MATCH (n) WHERE elementId(n) = $node_id
-            SET {', '.join(set_clauses)}
-            RETURN n
-        """
-        app.logger.info(f"Executing node update: {query} with params {query_params}")
-        result = db.run(query, **query_params).single()
+        app.logger.debug("Executing node update for %s with keys %s", node_id, list(properties_to_update))
+        result = write_transaction(lambda q: q.single("update_node", node_id=node_id, props=properties_to_update))
         
         if result and result["n"]:
+            record_node_upsert(result["n"])
             updated_node_cytoscape = serialize_node_for_cytoscape(result["n"])
             return jsonify(updated_node_cytoscape), 200
         else:
-            app.logger.warning(f"Node not found or update failed for ID: {node_id}")
+            app.logger.warning("Node not found or update failed for ID: %s", node_id)
             return jsonify({"error": "Node not found or update failed"}), 404
     except ConnectionError as ce:
-        app.logger.error(f"Neo4j connection error in update_existing_node: {str(ce)}", exc_info=True)
+        app.logger.error("Neo4j connection error in update_existing_node: %s", ce, exc_info=True)
         return jsonify({"error": f"Database connection error: {str(ce)}"}), 503  
     except Exception as e:
-        app.logger.error(f"Error in update_existing_node: {str(e)}", exc_info=True)
+        app.logger.error("Error in update_existing_node: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if db:
-            db.close()
+
+
+def delete_job_accepted(job, message):
+    """构造后台删除任务的 HTTP 202 响应，Location 指向任务状态接口。"""
+    status_url = f"/api/jobs/{job.id}"
+    response = jsonify({"message": message, "job_id": job.id, "status_url": status_url})
+    response.headers['Location'] = status_url
+    return response, 202
 
 
 @app.route('/api/nodes/<node_id>', methods=['DELETE'])
 def delete_existing_node(node_id):
     """
     主要功能: 从 Neo4j 中删除一个节点及其所有关联关系。
-    工作逻辑: 接收节点 elementId。
-              执行 DETACH DELETE Cypher 查询。
-              返回成功消息和 HTTP 200。
+    工作逻辑: 接收节点 elementId，先统计其关系数。
+              - 关系数不超过 HUB_DELETE_THRESHOLD: 直接执行 DETACH DELETE，返回 HTTP 200。
+              - 关系数超过阈值（枢纽节点）或请求带 async=true: 提交后台任务分批删除，
+                立即返回 HTTP 202 和任务 ID，可通过 /api/jobs/<job_id> 查询进度。
+              - 该节点已有未结束的删除任务时，直接返回该任务（HTTP 202），不重复提交。
     参数 (路径参数):
         node_id (str): 要删除节点的 elementId。
+    参数 (URL Query):
+        async (str, 可选): 'true' 时无论关系数多少都使用后台任务。
     返回:
-        JSON: 成功或失败的信息。
+        JSON: 成功或失败的信息；后台删除时包含 job_id 和 status_url。
     影响: 对数据库进行写操作 (删除节点和关系)。
     """
-    db = None
     try:
         if not node_id:
             return jsonify({"error": "Node ID is required"}), 400
             
-        db = get_db_session()
-        app.logger.info(f"Executing node deletion for ID: {node_id}")
-        db.run("MATCH (n) WHERE elementId(n) = $node_id DETACH DELETE n", node_id=node_id)
+        force_async = request.args.get('async', 'false').lower() == 'true'
+        job_key = ("delete_node", node_id)
+        running = job_runner.active(job_key)
+        if running is not None:
+            return delete_job_accepted(running, f"Deletion of node {node_id} is already in progress")
+
+        degree = graph_stats.degree_of(node_id)
+        if degree is None:
+            degree = count_node_relationships(node_id)
+        if degree is None:
+            return jsonify({"error": f"Node {node_id} not found"}), 404
+
+        if force_async or degree > HUB_DELETE_THRESHOLD:
+            job, created = job_runner.submit("delete_node", delete_node_in_batches, key=job_key,
+                                             node_id=node_id, batch_size=DELETE_BATCH_SIZE)
+            if not created:
+                return delete_job_accepted(job, f"Deletion of node {node_id} is already in progress")
+            app.logger.info("Node %s has %s relationships, deleting in background job %s", node_id, degree, job.id)
+            return delete_job_accepted(job, f"Deletion of node {node_id} ({degree} relationships) accepted")
+
+        app.logger.info("Executing node deletion for ID: %s", node_id)
+        query_write("delete_node", node_id=node_id)
+        record_graph_change("node_delete", id=node_id)
         return jsonify({"message": f"Node {node_id} and its relationships deleted successfully"}), 200
     except ConnectionError as ce:
-        app.logger.error(f"Neo4j connection error in delete_existing_node: {str(ce)}", exc_info=True)
+        app.logger.error("Neo4j connection error in delete_existing_node: %s", ce, exc_info=True)
         return jsonify({"error": f"Database connection error: {str(ce)}"}), 503          
     except Exception as e:
-        app.logger.error(f"Error in delete_existing_node: {str(e)}", exc_info=True)
+        app.logger.error("Error in delete_existing_node: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if db:
-            db.close()
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    主要功能: 查询后台任务的状态、进度、吞吐量和错误信息。
+    参数 (路径参数):
+        job_id (str): 提交任务时返回的任务 ID。
+    返回:
+        JSON: 任务快照；任务不存在（或已被清理）时返回 404。
+    影响: 无数据库访问。
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/stats', methods=['GET'])
+def get_graph_stats():
+    """
+    主要功能: 返回图统计：节点/关系总数、各标签与关系类型的数量、度分布、孤立节点和最大枢纽。
+    工作逻辑: 直接读取增量维护的计数器（GraphStats），不读取图数据（仅在图版本号缓存过期时读取一次版本号）。
+    参数 (URL Query):
+        top (int, 可选): 返回的枢纽节点个数，默认 10，最多 100。
+        orphans (int, 可选): 返回的孤立节点个数，默认 50，最多 1000。
+    返回:
+        JSON: 统计数据与其反映的图版本（graph_version）；未启用时返回 404，
+              首次统计尚未完成或落后于当前图版本（重算已被请求）时 ready 为 false。
+    """
+    if not STATS_ENABLED:
+        return jsonify({"error": "Graph statistics are disabled (STATS_ENABLED=false)."}), 404
+    try:
+        top_n = min(max(int(request.args.get('top', 10)), 0), 100)
+        orphan_limit = min(max(int(request.args.get('orphans', 50)), 0), 1000)
+    except ValueError:
+        return jsonify({"error": "Parameters 'top' and 'orphans' must be integers."}), 400
+    return jsonify(graph_stats.snapshot(top_n, orphan_limit))
+
+
+@app.route('/api/replica/status', methods=['GET'])
+def get_replica_status():
+    """
+    主要功能: 返回内存图副本的状态（是否就绪、反映的图版本、规模、上次加载时间、错误）。
+    影响: 图版本号缓存过期时读取一次 Neo4j 中的版本号。
+    """
+    if not GRAPH_REPLICA_ENABLED:
+        return jsonify({"enabled": False, "ready": False})
+    return jsonify(graph_replica.status())
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    主要功能: 返回进程内的运行指标。
+    工作逻辑: 汇总 query_metrics（按语句名称的执行次数、首次/重复出现的语句文本的首条记录可用耗时、
+              语句文本复用率 statement_reuse_rate，它是 Neo4j 计划缓存命中率的上限而非命中率本身）、
+              各查询类别的准入统计、路径缓存命中情况与日志队列丢弃条数。
+    影响: 无数据库访问。
+    """
+    return jsonify({
+        "queries": query_metrics.snapshot(),
+        "admission": admission.snapshot() if ADMISSION_ENABLED else None,
+        "path_cache": {"hits": path_cache.hits, "misses": path_cache.misses},
+        "log_dropped": log_queue_handler.dropped if log_queue_handler else 0,
+    })
 
 
 @app.route('/api/relationships', methods=['POST'])
@@ -572,7 +3103,7 @@ def create_new_relationship():
     """
     主要功能: 在 Neo4j 中创建两个已存在节点之间的新关系。
     工作逻辑: 接收源/目标节点的 elementId, 关系类型和属性。
-              构造并执行 MATCH...CREATE Cypher 查询。
+              校验关系类型后执行固定的 MATCH...CREATE 语句，属性作为 $props 整体传入。
               返回新创建关系序列化后的数据和 HTTP 201。
     参数 (来自请求JSON body):
         source (str): 源节点的 elementId。
@@ -584,7 +3115,6 @@ def create_new_relationship():
         失败时为错误信息 JSON 和相应的 HTTP 状态码。
     影响: 对数据库进行写操作 (创建关系)。
     """
-    db = None
     try:
         data = request.json
         source_node_id = data.get('source')
@@ -593,41 +3123,27 @@ def create_new_relationship():
         if not relationship_type: relationship_type = "RELATED_TO"
         properties = data.get('properties', {})
 
-        app.logger.info(f"Backend: Add relationship request. Data: {data}")
+        app.logger.debug("Backend: Add relationship request %s -[%s]-> %s", data.get('source'), data.get('type'), data.get('target'))
 
         if not source_node_id or not target_node_id:
             app.logger.warning("Backend: Source or Target ID missing.")
             return jsonify({"error": "Source and target node IDs are mandatory"}), 400
-
-        db = get_db_session()
-        
-        prop_cypher_part = ""
-        if properties:
-            prop_list = [f"{key}: ${key}" for key in properties.keys()]
-            if prop_list:
-                prop_cypher_part = "{" + ", ".join(prop_list) + "}"
-        
-        # 使用占位符构建 CREATE 部分，属性在 query_params 中传递
-        cypher_create_rel_part = f"CREATE (a)-[r_new:{relationship_type} {prop_cypher_part}]->(b)"
-        
-        query = f"""
-            MATCH (a), (b)
-            WHERE elementId(a) = $source_id AND elementId(b) = $target_id
-            {cypher_create_rel_part}
-            RETURN r_new, a, b 
-        """ # a, b 在 RETURN 中是为了潜在的更丰富的对象信息，但主要依赖 r_new
-        query_params = {"source_id": source_node_id, "target_id": target_node_id, **properties}
-        
-        app.logger.info(f"Executing relationship creation: \n{query} \nwith params: {query_params}")
-        result_record = db.run(query, **query_params).single()
+        try:
+            validate_identifier(relationship_type, "relationship type")
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+
+        app.logger.debug("Executing relationship creation with keys %s", list(properties))
+        result_record = write_transaction(lambda q: q.single(
+            "create_relationship", relationship_type,
+            source_id=source_node_id, target_id=target_node_id, props=properties))
         
         r_new_from_record = result_record.get("r_new") if result_record else None
 
         if r_new_from_record is not None:
             created_relationship = r_new_from_record
-            app.logger.info(f"Relationship object obtained, proceeding with serialization for element_id: {created_relationship.element_id}")
+            record_relationship_upsert(created_relationship)
             new_rel_cytoscape = serialize_relationship_for_cytoscape(created_relationship)
-            app.logger.info(f"Relationship serialized: {new_rel_cytoscape}")
             return jsonify(new_rel_cytoscape), 201
         else:
             log_message = "Failed to obtain created relationship details from DB ('r_new' was None or not in result)."
@@ -635,12 +3151,13 @@ def create_new_relationship():
                 log_message += f" Record content: {dict(result_record)}"
             else:
                 log_message += " Query returned no records."
-            app.logger.warning(f"Backend: {log_message}")
+            app.logger.warning("Backend: %s", log_message)
             
             # 检查节点是否存在，以提供更准确的反馈
-            source_exists = db.run("MATCH (n) WHERE elementId(n) = $id RETURN count(n) > 0 AS exists", id=source_node_id).single()['exists']
-            target_exists = db.run("MATCH (n) WHERE elementId(n) = $id RETURN count(n) > 0 AS exists", id=target_node_id).single()['exists']
-            app.logger.warning(f"Backend: Node existence - Source '{source_node_id}': {source_exists}, Target '{target_node_id}': {target_exists}")
+            source_exists, target_exists = read_transaction(lambda q: (
+                q.single("node_exists", id=source_node_id)['exists'],
+                q.single("node_exists", id=target_node_id)['exists']))
+            app.logger.warning("Backend: Node existence - Source '%s': %s, Target '%s': %s", source_node_id, source_exists, target_node_id, target_exists)
             
             error_detail = "Ensure both source and target nodes exist."
             if not source_exists: error_detail = "Source node not found."
@@ -649,17 +3166,14 @@ def create_new_relationship():
 
             return jsonify({"error": f"Failed to create relationship. {error_detail}"}), 500
     except ConnectionError as ce:
-        app.logger.error(f"Neo4j connection error in create_new_relationship: {str(ce)}", exc_info=True)
+        app.logger.error("Neo4j connection error in create_new_relationship: %s", ce, exc_info=True)
         return jsonify({"error": f"Database connection error: {str(ce)}"}), 503  
     except ValueError as ve: # 通常来自序列化函数
-        app.logger.error(f"Data processing error in create_new_relationship: {str(ve)}", exc_info=True)
+        app.logger.error("Data processing error in create_new_relationship: %s", ve, exc_info=True)
         return jsonify({"error": f"Data processing error: {str(ve)}"}), 500
     except Exception as e:
-        app.logger.error(f"Unexpected error in create_new_relationship: {str(e)}", exc_info=True)
+        app.logger.error("Unexpected error in create_new_relationship: %s", e, exc_info=True)
         return jsonify({"error": f"An unexpected server error occurred: {str(e)}"}), 500
-    finally:
-        if db:
-            db.close()
 
 
 @app.route('/api/relationships/<relationship_id>', methods=['DELETE'])
@@ -675,25 +3189,21 @@ def delete_existing_relationship(relationship_id):
         JSON: 成功或失败的信息。
     影响: 对数据库进行写操作 (删除关系)。
     """
-    db = None
     try:
         if not relationship_id:
             return jsonify({"error": "Relationship ID is required"}), 400
             
-        db = get_db_session()
-        app.logger.info(f"Executing relationship deletion for ID: {relationship_id}")
+        app.logger.info("Executing relationship deletion for ID: %s", relationship_id)
         # 直接删除关系，不需要 DETACH，因为关系没有进一步的依赖
-        db.run("MATCH ()-[r]->() WHERE elementId(r) = $rel_id DELETE r", rel_id=relationship_id)
+        query_write("delete_relationship", rel_id=relationship_id)
+        record_graph_change("relationship_delete", id=relationship_id)
         return jsonify({"message": f"Relationship {relationship_id} deleted successfully"}), 200
     except ConnectionError as ce:
-        app.logger.error(f"Neo4j connection error in delete_existing_relationship: {str(ce)}", exc_info=True)
+        app.logger.error("Neo4j connection error in delete_existing_relationship: %s", ce, exc_info=True)
         return jsonify({"error": f"Database connection error: {str(ce)}"}), 503  
     except Exception as e:
-        app.logger.error(f"Error in delete_existing_relationship: {str(e)}", exc_info=True)
+        app.logger.error("Error in delete_existing_relationship: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if db:
-            db.close()
 
 
 # --- 在 app.py 中添加以下两个新的路由 ---
@@ -704,32 +3214,24 @@ def delete_existing_relationship(relationship_id):
 def get_node_labels():
     """
     主要功能: 动态地从 Neo4j 数据库获取所有存在的节点标签。
-    工作逻辑: 执行 'CALL db.labels()' 查询，处理结果并返回一个包含所有标签字符串的列表。
+    工作逻辑: 执行 'CALL db.labels()' 查询（排除内部使用的 GraphMeta），处理结果并返回一个包含所有标签字符串的列表。
     参数: 无。
     返回:
         JSON: 一个包含所有节点标签的数组，例如 ["Person", "Movie", "Organization"]。
     影响: 对数据库进行一次轻量级的读操作。
     """
-    db = None
     try:
-        db = get_db_session()
-        query = "CALL db.labels()"
-        app.logger.info(f"Executing schema query: {query}")
-        
-        results = db.run(query)
+        results = query_read("labels")
         
         # 从结果中提取标签字符串
         labels = [record["label"] for record in results]
         
-        app.logger.info(f"Fetched node labels from DB: {labels}")
+        app.logger.debug("Fetched node labels from DB: %s", labels)
         return jsonify(labels)
 
     except Exception as e:
-        app.logger.error(f"Error in get_node_labels: {e}", exc_info=True)
+        app.logger.error("Error in get_node_labels: %s", e, exc_info=True)
         return jsonify({"error": "Failed to fetch node labels from database."}), 500
-    finally:
-        if db:
-            db.close()
 
 # --- 在 app.py 的 API 端点部分添加这个新函数 ---
 
@@ -740,8 +3242,8 @@ def search_subgraph():
         根据用户提供的一个节点标签和一个关键词，搜索匹配的中心节点，
         并返回由这些中心节点及其直接邻居（1跳邻域）构成的子图数据。
         (此版本采用了与用户原有 get_full_graph_data 函数相同的、经过验证的稳健查询模式)
+        支持 fields 参数裁剪节点属性，见 requested_node_fields。
     """
-    db = None
     try:
         SEARCHABLE_PROPERTIES = {
             'Movie': 'title', 'Person': 'name', 'Organization': 'name', 'default': 'name'
@@ -752,18 +3254,27 @@ def search_subgraph():
         if not label or not keyword:
             return jsonify({"error": "Label and keyword parameters are required."}), 400
 
+        try:
+            validate_identifier(label, "label")
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+
         property_to_search = SEARCHABLE_PROPERTIES.get(label.capitalize(), SEARCHABLE_PROPERTIES['default'])
+
+        fields = requested_node_fields()
+        if graph_replica.ready:
+            return jsonify(project_graph_payload(graph_replica.search_payload(label, property_to_search, keyword), fields))
         
-        db = get_db_session()
-        
-        # --- 步骤 1: 查找并序列化所有匹配的中心节点 ---
-        center_nodes_query = f"""
-            MATCH (n:{label})
-            WHERE toLower(n.{property_to_search}) CONTAINS toLower($keyword)
-            RETURN n
-        """
-        center_nodes_result = db.run(center_nodes_query, keyword=keyword)
-        
+        # 中心节点与其邻域在同一个只读事务中查询
+        def fetch(q):
+            centers = q.run("search_nodes", label, property=property_to_search, keyword=keyword)
+            center_ids = list({record["n"].element_id for record in centers})
+            neighbourhood = q.run("neighbourhood", node_ids=center_ids) if center_ids else []
+            return centers, neighbourhood
+
+        center_nodes_result, edges_result = read_transaction(fetch)
+
+        # --- 步骤 1: 序列化所有匹配的中心节点 ---
         nodes_dict = {}
         center_node_ids = set()
         for record in center_nodes_result:
@@ -775,22 +3286,14 @@ def search_subgraph():
         if not center_node_ids:
             return jsonify({"nodes": [], "edges": [], "center_node_ids": []})
             
-        # --- 步骤 2: 查找与这些中心节点相连的所有关系及其两端节点 ---
-        # 这个查询会返回中心节点、关系、以及邻居节点
-        neighbor_query = """
-            MATCH (start_node)-[r]-(end_node)
-            WHERE elementId(start_node) IN $node_ids
-            RETURN start_node, r, end_node
-        """
-        edges_result = db.run(neighbor_query, node_ids=list(center_node_ids))
-        
+        # --- 步骤 2: 遍历与这些中心节点相连的所有关系及其两端节点 ---
         edges_list = []
         processed_rel_ids = set()
         
         for record in edges_result:
-            start_node = record["start_node"]
+            start_node = record["start_n"]
             relationship_obj = record["r"]
-            end_node = record["end_node"]
+            end_node = record["end_n"]
 
             # --- 步骤 3: 确保所有涉及的节点（包括邻居）都被序列化 ---
             # 如果起始节点不在字典中（理论上它应该在），则添加
@@ -808,20 +3311,17 @@ def search_subgraph():
                 edges_list.append(serialized_edge)
                 processed_rel_ids.add(relationship_obj.element_id)
         
-        app.logger.info(f"Search for '{keyword}' found {len(nodes_dict)} total nodes and {len(edges_list)} edges.")
+        app.logger.info("Search for '%s' found %s total nodes and %s edges.", keyword, len(nodes_dict), len(edges_list), extra=SAMPLED)
 
-        return jsonify({
+        return jsonify(project_graph_payload({
             "nodes": list(nodes_dict.values()), 
             "edges": edges_list,
             "center_node_ids": list(center_node_ids)
-        })
+        }, fields))
 
     except Exception as e:
-        app.logger.error(f"Error in search_subgraph: {e}", exc_info=True)
+        app.logger.error("Error in search_subgraph: %s", e, exc_info=True)
         return jsonify({"error": "An unexpected error occurred during search."}), 500
-    finally:
-        if db:
-            db.close()
 
 
 
@@ -831,28 +3331,18 @@ def expand_node(node_id):
     """
     获取指定节点的1跳邻域数据，用于交互式展开。
     (最终修正版：在Cypher中获取所有原始数据，Python只做拼接，零依赖)
+    支持 fields 参数裁剪节点属性，见 requested_node_fields。
     """
-    db = None
     try:
         if not node_id:
             return jsonify({"error": "Node ID is required."}), 400
 
-        db = get_db_session()
-        
-        # 1. 查询语句现在明确返回所有需要的原始数据，不再返回对象
-        query = """
-            MATCH (startNode)-[r]-(neighbor)
-            WHERE elementId(startNode) = $node_id
-            RETURN
-              elementId(r) AS rel_id,
-              type(r) AS rel_type,
-              properties(r) AS rel_props,
-              elementId(startNode) AS source_id,
-              elementId(neighbor) AS neighbor_id,
-              labels(neighbor) AS neighbor_labels,
-              properties(neighbor) AS neighbor_props
-        """
-        results = db.run(query, node_id=node_id).data()
+        fields = requested_node_fields()
+        if graph_replica.ready:
+            return jsonify(project_graph_payload(graph_replica.expand_payload(node_id), fields))
+
+        # 1. "expand" 语句明确返回所有需要的原始数据，不再返回对象
+        results = [record.data() for record in query_read("expand", node_id=node_id)]
         
         nodes_dict = {}
         edges_list = []
@@ -886,19 +3376,119 @@ def expand_node(node_id):
             }
             edges_list.append(edge_data)
 
-        app.logger.info(f"Expansion for node {node_id} will return {len(nodes_dict)} nodes and {len(edges_list)} edges.")
+        app.logger.info("Expansion for node %s will return %s nodes and %s edges.", node_id, len(nodes_dict), len(edges_list), extra=SAMPLED)
 
-        return jsonify({
+        return jsonify(project_graph_payload({
             "nodes": list(nodes_dict.values()), 
             "edges": edges_list
-        })
+        }, fields))
 
     except Exception as e:
-        app.logger.error(f"Error in expand_node: {e}", exc_info=True)
+        app.logger.error("Error in expand_node: %s", e, exc_info=True)
         return jsonify({"error": "An unexpected error occurred during node expansion."}), 500
-    finally:
-        if db:
-            db.close()
+
+
+@app.route('/api/path', methods=['GET'])
+def find_path():
+    """
+    主要功能: 查找两个知识点之间的最短路径（可选前 k 条最短路径），以 Cytoscape 元素返回。
+    工作逻辑: 
+        - 使用有界双向 BFS（忽略关系方向），展开节点数与耗时分别受
+          PATH_MAX_EXPANDED_NODES 与 PATH_TIME_LIMIT_MS 限制；k > 1 时使用 Yen 算法。
+        - 内存图副本就绪时直接在副本上搜索，否则每层前沿向 Neo4j 发起一次批量查询。
+        - 结果按 (图版本, 参数) 缓存；搜索被预算截断的结果不缓存。
+    参数 (URL Query):
+        from (str): 起点 elementId。
+        to (str): 终点 elementId。
+        max_depth (int, 可选): 最大跳数，默认 PATH_DEFAULT_DEPTH，不超过 PATH_MAX_DEPTH。
+        rel_types (str, 可选): 逗号分隔的关系类型（区分大小写，与 Cypher 一致），只沿这些类型的关系搜索。
+        k (int, 可选): 返回的路径条数，默认 1，不超过 PATH_MAX_K。
+        fields (str, 可选): 节点属性投影，见 requested_node_fields。
+    返回:
+        JSON: {"nodes", "edges", "paths": [{"node_ids", "edge_ids", "length"}],
+               "found", "truncated", "graph_version"}。
+    影响: 对数据库进行只读查询（副本未就绪时）。
+    """
+    try:
+        source_id = request.args.get('from', '').strip()
+        target_id = request.args.get('to', '').strip()
+        if not source_id or not target_id:
+            return jsonify({"error": "Parameters 'from' and 'to' are required."}), 400
+        try:
+            max_depth = int(request.args.get('max_depth', PATH_DEFAULT_DEPTH))
+            k = int(request.args.get('k', 1))
+        except ValueError:
+            return jsonify({"error": "Parameters 'max_depth' and 'k' must be integers."}), 400
+        if max_depth < 1 or k < 1:
+            return jsonify({"error": "Parameters 'max_depth' and 'k' must be positive."}), 400
+        max_depth = min(max_depth, PATH_MAX_DEPTH)
+        k = min(k, PATH_MAX_K)
+        rel_types = frozenset(t.strip() for t in request.args.get('rel_types', '').split(',') if t.strip())
+
+        version = graph_version.current
+        cache_key = (version, source_id, target_id, max_depth, rel_types, k)
+        fields = requested_node_fields()
+        cached = path_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(project_graph_payload(cached, fields))
+
+        if graph_replica.ready:
+            source = _ReplicaPathSource(graph_replica, rel_types)
+        else:
+            source = _Neo4jPathSource(rel_types)
+
+        missing = {source_id, target_id} - source.existing({source_id, target_id})
+        if missing:
+            return jsonify({"error": f"Node(s) not found: {', '.join(sorted(missing))}"}), 404
+
+        budget = _SearchBudget(PATH_MAX_EXPANDED_NODES, PATH_TIME_LIMIT_MS)
+        paths = find_k_shortest_paths(source_id, target_id, _AdjacencyCache(source), max_depth, k, budget)
+
+        node_ids = list(dict.fromkeys(node_id for nodes, _ in paths for node_id in nodes))
+        rel_ids = list(dict.fromkeys(rel_id for _, rels in paths for rel_id in rels))
+        nodes, edges = source.elements(node_ids, rel_ids) if paths else ([], [])
+
+        payload = {
+            "nodes": nodes,
+            "edges": edges,
+            "paths": [{"node_ids": nodes_, "edge_ids": rels, "length": len(rels)} for nodes_, rels in paths],
+            "found": bool(paths),
+            "truncated": budget.exhausted,
+            "graph_version": version,
+        }
+        if not budget.exhausted:
+            path_cache.put(cache_key, payload)
+        app.logger.info("Path %s -> %s: %s path(s), %s nodes expanded, truncated=%s",
+                        source_id, target_id, len(paths), budget.expanded, budget.exhausted, extra=SAMPLED)
+        return jsonify(project_graph_payload(payload, fields))
+
+    except ConnectionError as ce:
+        app.logger.error("Neo4j connection error in find_path: %s", ce, exc_info=True)
+        return jsonify({"error": f"Database connection error: {str(ce)}"}), 503
+    except Exception as e:
+        app.logger.error("Error in find_path: %s", e, exc_info=True)
+        return jsonify({"error": "An unexpected error occurred during path finding."}), 500
+
+
+# --- 后台服务 ---
+
+def start_background_services():
+    """建立 GraphMeta 约束，启动副本定期重新加载、统计定期重算与快照写入线程（按配置启用）。"""
+    if not driver:
+        return
+    ensure_graph_meta_constraint()
+    if GRAPH_REPLICA_ENABLED:
+        graph_replica.start_reconcile_loop(GRAPH_REPLICA_RECONCILE_SECONDS)
+    if STATS_ENABLED:
+        graph_stats.start_recount_loop(STATS_RECOUNT_SECONDS)
+    if SNAPSHOT_ENABLED:
+        snapshot_writer.start()
+
+
+# app.run(debug=True) 的重载器父进程也会执行本模块，但它只监视文件并重启子进程，不处理请求；
+# 后台服务只在处理请求的进程中启动（被 WSGI 服务器导入时，或重载器启动的子进程中）。
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_background_services()
 
 
 if __name__ == '__main__':
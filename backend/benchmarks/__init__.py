@@ -0,0 +1,5 @@
+"""
+可复现的负载与基准测试套件。
+
+    python -m benchmarks.run --help      (在 backend/ 目录下执行)
+"""
@@ -0,0 +1,389 @@
+"""
+进程内的 Neo4j 假驱动，用于在没有数据库的环境中对 app.py 的路由做基准测试。
+
+FakeDriver 只实现 app.py 实际使用的 driver/session/transaction/result 接口，
+并按语句文本匹配 app.py 中固定的 Cypher 语句，在内存中的 FakeGraph 上执行。
+遇到无法识别的语句时抛出 NotImplementedError，而不是静默返回空结果，
+这样 app.py 的查询改动后基准会立即失败，提醒同步更新这里的匹配规则。
+"""
+import itertools
+import re
+import threading
+import uuid
+
+
+class FakeNode:
+    """与 neo4j.graph.Node 读取接口一致的只读节点。"""
+    def __init__(self, element_id, labels, properties):
+        self.element_id = element_id
+        self.labels = frozenset(labels)
+        self._properties = dict(properties)
+
+    def keys(self):
+        return self._properties.keys()
+
+    def items(self):
+        return self._properties.items()
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+
+class FakeRelationship:
+    """与 neo4j.graph.Relationship 读取接口一致的只读关系。"""
+    def __init__(self, element_id, start_node, end_node, rel_type, properties):
+        self.element_id = element_id
+        self.start_node = start_node
+        self.end_node = end_node
+        self.type = rel_type
+        self._properties = dict(properties)
+
+    def keys(self):
+        return self._properties.keys()
+
+    def items(self):
+        return self._properties.items()
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+
+class FakeRecord(dict):
+    """neo4j.Record 的最小替代：支持 record["key"]、record.get() 与 dict(record)。"""
+
+    def data(self):
+        return dict(self)
+
+
+class FakeResult:
+    def __init__(self, records):
+        self._records = [FakeRecord(r) for r in records]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def data(self):
+        return [dict(r) for r in self._records]
+
+    def consume(self):
+        return None
+
+
+class FakeGraph:
+    """
+    线程安全的内存属性图。节点与关系以 elementId 为键保存；
+    load() 接收 benchmarks.generate.generate_graph() 生成的数据。
+    app.py 的 (:GraphMeta) 版本节点不计入 nodes，单独保存在 meta 中（epoch, version）。
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.nodes = {}   # element_id -> (labels tuple, props dict)
+        self.rels = {}    # element_id -> (source_id, target_id, type, props dict)
+        self.adjacency = {}  # element_id -> set(rel_id)
+        self._ids = itertools.count(1)
+        self.meta = None
+
+    def load(self, graph):
+        with self.lock:
+            for node in graph["nodes"]:
+                self.add_node(node["labels"], node["properties"], element_id=node["id"])
+            for rel in graph["relationships"]:
+                self.add_rel(rel["source"], rel["target"], rel["type"], rel["properties"], element_id=rel["id"])
+
+    def new_id(self, prefix):
+        return f"{prefix}:fake:{next(self._ids)}"
+
+    def add_node(self, labels, props, element_id=None):
+        element_id = element_id or self.new_id("4")
+        self.nodes[element_id] = (tuple(labels), dict(props))
+        self.adjacency.setdefault(element_id, set())
+        return element_id
+
+    def add_rel(self, source_id, target_id, rel_type, props, element_id=None):
+        element_id = element_id or self.new_id("5")
+        self.rels[element_id] = (source_id, target_id, rel_type, dict(props))
+        self.adjacency[source_id].add(element_id)
+        self.adjacency[target_id].add(element_id)
+        return element_id
+
+    def delete_rel(self, rel_id):
+        rel = self.rels.pop(rel_id, None)
+        if rel:
+            self.adjacency[rel[0]].discard(rel_id)
+            self.adjacency[rel[1]].discard(rel_id)
+        return rel is not None
+
+    def delete_node(self, node_id):
+        if node_id not in self.nodes:
+            return False
+        for rel_id in list(self.adjacency[node_id]):
+            self.delete_rel(rel_id)
+        del self.nodes[node_id]
+        del self.adjacency[node_id]
+        return True
+
+    # --- 构造返回对象 ---
+
+    def node(self, node_id):
+        labels, props = self.nodes[node_id]
+        return FakeNode(node_id, labels, props)
+
+    def rel(self, rel_id):
+        source_id, target_id, rel_type, props = self.rels[rel_id]
+        return FakeRelationship(rel_id, FakeNode(source_id, (), {}), FakeNode(target_id, (), {}), rel_type, props)
+
+    def incident(self, node_id):
+        """按 Cypher 无向匹配 (n)-[r]-(m) 的语义返回 (rel_id, 邻居ID)，自环出现两次。"""
+        for rel_id in self.adjacency.get(node_id, ()):
+            source_id, target_id, _, _ = self.rels[rel_id]
+            if source_id == target_id:
+                yield rel_id, node_id
+                yield rel_id, node_id
+            else:
+                yield rel_id, target_id if source_id == node_id else source_id
+
+
+def _is_init(value):
+    if isinstance(value, bool):
+        return False
+    return value == '1' or (isinstance(value, (int, float)) and value == 1)
+
+
+class _Executor:
+    """把规范化后的语句文本分派给对应的处理函数。"""
+    def __init__(self, graph):
+        self.g = graph
+        self.handlers = [
+            (r"^MATCH \(n\) WHERE n\.init = '1' OR n\.init = 1 RETURN n$", self.init_nodes),
+            (r"^MATCH \(n\) WHERE NOT n:GraphMeta RETURN n$", self.all_nodes),
+            (r"^MATCH \((\w+)\)-\[r\]-\((\w+)\) WHERE elementId\(\1\) IN \$node_ids RETURN", self.neighbourhood),
+            (r"^MATCH \(n:(\w+)\) WHERE toLower\(n\[\$property\]\) CONTAINS toLower\(\$keyword\) RETURN n$", self.search),
+            (r"^MATCH \(startNode\)-\[r\]-\(neighbor\) WHERE elementId\(startNode\) = \$node_id RETURN", self.expand),
+            (r"^CREATE \(n:(\w+)\) SET n = \$props RETURN n$", self.create_node),
+            (r"^MATCH \(n\) WHERE elementId\(n\) = \$node_id SET n \+= \$props RETURN n$", self.update_node),
+            (r"^MATCH \(n\) WHERE elementId\(n\) = \$node_id RETURN COUNT \{ \(n\)--\(\) \} AS degree$", self.degree),
+            (r"^MATCH \(n\) WHERE elementId\(n\) = \$node_id DETACH DELETE n", self.delete_node),
+            (r"^MATCH \(n\)-\[r\]-\(\) WHERE elementId\(n\) = \$node_id WITH DISTINCT r LIMIT \$batch_size", self.delete_rel_batch),
+            (r"^MATCH \(a\) WHERE elementId\(a\) = \$source_id MATCH \(b\) WHERE elementId\(b\) = \$target_id "
+             r"CREATE \(a\)-\[r_new:(\w+)\]->\(b\) SET r_new = \$props RETURN r_new, a, b$", self.create_rel),
+            (r"^MATCH \(n\) WHERE elementId\(n\) = \$id RETURN count\(n\) > 0 AS exists$", self.node_exists),
+            (r"^MATCH \(\)-\[r\]->\(\) WHERE elementId\(r\) = \$rel_id DELETE r RETURN count\(r\) AS deleted$", self.delete_rel),
+            (r"^CALL db\.labels\(\) YIELD label WHERE label <> 'GraphMeta' RETURN label$", self.labels),
+            (r"^MATCH \(n\) WHERE NOT n:GraphMeta RETURN elementId\(n\) AS id, labels\(n\) AS labels, "
+             r"properties\(n\) AS props$", self.dump_nodes),
+            (r"^MATCH \(n\) WHERE NOT n:GraphMeta RETURN elementId\(n\) AS id, labels\(n\) AS labels, "
+             r"coalesce\(n\.name, n\.title\) AS name$", self.dump_node_names),
+            (r"^MATCH \(m:GraphMeta \{id: 'graph'\}\) RETURN m\.epoch \+ '-' \+ toString\(m\.version\) AS version$",
+             self.graph_version),
+            (r"^MERGE \(m:GraphMeta \{id: 'graph'\}\) ON CREATE SET m\.epoch = randomUUID\(\), m\.version = 0 "
+             r"SET m\.version = m\.version \+ 1 RETURN", self.bump_graph_version),
+            (r"^CREATE CONSTRAINT graph_meta_id IF NOT EXISTS ", self.create_constraint),
+            (r"^MATCH \(a\)-\[r\]->\(b\) RETURN elementId\(r\) AS id, elementId\(a\) AS source, elementId\(b\) AS target, "
+             r"type\(r\) AS type(, properties\(r\) AS props)?$", self.dump_rels),
+            (r"^MATCH \(n\) WHERE elementId\(n\) IN \$ids RETURN elementId\(n\) AS id$", self.existing_ids),
+            (r"^MATCH \(n\)-\[r\]-\(m\) WHERE elementId\(n\) IN \$ids AND", self.path_adjacency),
+            (r"^MATCH \(n\) WHERE elementId\(n\) IN \$ids RETURN n$", self.nodes_by_id),
+            (r"^MATCH \(\)-\[r\]->\(\) WHERE elementId\(r\) IN \$ids RETURN r$", self.rels_by_id),
+        ]
+        self.handlers = [(re.compile(pattern), handler) for pattern, handler in self.handlers]
+
+    def run(self, query, params):
+        text = " ".join(str(query).split())
+        for pattern, handler in self.handlers:
+            match = pattern.search(text)
+            if match:
+                with self.g.lock:
+                    return FakeResult(handler(match, params))
+        raise NotImplementedError(f"FakeDriver does not understand query: {text}")
+
+    # --- 读 ---
+
+    def init_nodes(self, m, p):
+        return [{"n": self.g.node(i)} for i, (_, props) in self.g.nodes.items() if _is_init(props.get("init"))]
+
+    def all_nodes(self, m, p):
+        return [{"n": self.g.node(i)} for i in self.g.nodes]
+
+    def neighbourhood(self, m, p):
+        start_alias, end_alias = m.group(1), m.group(2)
+        records = []
+        for node_id in p["node_ids"]:
+            if node_id not in self.g.nodes:
+                continue
+            start = self.g.node(node_id)
+            for rel_id, other in self.g.incident(node_id):
+                records.append({start_alias: start, "r": self.g.rel(rel_id), end_alias: self.g.node(other)})
+        return records
+
+    def search(self, m, p):
+        label, prop = m.group(1), p["property"]
+        keyword = p["keyword"].lower()
+        return [
+            {"n": self.g.node(i)} for i, (labels, props) in self.g.nodes.items()
+            if label in labels and isinstance(props.get(prop), str) and keyword in props[prop].lower()
+        ]
+
+    def expand(self, m, p):
+        node_id = p["node_id"]
+        records = []
+        for rel_id, other in self.g.incident(node_id):
+            _, _, rel_type, rel_props = self.g.rels[rel_id]
+            labels, props = self.g.nodes[other]
+            records.append({
+                "rel_id": rel_id, "rel_type": rel_type, "rel_props": dict(rel_props),
+                "source_id": node_id, "neighbor_id": other,
+                "neighbor_labels": list(labels), "neighbor_props": dict(props),
+            })
+        return records
+
+    def degree(self, m, p):
+        node_id = p["node_id"]
+        if node_id not in self.g.nodes:
+            return []
+        return [{"degree": sum(1 for _ in self.g.incident(node_id))}]
+
+    def node_exists(self, m, p):
+        return [{"exists": p["id"] in self.g.nodes}]
+
+    def labels(self, m, p):
+        return [{"label": label} for label in sorted({l for labels, _ in self.g.nodes.values() for l in labels})]
+
+    def dump_nodes(self, m, p):
+        return [{"id": i, "labels": list(labels), "props": dict(props)} for i, (labels, props) in self.g.nodes.items()]
+
+    def dump_node_names(self, m, p):
+        # coalesce(n.name, n.title)：只跳过 null，空字符串、0 与 false 仍是 name
+        return [{"id": i, "labels": list(labels),
+                 "name": props["name"] if props.get("name") is not None else props.get("title")}
+                for i, (labels, props) in self.g.nodes.items()]
+
+    def dump_rels(self, m, p):
+        return [{"id": i, "source": s, "target": t, "type": rel_type, "props": dict(props)}
+                for i, (s, t, rel_type, props) in self.g.rels.items()]
+
+    def graph_version(self, m, p):
+        if self.g.meta is None:
+            return []
+        return [{"version": f"{self.g.meta[0]}-{self.g.meta[1]}"}]
+
+    def existing_ids(self, m, p):
+        return [{"id": i} for i in p["ids"] if i in self.g.nodes]
+
+    def path_adjacency(self, m, p):
+        rel_types = p.get("rel_types")
+        return [
+            {"node_id": node_id, "rel_id": rel_id, "neighbor_id": other}
+            for node_id in p["ids"] if node_id in self.g.nodes
+            for rel_id, other in self.g.incident(node_id)
+            if not rel_types or self.g.rels[rel_id][2] in rel_types
+        ]
+
+    def nodes_by_id(self, m, p):
+        return [{"n": self.g.node(i)} for i in p["ids"] if i in self.g.nodes]
+
+    def rels_by_id(self, m, p):
+        return [{"r": self.g.rel(i)} for i in p["ids"] if i in self.g.rels]
+
+    # --- 写 ---
+
+    def create_node(self, m, p):
+        props = {k: v for k, v in p["props"].items() if v is not None}
+        node_id = self.g.add_node([m.group(1)], props)
+        return [{"n": self.g.node(node_id)}]
+
+    def update_node(self, m, p):
+        node_id = p["node_id"]
+        if node_id not in self.g.nodes:
+            return []
+        props = self.g.nodes[node_id][1]
+        for key, value in p["props"].items():
+            if value is None:
+                props.pop(key, None)
+            else:
+                props[key] = value
+        return [{"n": self.g.node(node_id)}]
+
+    def delete_node(self, m, p):
+        deleted = self.g.delete_node(p["node_id"])
+        return [{"deleted": int(deleted)}]
+
+    def delete_rel_batch(self, m, p):
+        rel_ids = list(self.g.adjacency.get(p["node_id"], ()))[:p["batch_size"]]
+        for rel_id in rel_ids:
+            self.g.delete_rel(rel_id)
+        return [{"deleted_ids": rel_ids}]
+
+    def create_rel(self, m, p):
+        source_id, target_id = p["source_id"], p["target_id"]
+        if source_id not in self.g.nodes or target_id not in self.g.nodes:
+            return []
+        props = {k: v for k, v in p["props"].items() if v is not None}
+        rel_id = self.g.add_rel(source_id, target_id, m.group(1), props)
+        return [{"r_new": self.g.rel(rel_id), "a": self.g.node(source_id), "b": self.g.node(target_id)}]
+
+    def delete_rel(self, m, p):
+        deleted = self.g.delete_rel(p["rel_id"])
+        return [{"deleted": int(deleted)}]
+
+    def bump_graph_version(self, m, p):
+        epoch, version = self.g.meta or (str(uuid.uuid4()), 0)
+        self.g.meta = (epoch, version + 1)
+        return self.graph_version(m, p)
+
+    def create_constraint(self, m, p):
+        return []
+
+
+class FakeTransaction:
+    def __init__(self, executor):
+        self._executor = executor
+
+    def run(self, query, parameters=None, **kwargs):
+        return self._executor.run(query, {**(parameters or {}), **kwargs})
+
+
+class FakeSession:
+    def __init__(self, executor):
+        self._executor = executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        return self._executor.run(query, {**(parameters or {}), **kwargs})
+
+    def execute_read(self, transaction_function, *args, **kwargs):
+        return transaction_function(FakeTransaction(self._executor), *args, **kwargs)
+
+    execute_write = execute_read
+
+
+class FakeDriver:
+    """替代 neo4j.GraphDatabase.driver() 返回的 Driver，所有会话共享同一个 FakeGraph。"""
+    def __init__(self, graph):
+        self.graph = graph
+        self._executor = _Executor(graph)
+
+    def session(self, **config):
+        return FakeSession(self._executor)
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        pass
@@ -0,0 +1,122 @@
+"""
+合成知识图谱生成器。
+
+generate_graph() 根据节点数、平均度、度偏斜和长文本属性大小生成一张可复现的图
+（相同参数与 seed 总是生成相同的数据），可以直接装入 FakeGraph，
+也可以用 load_into_neo4j() 写入本地 Neo4j 实例。
+"""
+import bisect
+import itertools
+import random
+
+LABELS = ["Concept", "Topic", "Course", "Resource"]
+LABEL_WEIGHTS = [0.6, 0.25, 0.05, 0.1]
+REL_TYPES = ["RELATED_TO", "PREREQUISITE_OF", "PART_OF", "EXPLAINS"]
+VOCABULARY = [
+    "graph", "tree", "matrix", "vector", "limit", "integral", "derivative", "entropy", "kernel",
+    "sorting", "hashing", "recursion", "protocol", "network", "compiler", "theorem", "proof",
+    "algebra", "geometry", "probability", "statistics", "signal", "circuit", "memory", "process",
+]
+
+
+def _power_law_sampler(n, skew, rng):
+    """
+    返回一个按 1/(rank+1)^skew 权重抽取节点下标的函数。
+    skew=0 为均匀分布；skew 越大，少数枢纽节点占据的关系越多。
+    """
+    ranks = list(range(n))
+    rng.shuffle(ranks)
+    cumulative = list(itertools.accumulate(1.0 / (r + 1) ** skew for r in range(n)))
+    total = cumulative[-1]
+
+    def sample():
+        return ranks[bisect.bisect_left(cumulative, rng.random() * total)]
+    return sample
+
+
+def generate_graph(nodes=2000, avg_degree=4.0, skew=1.0, prop_bytes=256, init_fraction=0.02, seed=42):
+    """
+    主要功能: 生成合成知识图谱。
+    参数:
+        nodes (int): 节点数。
+        avg_degree (float): 平均度，关系数约为 nodes * avg_degree / 2。
+        skew (float): 度偏斜（幂律指数），0 为均匀。
+        prop_bytes (int): 每个节点长文本属性 description 的大小（字节）。
+        init_fraction (float): 带 init=1 属性（出现在初始图谱中）的节点比例。
+        seed (int): 随机种子。
+    返回:
+        dict: {"nodes": [{"id", "labels", "properties"}],
+               "relationships": [{"id", "source", "target", "type", "properties"}],
+               "keywords": [可用于 /api/search 的关键词]}
+    """
+    rng = random.Random(seed)
+    node_list = []
+    for i in range(nodes):
+        label = rng.choices(LABELS, LABEL_WEIGHTS)[0]
+        words = rng.sample(VOCABULARY, 2)
+        filler = " ".join(rng.choice(VOCABULARY) for _ in range(prop_bytes // 6 + 1))[:prop_bytes]
+        properties = {
+            "name": f"{words[0].capitalize()} {words[1]} {i}",
+            "description": filler,
+            "level": rng.randint(1, 5),
+        }
+        if rng.random() < init_fraction:
+            properties["init"] = 1
+        node_list.append({"id": f"4:bench:{i}", "labels": [label], "properties": properties})
+
+    sample = _power_law_sampler(nodes, skew, rng)
+    rel_list = []
+    for i in range(int(nodes * avg_degree / 2)):
+        source = sample()
+        target = rng.randrange(nodes)
+        if source == target:
+            target = (target + 1) % nodes
+        if rng.random() < 0.5:
+            source, target = target, source
+        rel_list.append({
+            "id": f"5:bench:{i}",
+            "source": f"4:bench:{source}",
+            "target": f"4:bench:{target}",
+            "type": rng.choice(REL_TYPES),
+            "properties": {"weight": round(rng.random(), 3)},
+        })
+    return {"nodes": node_list, "relationships": rel_list, "keywords": VOCABULARY}
+
+
+def load_into_neo4j(driver, graph, batch_size=1000):
+    """
+    主要功能: 把 generate_graph() 的结果批量写入 Neo4j。
+    工作逻辑: 按标签/关系类型分组，用 UNWIND 分批创建；生成的 ID 被替换为数据库分配的
+              elementId，并原地更新 graph 中的 id/source/target，便于后续按 ID 发起请求。
+    影响: 对数据库进行写操作，不会清理已有数据。
+    """
+    id_map = {}
+    with driver.session() as session:
+        for label in LABELS:
+            rows = [{"key": n["id"], "props": n["properties"]} for n in graph["nodes"] if n["labels"][0] == label]
+            for start in range(0, len(rows), batch_size):
+                result = session.run(
+                    f"UNWIND $rows AS row CREATE (n:{label}) SET n = row.props "
+                    "RETURN row.key AS key, elementId(n) AS id",
+                    rows=rows[start:start + batch_size])
+                id_map.update({record["key"]: record["id"] for record in result})
+        for node in graph["nodes"]:
+            node["id"] = id_map[node["id"]]
+
+        for rel_type in REL_TYPES:
+            rels = [r for r in graph["relationships"] if r["type"] == rel_type]
+            rows = [{"key": r["id"], "s": id_map[r["source"]], "t": id_map[r["target"]], "props": r["properties"]}
+                    for r in rels]
+            for start in range(0, len(rows), batch_size):
+                result = session.run(
+                    "UNWIND $rows AS row "
+                    "MATCH (a) WHERE elementId(a) = row.s MATCH (b) WHERE elementId(b) = row.t "
+                    f"CREATE (a)-[r:{rel_type}]->(b) SET r = row.props "
+                    "RETURN row.key AS key, elementId(r) AS id",
+                    rows=rows[start:start + batch_size])
+                rel_ids = {record["key"]: record["id"] for record in result}
+                for rel in rels[start:start + batch_size]:
+                    rel["id"] = rel_ids[rel["id"]]
+                    rel["source"] = id_map[rel["source"]]
+                    rel["target"] = id_map[rel["target"]]
+    return graph
@@ -0,0 +1,466 @@
+"""
+LTI 启动风暴负载回放与基准测试。
+
+在 backend/ 目录下执行，例如:
+
+    # 进程内假驱动（无需 Neo4j），结果写入 JSON 以便跨提交比较
+    python -m benchmarks.run --target fake --nodes 5000 --skew 1.2 --concurrency 16 \
+        --requests 5000 --output bench-results/$(git rev-parse --short HEAD).json
+
+    # 本地 Neo4j（--load 先写入合成数据；不会清理已有数据，请使用专用的测试库；
+    # 不带 --load 时对库中已有的节点发起请求）
+    python -m benchmarks.run --target neo4j --neo4j-uri bolt://localhost:7687 --load
+
+    # 对已运行的服务发起 HTTP 请求，并与之前的结果比较
+    python -m benchmarks.run --target http --base-url http://127.0.0.1:5000 --compare old.json
+
+请求组合由 --mix 指定（权重）：launch（LTI 启动 + 初始图谱）、graph（全图）、
+search、expand、path、write（编辑操作）。相同的参数与 --seed 会生成相同的图和请求序列。
+每个路由报告 p50/p95/p99 延迟、吞吐量、错误数与被准入控制拒绝（503）的次数；
+峰值 RSS 是整个被测进程在计时阶段的峰值（summary.peak_rss_mb，由单独的采样线程每
+--rss-interval-ms 读取一次），不区分路由。需要单个路由的内存峰值时，用 --mix 只运行该路由。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from unittest import mock
+
+from benchmarks.generate import generate_graph, load_into_neo4j
+
+DEFAULT_MIX = "launch=20,graph=2,search=15,expand=50,path=3,write=10"
+
+
+# --- 资源占用 ---
+
+def current_rss_bytes(pid="self"):
+    """读取进程当前的常驻内存；不支持 /proc 的平台退回到 ru_maxrss（峰值）。"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        if pid != "self":
+            return None
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class RssSampler:
+    """在单独的线程中定期读取被测进程的 RSS 并记录峰值，请求线程不做任何额外的 I/O。"""
+    def __init__(self, pid, interval_seconds):
+        self._pid = pid
+        self._interval = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self.peak = 0
+        self.samples = 0
+
+    def _sample(self):
+        rss = current_rss_bytes(self._pid)
+        if rss:
+            self.peak = max(self.peak, rss)
+            self.samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def __enter__(self):
+        if self._pid:
+            self._sample()
+            self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+
+# --- 客户端 ---
+
+class InProcessClient:
+    """通过 Flask test_client 在进程内调用路由，不经过网络。"""
+    def __init__(self, flask_app):
+        self._client = flask_app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self._client.open(path, method=method, json=json_body, data=form)
+        body = response.get_json(silent=True)
+        return response.status_code, body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """不跟随重定向，让 /lti_launch 的 302 与进程内客户端一样被如实记录。"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient:
+    """通过 HTTP 调用已运行的服务（不跟随重定向）。"""
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip("/")
+        self._opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, method, path, json_body=None, form=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self._base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self._opener.open(req) as response:
+                raw, status = response.read(), response.status
+        except urllib.error.HTTPError as e:
+            raw, status = e.read(), e.code
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+
+# --- 统计 ---
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.shed = 0
+
+
+class Recorder:
+    """线程安全地按路由记录延迟、错误与被准入控制拒绝（503）的次数。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, seconds, ok, shed=False):
+        with self._lock:
+            stats = self.routes.setdefault(route, RouteStats())
+            stats.latencies.append(seconds)
+            if shed:
+                stats.shed += 1
+            elif not ok:
+                stats.errors += 1
+
+
+def percentile(sorted_values, pct):
+    """最近秩（nearest-rank）百分位数。"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.4999)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(recorder, wall_seconds, rss_sampler):
+    routes = {}
+    for route, stats in sorted(recorder.routes.items()):
+        values = sorted(stats.latencies)
+        routes[route] = {
+            "count": len(values),
+            "errors": stats.errors,
+            "shed": stats.shed,
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+            "throughput_rps": round(len(values) / wall_seconds, 2),
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "shed": sum(r["shed"] for r in routes.values()),
+        "throughput_rps": round(total / wall_seconds, 2) if wall_seconds else None,
+        # 整个被测进程在计时阶段的 RSS 峰值（采样得到），不是某个路由的峰值
+        "peak_rss_mb": round(rss_sampler.peak / 2 ** 20, 1) if rss_sampler.peak else None,
+        "rss_samples": rss_sampler.samples,
+    }, routes
+
+
+# --- 负载 ---
+
+class Workload:
+    """
+    按 --mix 权重生成请求序列。每个工作线程有独立的、由 seed 派生的随机数发生器，
+    因此相同参数下请求序列可复现（线程调度导致的交错顺序除外）。
+    """
+    def __init__(self, client, recorder, node_ids, keywords, mix, seed):
+        self.client = client
+        self.recorder = recorder
+        self.node_ids = node_ids
+        self.keywords = keywords
+        self.ops = list(mix.keys())
+        self.weights = list(mix.values())
+        self.rng = random.Random(seed)
+        self.created_rels = []
+
+    def _call(self, route, method, path, json_body=None, form=None):
+        started = time.perf_counter()
+        try:
+            status, body = self.client.request(method, path, json_body=json_body, form=form)
+            ok = status < 400
+        except Exception:
+            status, body, ok = None, None, False
+        self.recorder.record(route, time.perf_counter() - started, ok, shed=status == 503)
+        return status, body
+
+    def step(self):
+        getattr(self, "op_" + self.rng.choices(self.ops, self.weights)[0])()
+
+    def op_launch(self):
+        self._call("POST /lti_launch", "POST", "/lti_launch", form={"roles": "Learner"})
+        self._call("GET /api/graph", "GET", "/api/graph")
+
+    def op_graph(self):
+        self._call("GET /api/graph?init=false", "GET", "/api/graph?init=false")
+
+    def op_search(self):
+        keyword = self.rng.choice(self.keywords)
+        self._call("GET /api/search", "GET", f"/api/search?label=Concept&keyword={urllib.parse.quote(keyword)}")
+
+    def op_expand(self):
+        node_id = self.rng.choice(self.node_ids)
+        self._call("GET /api/expand/<id>", "GET", f"/api/expand/{urllib.parse.quote(node_id, safe='')}")
+
+    def op_path(self):
+        source, target = self.rng.sample(self.node_ids, 2)
+        query = urllib.parse.urlencode({"from": source, "to": target, "max_depth": 6})
+        self._call("GET /api/path", "GET", f"/api/path?{query}")
+
+    def op_write(self):
+        roll = self.rng.random()
+        if roll < 0.5:
+            node_id = self.rng.choice(self.node_ids)
+            self._call("PUT /api/nodes/<id>", "PUT", f"/api/nodes/{urllib.parse.quote(node_id, safe='')}",
+                       json_body={"properties": {"level": self.rng.randint(1, 5)}})
+        elif roll < 0.6:
+            self._call("POST /api/nodes", "POST", "/api/nodes",
+                       json_body={"label": "Concept", "properties": {"name": f"bench {self.rng.random():.6f}"}})
+        elif self.created_rels and roll < 0.8:
+            rel_id = self.created_rels.pop()
+            self._call("DELETE /api/relationships/<id>", "DELETE",
+                       f"/api/relationships/{urllib.parse.quote(rel_id, safe='')}")
+        else:
+            source, target = self.rng.sample(self.node_ids, 2)
+            status, body = self._call("POST /api/relationships", "POST", "/api/relationships",
+                                      json_body={"source": source, "target": target, "type": "RELATED_TO"})
+            if status == 201 and body:
+                self.created_rels.append(body["data"]["id"])
+
+
+def fetch_node_ids(client):
+    """从目标服务读取现有节点 ID，用于未写入合成数据的目标。"""
+    status, body = client.request("GET", "/api/graph?init=false&fields=summary")
+    if status != 200:
+        raise SystemExit(f"could not read node ids from the target graph (HTTP {status})")
+    return [n["data"]["id"] for n in (body or {}).get("nodes", [])]
+
+
+def run_load(make_client, recorder, node_ids, keywords, mix, concurrency, requests, seed):
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        workload = Workload(make_client(), recorder, node_ids, keywords, mix, seed * 1000 + index)
+        start_barrier.wait()
+        for _ in range(per_worker[index]):
+            workload.step()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+# --- 目标环境 ---
+
+def import_app(driver_factory):
+    """
+    导入 app 模块。driver_factory 不为 None 时替换 GraphDatabase.driver，
+    使 app 在导入时拿到假驱动，并照常启动副本、统计等后台服务。
+    """
+    os.environ.setdefault("FRONTEND_PUBLIC_URL", "http://localhost:5173")
+    if driver_factory is None:
+        import app as app_module
+        return app_module
+    from neo4j import GraphDatabase
+    with mock.patch.object(GraphDatabase, "driver", side_effect=lambda *a, **kw: driver_factory()):
+        import app as app_module
+    return app_module
+
+
+def wait_for_background_services(app_module, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        replica_ok = not app_module.GRAPH_REPLICA_ENABLED or app_module.graph_replica.ready
+        stats_ok = not app_module.STATS_ENABLED or app_module.graph_stats.ready
+        if replica_ok and stats_ok:
+            return
+        time.sleep(0.05)
+    raise TimeoutError("Background services (replica/stats) did not become ready")
+
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             text=True, stderr=subprocess.DEVNULL).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# --- 输出 ---
+
+def print_report(summary, routes, baseline=None):
+    header = f"{'route':32} {'count':>7} {'err':>5} {'shed':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, r in routes.items():
+        print(f"{route:32} {r['count']:>7} {r['errors']:>5} {r['shed']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['throughput_rps']:>9.1f}")
+        if baseline and route in baseline:
+            b = baseline[route]
+
+            def delta(key):
+                return f"{(r[key] - b[key]) / b[key] * 100:+.1f}%" if b.get(key) else "n/a"
+            print(f"{'  vs baseline':32} {'':>7} {'':>5} {'':>5} {delta('p50_ms'):>9} {delta('p95_ms'):>9} "
+                  f"{delta('p99_ms'):>9} {delta('throughput_rps'):>9}")
+    print("-" * len(header))
+    print(f"total: {summary['requests']} requests, {summary['errors']} errors, {summary['shed']} shed, "
+          f"{summary['throughput_rps']} req/s over {summary['wall_seconds']} s, "
+          f"process peak RSS {summary['peak_rss_mb'] or '-'} MB")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Workload, "op_" + name):
+            raise argparse.ArgumentTypeError(f"unknown operation in --mix: {name}")
+        if float(weight) > 0:
+            mix[name] = float(weight)
+    if not mix:
+        raise argparse.ArgumentTypeError("--mix must contain at least one positive weight")
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay an LTI launch-storm workload against the KG backend.")
+    parser.add_argument("--target", choices=["fake", "neo4j", "http"], default="fake")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="server URL for --target http")
+    parser.add_argument("--server-pid", help="read peak RSS of this process (for --target http)")
+    parser.add_argument("--neo4j-uri", default=os.environ.get("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--neo4j-user", default=os.environ.get("NEO4J_USER", "neo4j"))
+    parser.add_argument("--neo4j-password", default=os.environ.get("NEO4J_PASSWORD", ""))
+    parser.add_argument("--load", action="store_true", help="write the synthetic graph into Neo4j first")
+    parser.add_argument("--replica", action="store_true", help="enable the in-memory graph replica")
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--avg-degree", type=float, default=4.0)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--prop-bytes", type=int, default=256)
+    parser.add_argument("--init-fraction", type=float, default=0.02)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rss-interval-ms", type=float, default=50, help="RSS sampling interval of the measured run")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    graph = generate_graph(args.nodes, args.avg_degree, args.skew, args.prop_bytes, args.init_fraction, args.seed)
+    os.environ["GRAPH_REPLICA_ENABLED"] = "true" if args.replica else "false"
+    os.environ.setdefault("SNAPSHOT_ENABLED", "false")
+
+    rss_pid = "self"
+    if args.target == "http":
+        make_client = lambda: HttpClient(args.base_url)
+        rss_pid = args.server_pid
+        node_ids = fetch_node_ids(HttpClient(args.base_url))
+    else:
+        if args.target == "fake":
+            from benchmarks.fake_driver import FakeDriver, FakeGraph
+            fake_graph = FakeGraph()
+            fake_graph.load(graph)
+            app_module = import_app(lambda: FakeDriver(fake_graph))
+        else:
+            os.environ.update(NEO4J_URI=args.neo4j_uri, NEO4J_USER=args.neo4j_user, NEO4J_PASSWORD=args.neo4j_password)
+            if args.load:
+                from neo4j import GraphDatabase
+                with GraphDatabase.driver(args.neo4j_uri, auth=(args.neo4j_user, args.neo4j_password)) as d:
+                    load_into_neo4j(d, graph)
+            app_module = import_app(None)
+        app_module.app.logger.setLevel("WARNING")
+        wait_for_background_services(app_module)
+        make_client = lambda: InProcessClient(app_module.app)
+        if args.target == "neo4j" and not args.load:
+            # 未写入合成数据时，合成图的 ID 与数据库无关，改为读取库中已有的节点
+            node_ids = fetch_node_ids(make_client())
+        else:
+            node_ids = [n["id"] for n in graph["nodes"]]
+
+    if len(node_ids) < 2:
+        parser.error("the target graph needs at least two nodes")
+
+    if args.warmup:
+        run_load(make_client, Recorder(), node_ids, graph["keywords"], args.mix,
+                 args.concurrency, args.warmup, args.seed + 1)
+    recorder = Recorder()
+    with RssSampler(rss_pid, args.rss_interval_ms / 1000) as rss_sampler:
+        wall = run_load(make_client, recorder, node_ids, graph["keywords"], args.mix,
+                        args.concurrency, args.requests, args.seed)
+    summary, routes = summarise(recorder, wall, rss_sampler)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["routes"]
+    print_report(summary, routes, baseline)
+
+    if args.output:
+        commit, dirty = git_revision()
+        config = {k: v for k, v in vars(args).items() if k not in ("neo4j_password", "output", "compare")}
+        result = {
+            "meta": {
+                "commit": commit,
+                "dirty": dirty,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "config": config,
+            },
+            "summary": summary,
+            "routes": routes,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+测试在没有 Neo4j 的环境中运行：导入 app 之前用 benchmarks.fake_driver 的内存假驱动
+替换 GraphDatabase.driver，并关闭所有后台服务。各测试通过 use_graph() 换入自己的图。
+"""
+import os
+from unittest import mock
+
+import pytest
+
+os.environ.setdefault("FRONTEND_PUBLIC_URL", "http://frontend.test")
+os.environ["GRAPH_REPLICA_ENABLED"] = "false"
+os.environ["STATS_ENABLED"] = "false"
+os.environ["SNAPSHOT_ENABLED"] = "false"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.fake_driver import FakeDriver, FakeGraph  # noqa: E402
+
+with mock.patch("neo4j.GraphDatabase.driver", return_value=FakeDriver(FakeGraph())):
+    import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return app_module
+
+
+@pytest.fixture
+def use_graph(monkeypatch):
+    """把 app 的 driver 换成基于给定 FakeGraph 的假驱动，图版本号不缓存、直接读取该图。"""
+    def install(graph):
+        monkeypatch.setattr(app_module, "driver", FakeDriver(graph))
+        monkeypatch.setattr(app_module, "graph_version", app_module.GraphVersion(ttl=0))
+        return graph
+    return install
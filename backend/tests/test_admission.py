@@ -0,0 +1,107 @@
+"""
+准入控制：队列已满时按优先级挤出等待者，初始图谱与快照请求的类别划分。
+"""
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+
+def start_waiter(limiter, priority, outcomes):
+    def run():
+        try:
+            limiter.acquire(priority)
+            outcomes[priority] = "admitted"
+        except Exception as e:
+            outcomes[priority] = getattr(e, "reason", repr(e))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(limiter, depth):
+    deadline = time.time() + 2
+    while len(limiter._waiters) < depth and time.time() < deadline:
+        time.sleep(0.005)
+    assert len(limiter._waiters) == depth
+
+
+def test_full_queue_evicts_worst_waiter_for_better_priority(app):
+    limiter = app.QueryClassLimiter("heavy", concurrency=1, queue_size=1, query_timeout=1, wait_seconds=2)
+    limiter.acquire(0)
+    outcomes = {}
+    low = start_waiter(limiter, 2, outcomes)
+    wait_for_queue(limiter, 1)
+    high = start_waiter(limiter, 0, outcomes)
+    low.join(2)
+    assert outcomes[2] == "queue_full"
+    limiter.release(0.01)
+    high.join(2)
+    assert outcomes[0] == "admitted"
+    assert limiter.snapshot()["evicted_from_queue"] == 1
+
+
+def test_full_queue_rejects_equal_or_worse_priority(app):
+    limiter = app.QueryClassLimiter("heavy", concurrency=1, queue_size=1, query_timeout=1, wait_seconds=2)
+    limiter.acquire(0)
+    outcomes = {}
+    queued = start_waiter(limiter, 1, outcomes)
+    wait_for_queue(limiter, 1)
+    with pytest.raises(app.AdmissionRejected) as rejected:
+        limiter.acquire(1)
+    assert rejected.value.reason == "queue_full"
+    limiter.release(0.01)
+    queued.join(2)
+    assert outcomes[1] == "admitted"
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/api/graph", ("init", 0)),
+    ("/api/graph?init=false", ("heavy", 2)),
+    ("/api/snapshots/init", ("init", 0)),
+    ("/api/snapshots/full", ("heavy", 2)),
+    ("/api/snapshots/unknown", None),
+])
+def test_classify_request(app, path, expected):
+    with app.app.test_request_context(path):
+        assert app.admission.classify_request() == expected
+
+
+def test_snapshot_served_from_file_needs_no_admission(app, monkeypatch):
+    monkeypatch.setattr(app, "snapshot_file", lambda kind, fields: f"{kind}.1.json")
+    with app.app.test_request_context("/api/snapshots/full"):
+        assert app.admission.classify_request() is None
+
+
+def test_snapshot_route_decides_file_or_live_build_once(app, use_graph, monkeypatch):
+    use_graph(FakeGraph())
+    answers = [None, "graph-full.1.json"]
+    calls = []
+
+    def flaky_snapshot_file(kind, fields):
+        # 第二次调用时快照"出现"了：路由必须沿用准入时的决定
+        calls.append(kind)
+        return answers[len(calls) - 1]
+    monkeypatch.setattr(app, "snapshot_file", flaky_snapshot_file)
+    heavy = app.admission.limiters["heavy"]
+    admitted = heavy.admitted
+
+    response = app.app.test_client().get("/api/snapshots/full")
+    assert response.status_code == 200
+    assert calls == ["full"]
+    assert heavy.admitted == admitted + 1
+
+
+def test_live_build_after_pruned_snapshot_takes_a_slot(app, use_graph, monkeypatch, tmp_path):
+    use_graph(FakeGraph())
+    monkeypatch.setattr(app, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "snapshot_file", lambda kind, fields: "graph-init.1.json")
+    init = app.admission.limiters["init"]
+    admitted = init.admitted
+
+    response = app.app.test_client().get("/api/snapshots/init")
+    assert response.status_code == 200
+    assert init.admitted == admitted + 1
+    assert init.active == 0
@@ -0,0 +1,49 @@
+"""
+图版本号保存在 Neo4j 中：写事务递增、多个进程共享、带外修改被发现时递增，
+GraphMeta 节点对客户端不可见。
+"""
+from benchmarks.fake_driver import FakeGraph
+
+
+def test_writes_bump_shared_version(app, use_graph):
+    graph = use_graph(FakeGraph())
+    client = app.app.test_client()
+    before = client.get("/api/graph/version").json["version"]
+
+    response = client.post("/api/nodes", json={"label": "Concept", "properties": {"name": "a"}})
+    assert response.status_code == 201
+    after = client.get("/api/graph/version").json["version"]
+    assert after != before
+    assert after == f"{graph.meta[0]}-{graph.meta[1]}"
+
+    # 另一个进程（独立的 GraphVersion）读到同一个版本号，并看到其他进程之后的写入
+    other_process = app.GraphVersion(ttl=0)
+    assert other_process.current == after
+    client.post("/api/nodes", json={"label": "Concept", "properties": {"name": "b"}})
+    assert other_process.current == f"{graph.meta[0]}-{graph.meta[1]}" != after
+
+
+def test_observe_does_not_go_back_within_epoch(app):
+    version = app.GraphVersion(ttl=60)
+    version.observe("e-5")
+    version.observe("e-4")
+    assert version.current == "e-5"
+    version.observe("f-1")
+    assert version.current == "f-1"
+
+
+def test_out_of_band_change_bumps_version_in_neo4j(app, use_graph):
+    graph = use_graph(FakeGraph())
+    app.record_out_of_band_change("test")
+    first = graph.meta
+    app.record_out_of_band_change("test")
+    assert graph.meta == (first[0], first[1] + 1)
+
+
+def test_graph_meta_is_hidden_and_reserved(app, use_graph):
+    graph = use_graph(FakeGraph())
+    graph.add_node(["Concept"], {"name": "a"})
+    client = app.app.test_client()
+    assert client.get("/api/schema/labels").json == ["Concept"]
+    assert client.get("/api/search?label=GraphMeta&keyword=x").status_code == 400
+    assert client.post("/api/nodes", json={"label": "GraphMeta", "properties": {}}).status_code == 400
@@ -0,0 +1,96 @@
+"""
+后台任务：分批删除枢纽节点的批次与进度、任务状态与吞吐量、同一节点的删除去重与失败状态。
+"""
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+
+def hub_graph(degree):
+    graph = FakeGraph()
+    graph.add_node(["Concept"], {"name": "hub"}, element_id="4:h:hub")
+    for i in range(degree):
+        graph.add_node(["Concept"], {"name": f"leaf{i}"}, element_id=f"4:h:{i}")
+        graph.add_rel("4:h:hub", f"4:h:{i}", "RELATED_TO", {}, element_id=f"5:h:{i}")
+    return graph
+
+
+def wait_until_finished(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.is_finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished
+
+
+@pytest.mark.parametrize("degree, batch_size, relationship_batches", [
+    (25, 10, 3),   # 10, 10, 5：最后一批不足 batch_size 即停止
+    (20, 10, 2),   # 10, 10, 0：空批次不计入进度
+    (0, 10, 0),
+])
+def test_delete_in_batches_stops_on_short_batch(app, use_graph, degree, batch_size, relationship_batches):
+    graph = use_graph(hub_graph(degree))
+    job = app.BackgroundJob("delete_node", {})
+    app.delete_node_in_batches(job, "4:h:hub", batch_size)
+
+    assert "4:h:hub" not in graph.nodes
+    assert not graph.rels
+    # 关系批次之外，节点本身的删除也算一个批次
+    assert job.batches == relationship_batches + 1
+    assert job.total == job.processed == degree + 1
+
+
+def test_job_reports_progress_and_throughput(app):
+    job = app.BackgroundJob("delete_node", {"node_id": "n"})
+    assert job.to_dict()["progress"] is None
+    job.mark_running()
+    job.set_total(20)
+    job.advance(6)
+    job.advance(4)
+    job.mark_finished()
+    job.started_at = job.finished_at - 2.0
+
+    snapshot = job.to_dict()
+    assert snapshot["status"] == "succeeded"
+    assert (snapshot["processed"], snapshot["batches"], snapshot["progress"]) == (10, 2, 0.5)
+    assert snapshot["elapsed_seconds"] == 2.0
+    assert snapshot["throughput_per_second"] == 5.0
+
+
+def test_second_delete_returns_running_job(app, use_graph, monkeypatch):
+    graph = use_graph(hub_graph(3))
+    release = threading.Event()
+    real_delete = app.delete_node_in_batches
+
+    def slow_delete(job, **params):
+        release.wait(5)
+        real_delete(job, **params)
+    monkeypatch.setattr(app, "delete_node_in_batches", slow_delete)
+
+    client = app.app.test_client()
+    first = client.delete("/api/nodes/4:h:hub?async=true")
+    second = client.delete("/api/nodes/4:h:hub")
+    assert first.status_code == second.status_code == 202
+    assert first.json["job_id"] == second.json["job_id"]
+    assert second.headers["Location"] == f"/api/jobs/{first.json['job_id']}"
+
+    release.set()
+    job = app.job_runner.get(first.json["job_id"])
+    wait_until_finished(job)
+    assert client.get(first.json["status_url"]).json["status"] == "succeeded"
+    assert "4:h:hub" not in graph.nodes
+    assert app.job_runner.active(("delete_node", "4:h:hub")) is None
+
+
+def test_failing_job_is_marked_failed(app, use_graph):
+    use_graph(FakeGraph())
+    job, created = app.job_runner.submit("delete_node", app.delete_node_in_batches, key=("delete_node", "4:x:missing"),
+                                         node_id="4:x:missing", batch_size=10)
+    assert created
+    wait_until_finished(job)
+    status = app.app.test_client().get(f"/api/jobs/{job.id}").json
+    assert status["status"] == "failed"
+    assert "not found" in status["error"]
+    assert app.job_runner.active(("delete_node", "4:x:missing")) is None
@@ -0,0 +1,28 @@
+"""
+非阻塞日志管线：入队的记录不受调用方之后修改参数的影响，werkzeug 访问日志不再同步输出。
+"""
+import logging
+
+
+def test_prepare_captures_mutable_args(app):
+    payload, names = {"status": "queued"}, ["a"]
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "job %s for %s", (payload, names), None)
+    queued = app.log_queue_handler.prepare(record)
+    payload["status"] = "done"
+    names.append("b")
+    assert queued.getMessage() == "job {'status': 'queued'} for ['a']"
+
+
+def test_prepare_captures_request_timings(app):
+    timings = {"db": 1.0}
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "request", None, None)
+    record.timings = timings
+    queued = app.log_queue_handler.prepare(record)
+    timings["db"] = 5.0
+    assert queued.timings == {"db": 1.0}
+
+
+def test_werkzeug_access_log_goes_through_queue(app):
+    werkzeug_logger = logging.getLogger("werkzeug")
+    assert app.log_queue_handler in werkzeug_logger.handlers
+    assert not werkzeug_logger.isEnabledFor(logging.INFO)
@@ -0,0 +1,196 @@
+"""
+路径查找（_bidirectional_shortest_path / find_k_shortest_paths）与暴力搜索的对照测试，
+分别使用 Neo4j 数据源（经假驱动）和内存图副本数据源。
+"""
+import random
+from collections import deque
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+REL_TYPES = ["RELATED_TO", "PREREQUISITE_OF", "part_of"]
+
+
+def random_graph(seed, nodes=24, edges=40):
+    rng = random.Random(seed)
+    graph = FakeGraph()
+    node_ids = [f"4:t:{i}" for i in range(nodes)]
+    for node_id in node_ids:
+        graph.add_node(["Concept"], {"name": node_id}, element_id=node_id)
+    for i in range(edges):
+        # 允许平行边与自环
+        graph.add_rel(rng.choice(node_ids), rng.choice(node_ids), rng.choice(REL_TYPES), {},
+                      element_id=f"5:t:{i}")
+    return graph, node_ids
+
+
+def undirected_adjacency(graph, rel_types=None):
+    adjacency = {node_id: [] for node_id in graph.nodes}
+    for rel_id, (source, target, rel_type, _) in graph.rels.items():
+        if rel_types and rel_type not in rel_types:
+            continue
+        adjacency[source].append((rel_id, target))
+        if source != target:
+            adjacency[target].append((rel_id, source))
+    return adjacency
+
+
+def bfs_distance(adjacency, source, target):
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            return distances[node]
+        for _, neighbour in adjacency[node]:
+            if neighbour not in distances:
+                distances[neighbour] = distances[node] + 1
+                queue.append(neighbour)
+    return None
+
+
+def simple_path_lengths(adjacency, source, target, max_depth):
+    """枚举 source 到 target 所有不超过 max_depth 跳的无环路径（按关系序列区分）的长度。"""
+    lengths = []
+
+    def dfs(node, visited, depth):
+        if node == target:
+            lengths.append(depth)
+            return
+        if depth == max_depth:
+            return
+        for _, neighbour in adjacency[node]:
+            if neighbour not in visited:
+                visited.add(neighbour)
+                dfs(neighbour, visited, depth + 1)
+                visited.discard(neighbour)
+
+    dfs(source, {source}, 0)
+    return sorted(lengths)
+
+
+def assert_valid_path(graph, path, source, target, rel_types=None):
+    node_ids, rel_ids = path
+    assert node_ids[0] == source and node_ids[-1] == target
+    assert len(node_ids) == len(rel_ids) + 1
+    assert len(set(node_ids)) == len(node_ids), "path must be loopless"
+    for i, rel_id in enumerate(rel_ids):
+        rel_source, rel_target, rel_type, _ = graph.rels[rel_id]
+        assert {rel_source, rel_target} == {node_ids[i], node_ids[i + 1]}
+        if rel_types:
+            assert rel_type in rel_types
+
+
+@pytest.fixture(params=["neo4j", "replica"])
+def path_source(request, app, use_graph):
+    """返回 make(graph, rel_types) -> 路径数据源。"""
+    def make(graph, rel_types=None):
+        use_graph(graph)
+        if request.param == "neo4j":
+            return app._Neo4jPathSource(rel_types)
+        replica = app.GraphReplica()
+        replica.load()
+        return app._ReplicaPathSource(replica, rel_types)
+    return make
+
+
+def unlimited_budget(app):
+    return app._SearchBudget(max_expanded_nodes=10 ** 9, time_limit_ms=10 ** 7)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_shortest_path_matches_bfs(app, path_source, seed):
+    graph, node_ids = random_graph(seed)
+    source = path_source(graph)
+    adjacency = undirected_adjacency(graph)
+    rng = random.Random(seed)
+    for _ in range(20):
+        start, end = rng.choice(node_ids), rng.choice(node_ids)
+        expected = bfs_distance(adjacency, start, end)
+        path = app._bidirectional_shortest_path(start, end, app._AdjacencyCache(source), 30, unlimited_budget(app))
+        if expected is None:
+            assert path is None
+        else:
+            assert path is not None
+            assert_valid_path(graph, path, start, end)
+            assert len(path[1]) == expected
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_shortest_path_respects_max_depth(app, path_source, seed):
+    graph, node_ids = random_graph(seed)
+    source = path_source(graph)
+    adjacency = undirected_adjacency(graph)
+    rng = random.Random(seed)
+    for _ in range(20):
+        start, end = rng.choice(node_ids), rng.choice(node_ids)
+        expected = bfs_distance(adjacency, start, end)
+        path = app._bidirectional_shortest_path(start, end, app._AdjacencyCache(source), 2, unlimited_budget(app))
+        if expected is None or expected > 2:
+            assert path is None
+        else:
+            assert len(path[1]) == expected
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_k_shortest_paths_match_enumeration(app, path_source, seed):
+    graph, node_ids = random_graph(seed, nodes=14, edges=24)
+    source = path_source(graph)
+    adjacency = undirected_adjacency(graph)
+    rng = random.Random(seed)
+    max_depth, k = 5, 4
+    for _ in range(15):
+        start, end = rng.sample(node_ids, 2)
+        expected = simple_path_lengths(adjacency, start, end, max_depth)[:k]
+        paths = app.find_k_shortest_paths(start, end, app._AdjacencyCache(source), max_depth, k,
+                                          unlimited_budget(app))
+        assert [len(rels) for _, rels in paths] == expected
+        assert len({tuple(rels) for _, rels in paths}) == len(paths), "paths must be distinct"
+        for path in paths:
+            assert_valid_path(graph, path, start, end)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_rel_type_filter_is_case_sensitive(app, path_source, seed):
+    graph, node_ids = random_graph(seed)
+    rel_types = frozenset({"part_of"})
+    source = path_source(graph, rel_types)
+    adjacency = undirected_adjacency(graph, rel_types)
+    rng = random.Random(seed)
+    for _ in range(20):
+        start, end = rng.choice(node_ids), rng.choice(node_ids)
+        expected = bfs_distance(adjacency, start, end)
+        path = app._bidirectional_shortest_path(start, end, app._AdjacencyCache(source), 30, unlimited_budget(app))
+        if expected is None:
+            assert path is None
+        else:
+            assert_valid_path(graph, path, start, end, rel_types)
+            assert len(path[1]) == expected
+
+
+def test_budget_truncates_search(app, use_graph):
+    graph = FakeGraph()
+    for i in range(50):
+        graph.add_node(["Concept"], {}, element_id=f"4:c:{i}")
+    for i in range(49):
+        graph.add_rel(f"4:c:{i}", f"4:c:{i + 1}", "NEXT", {}, element_id=f"5:c:{i}")
+    use_graph(graph)
+    budget = app._SearchBudget(max_expanded_nodes=5, time_limit_ms=10 ** 7)
+    path = app._bidirectional_shortest_path("4:c:0", "4:c:49", app._AdjacencyCache(app._Neo4jPathSource(None)),
+                                            60, budget)
+    assert path is None
+    assert budget.exhausted
+
+
+def test_path_route_filters_lowercase_rel_types(app, use_graph):
+    graph = FakeGraph()
+    for name in ("a", "b", "c"):
+        graph.add_node(["Concept"], {"name": name}, element_id=f"4:r:{name}")
+    graph.add_rel("4:r:a", "4:r:c", "RELATED_TO", {}, element_id="5:r:1")
+    graph.add_rel("4:r:a", "4:r:b", "part_of", {}, element_id="5:r:2")
+    graph.add_rel("4:r:b", "4:r:c", "part_of", {}, element_id="5:r:3")
+    use_graph(graph)
+    response = app.app.test_client().get("/api/path?from=4:r:a&to=4:r:c&rel_types=part_of")
+    assert response.status_code == 200
+    assert response.json["paths"][0]["edge_ids"] == ["5:r:2", "5:r:3"]
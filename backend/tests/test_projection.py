@@ -0,0 +1,109 @@
+"""
+字段投影（fields=summary）与按需加载节点详情的接口。
+"""
+import copy
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+LONG_TEXT = "x" * 2000
+
+
+def detail_graph():
+    graph = FakeGraph()
+    graph.add_node(["Concept"], {"name": "a", "init": 1, "description": LONG_TEXT}, element_id="4:p:a")
+    graph.add_node(["Concept"], {"title": "b", "description": LONG_TEXT}, element_id="4:p:b")
+    graph.add_node(["Topic"], {"name": "c", "level": 3}, element_id="4:p:c")
+    graph.add_rel("4:p:a", "4:p:b", "RELATED_TO", {"weight": 2}, element_id="5:p:1")
+    graph.add_rel("4:p:b", "4:p:c", "PART_OF", {}, element_id="5:p:2")
+    return graph
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", None),
+    ("?fields=all", None),
+    ("?fields=summary", "summary"),
+    ("?fields=name,%20level,,", ("name", "level")),
+])
+def test_requested_node_fields(app, query, expected):
+    with app.app.test_request_context("/api/graph" + query):
+        fields = app.requested_node_fields()
+    assert fields == (app.NODE_SUMMARY_FIELDS if expected == "summary" else expected)
+
+
+def test_projection_keeps_id_labels_and_edges(app):
+    payload = {
+        "nodes": [{"data": {"id": "n1", "labels": ["Concept"], "name": "a", "description": LONG_TEXT}},
+                  {"data": {"id": "n2", "labels": [], "level": 1}}],
+        "edges": [{"data": {"id": "r1", "source": "n1", "target": "n2", "label": "RELATED_TO", "weight": 2}}],
+        "found": True,
+    }
+    original = copy.deepcopy(payload)
+    projected = app.project_graph_payload(payload, ("name",))
+
+    assert projected["nodes"] == [{"data": {"id": "n1", "labels": ["Concept"], "name": "a"}},
+                                  {"data": {"id": "n2", "labels": []}}]
+    assert projected["edges"] is payload["edges"]
+    assert projected["found"] is True
+    assert payload == original
+    assert app.project_graph_payload(payload, None) is payload
+
+
+def test_replica_payload_is_not_mutated(app, use_graph, monkeypatch):
+    use_graph(detail_graph())
+    replica = app.GraphReplica()
+    replica.load()
+    monkeypatch.setattr(app, "graph_replica", replica)
+    client = app.app.test_client()
+
+    summary = client.get("/api/graph?init=false&fields=summary").json
+    assert all("description" not in node["data"] for node in summary["nodes"])
+    full = client.get("/api/graph?init=false").json
+    assert {node["data"]["id"]: node["data"].get("description") for node in full["nodes"]}["4:p:a"] == LONG_TEXT
+
+
+def test_cached_path_payload_is_not_mutated(app, use_graph):
+    use_graph(detail_graph())
+    client = app.app.test_client()
+    url = "/api/path?from=4:p:a&to=4:p:c"
+    full = client.get(url).json
+    summary = client.get(url + "&fields=summary").json  # 命中路径缓存
+    again = client.get(url).json
+    assert "description" in full["nodes"][0]["data"]
+    assert all("description" not in node["data"] for node in summary["nodes"])
+    assert again == full
+
+
+def test_node_detail_returns_all_properties(app, use_graph):
+    use_graph(detail_graph())
+    client = app.app.test_client()
+    response = client.get("/api/nodes/4:p:a")
+    assert response.status_code == 200
+    assert response.json["data"]["description"] == LONG_TEXT
+    assert client.get("/api/nodes/4:p:missing").status_code == 404
+
+
+def test_node_details_batch_reports_missing(app, use_graph):
+    use_graph(detail_graph())
+    response = app.app.test_client().post("/api/nodes/details", json={"ids": ["4:p:a", "4:p:zz", "4:p:c", "4:p:a"]})
+    assert response.status_code == 200
+    assert sorted(node["data"]["id"] for node in response.json["nodes"]) == ["4:p:a", "4:p:c"]
+    assert response.json["missing"] == ["4:p:zz"]
+
+
+def test_node_details_batch_validation(app, use_graph, monkeypatch):
+    use_graph(detail_graph())
+    monkeypatch.setattr(app, "NODE_DETAIL_BATCH_LIMIT", 2)
+    client = app.app.test_client()
+    assert client.post("/api/nodes/details", json={"ids": ["4:p:a", "4:p:b", "4:p:c"]}).status_code == 400
+    assert client.post("/api/nodes/details", json={"ids": "4:p:a"}).status_code == 400
+    # 重复的 ID 只计一次
+    assert client.post("/api/nodes/details", json={"ids": ["4:p:a", "4:p:a", "4:p:b"]}).status_code == 200
+
+
+def test_get_on_details_does_not_hit_node_detail(app, use_graph):
+    use_graph(detail_graph())
+    response = app.app.test_client().get("/api/nodes/details")
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "POST"
@@ -0,0 +1,30 @@
+"""
+Cypher 查询层：按客户端提供的标签生成的语句与查询统计记录的语句文本都有上限。
+"""
+import pytest
+
+
+def test_templated_statements_are_bounded(app, monkeypatch):
+    monkeypatch.setattr(app, "CYPHER_STATEMENT_CACHE_SIZE", 3)
+    monkeypatch.setattr(app, "_templated_statements", app.OrderedDict())
+    first = app.cypher_statement("search_nodes", "Label0")
+    for i in range(1, 10):
+        app.cypher_statement("search_nodes", f"Label{i}")
+    assert len(app._templated_statements) == 3
+    assert app.cypher_statement("search_nodes", "Label0") == first
+
+
+def test_templated_statements_reject_invalid_labels(app):
+    with pytest.raises(ValueError):
+        app.cypher_statement("search_nodes", "Concept) DETACH DELETE (n")
+
+
+def test_query_metrics_reuse_rate_and_bound(app):
+    metrics = app.QueryMetrics(max_texts=2)
+    for text in ["a", "a", "b", "a", "c", "b"]:
+        metrics.record("search_nodes", text, 1.0, 0.5, 0.5)
+    snapshot = metrics.snapshot()
+    # a(首次) a b(首次) a c(首次，淘汰 b) b(再次首次)
+    assert snapshot["statements"]["search_nodes"]["first_seen_executions"] == 4
+    assert snapshot["statement_reuse_rate"] == round(2 / 6, 4)
+    assert snapshot["distinct_statement_texts"] == 2
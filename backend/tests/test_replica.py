@@ -0,0 +1,163 @@
+"""
+内存图副本的增量写入与压缩：随机写操作序列同时作用于假驱动的图和副本，
+副本内容与邻接关系必须始终等于从图重新全量加载的结果。
+"""
+import random
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+REL_TYPES = ["RELATED_TO", "PART_OF", "part_of"]
+
+
+def seed_graph(rng, nodes=20, edges=30):
+    graph = FakeGraph()
+    for i in range(nodes):
+        graph.add_node([rng.choice(["Concept", "Topic"])], {"name": f"n{i}"}, element_id=f"4:s:{i}")
+    node_ids = list(graph.nodes)
+    for i in range(edges):
+        graph.add_rel(rng.choice(node_ids), rng.choice(node_ids), rng.choice(REL_TYPES), {"w": i},
+                      element_id=f"5:s:{i}")
+    return graph
+
+
+def random_change(rng, graph, counter):
+    """在 graph 上执行一个随机写操作，返回对应的 record_graph_change 参数。"""
+    node_ids = list(graph.nodes)
+    roll = rng.random()
+    if roll < 0.2 or len(node_ids) < 2:
+        node_id = f"4:s:new{counter}"
+        labels, props = [rng.choice(["Concept", "Topic"])], {"name": f"new{counter}"}
+        graph.add_node(labels, props, element_id=node_id)
+        return {"op": "node_upsert", "id": node_id, "labels": labels, "properties": props}
+    if roll < 0.35:
+        node_id = rng.choice(node_ids)
+        labels, props = ["Topic"], {"name": f"renamed{counter}", "level": counter}
+        graph.nodes[node_id] = (tuple(labels), dict(props))
+        return {"op": "node_upsert", "id": node_id, "labels": labels, "properties": props}
+    if roll < 0.45:
+        node_id = rng.choice(node_ids)
+        graph.delete_node(node_id)
+        return {"op": "node_delete", "id": node_id}
+    if roll < 0.75 or not graph.rels:
+        source, target = rng.choice(node_ids), rng.choice(node_ids)
+        rel_id, rel_type = f"5:s:new{counter}", rng.choice(REL_TYPES)
+        graph.add_rel(source, target, rel_type, {"w": counter}, element_id=rel_id)
+        return {"op": "relationship_upsert", "id": rel_id, "source": source, "target": target,
+                "type": rel_type, "properties": {"w": counter}}
+    if roll < 0.85:
+        rel_id = rng.choice(list(graph.rels))
+        source, target, rel_type, _ = graph.rels[rel_id]
+        graph.rels[rel_id] = (source, target, rel_type, {"w": -counter})
+        return {"op": "relationship_upsert", "id": rel_id, "source": source, "target": target,
+                "type": rel_type, "properties": {"w": -counter}}
+    rel_id = rng.choice(list(graph.rels))
+    graph.delete_rel(rel_id)
+    return {"op": "relationship_delete", "id": rel_id}
+
+
+def fresh_replica(app):
+    replica = app.GraphReplica()
+    replica.load()
+    return replica
+
+
+def sorted_adjacency(replica, node_ids):
+    return {node_id: sorted(pairs) for node_id, pairs in replica.adjacency(node_ids).items()}
+
+
+@pytest.mark.parametrize("compact_threshold", [3, 10, 10 ** 6])
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_changes_match_full_reload(app, use_graph, seed, compact_threshold):
+    rng = random.Random(seed)
+    graph = use_graph(seed_graph(rng))
+    replica = app.GraphReplica(compact_threshold=compact_threshold)
+    replica.load()
+
+    for counter in range(120):
+        replica.apply(random_change(rng, graph, counter))
+        if counter % 10 == 9:
+            expected = fresh_replica(app)
+            assert replica._state.content() == expected._state.content()
+            node_ids = list(graph.nodes)
+            assert sorted_adjacency(replica, node_ids) == sorted_adjacency(expected, node_ids)
+            for node_id in rng.sample(node_ids, min(5, len(node_ids))):
+                got, want = replica.expand_payload(node_id), expected.expand_payload(node_id)
+                assert sorted(e["data"]["id"] for e in got["edges"]) == sorted(e["data"]["id"] for e in want["edges"])
+    if compact_threshold <= 10:
+        assert replica._state.delta_count < compact_threshold
+
+
+def test_reload_detects_out_of_band_change(app, use_graph, monkeypatch):
+    graph = use_graph(seed_graph(random.Random(1)))
+    replica = fresh_replica(app)
+    detected = []
+    monkeypatch.setattr(app, "record_out_of_band_change", detected.append)
+
+    replica.load()
+    assert detected == []
+
+    graph.nodes["4:s:3"] = (("Concept",), {"name": "edited in Neo4j Browser"})
+    replica.load()
+    assert detected == ["replica reconcile"]
+
+
+def peer_write(graph, node_id, name):
+    """模拟另一个进程经 API 的写入：修改数据并递增 Neo4j 中的图版本号，本进程的副本不会收到变更。"""
+    graph.add_node(["Concept"], {"name": name}, element_id=node_id)
+    epoch, version = graph.meta
+    graph.meta = (epoch, version + 1)
+
+
+def test_stale_replica_is_bypassed_until_reloaded(app, use_graph, monkeypatch):
+    graph = use_graph(seed_graph(random.Random(2)))
+    app.graph_version.bump()
+    replica = fresh_replica(app)
+    detected = []
+    monkeypatch.setattr(app, "record_out_of_band_change", detected.append)
+    assert replica.ready
+
+    peer_write(graph, "4:s:peer", "written by another worker")
+    assert not replica.ready
+    assert replica._reload_requested.is_set()
+
+    replica.load()
+    assert replica.ready
+    assert replica.version == app.graph_version.current
+    assert "4:s:peer" in replica._state.content()[0]
+    # 其他进程的写入已经递增过版本号，不是带外修改
+    assert detected == []
+
+
+def test_own_writes_keep_replica_current(app, use_graph, monkeypatch):
+    use_graph(seed_graph(random.Random(3)))
+    replica = fresh_replica(app)
+    monkeypatch.setattr(app, "GRAPH_REPLICA_ENABLED", True)
+    monkeypatch.setattr(app, "graph_replica", replica)
+    client = app.app.test_client()
+
+    for i in range(3):
+        response = client.post("/api/nodes", json={"label": "Concept", "properties": {"name": f"own{i}"}})
+        assert response.status_code == 201
+    assert replica.ready
+    assert replica.version == app.graph_version.current
+
+    app.record_out_of_band_change("test")
+    assert replica.ready
+
+
+def test_version_tracker_waits_for_missing_versions(app):
+    tracker = app.VersionTracker()
+    tracker.reset("e-1")
+    tracker.advance("e-3")
+    assert tracker.version == "e-1"
+    assert not tracker.covers("e-3")
+    tracker.advance("e-2")
+    assert tracker.version == "e-3"
+    assert tracker.covers("e-2")
+    assert not tracker.covers("f-1")
+    tracker.reset("0")
+    assert tracker.covers("0")
+    tracker.advance("g-1")
+    assert tracker.version == "g-1"
@@ -0,0 +1,131 @@
+"""
+学生视图快照：文件写出与清理、按 Accept-Encoding 发送预压缩文件、文件消失时回退为实时构建。
+"""
+import gzip
+import json
+import os
+import threading
+
+import pytest
+
+from benchmarks.fake_driver import FakeGraph
+
+
+@pytest.fixture
+def snapshots(app, use_graph, monkeypatch, tmp_path):
+    """启用快照并换入临时目录中的 SnapshotWriter，返回 (writer, graph)。"""
+    graph = use_graph(FakeGraph())
+    graph.add_node(["Concept"], {"name": "a", "init": 1, "description": "long text"}, element_id="4:s:a")
+    graph.add_node(["Concept"], {"name": "b"}, element_id="4:s:b")
+    graph.add_rel("4:s:a", "4:s:b", "RELATED_TO", {}, element_id="5:s:1")
+    writer = app.SnapshotWriter(str(tmp_path), debounce_seconds=0, keep_versions=2)
+    monkeypatch.setattr(app, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(app, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "snapshot_writer", writer)
+    monkeypatch.setattr(app, "graph_version", app.GraphVersion(ttl=0))
+    return writer, graph
+
+
+def test_write_now_writes_plain_gzip_and_summary_variants(app, snapshots, tmp_path):
+    writer, _ = snapshots
+    app.graph_version.bump()
+    writer.write_now()
+    version = app.graph_version.current
+
+    assert set(writer.current) == {"init", "init-summary", "full", "full-summary"}
+    for variant, filename in writer.current.items():
+        assert filename == f"graph-{variant}.{version}.json"
+        plain = (tmp_path / filename).read_bytes()
+        assert gzip.decompress((tmp_path / (filename + ".gz")).read_bytes()) == plain
+    full = json.loads((tmp_path / writer.current["full"]).read_text())
+    summary = json.loads((tmp_path / writer.current["full-summary"]).read_text())
+    assert {n["data"]["id"] for n in full["nodes"]} == {"4:s:a", "4:s:b"}
+    assert any("description" in n["data"] for n in full["nodes"])
+    assert all("description" not in n["data"] for n in summary["nodes"])
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_prune_keeps_recent_versions(app, snapshots, tmp_path):
+    writer, _ = snapshots
+    versions = []
+    for i in range(4):
+        app.graph_version.bump()
+        writer.write_now()
+        versions.append(app.graph_version.current)
+        # 给刚写出的版本一个确定的、递增的 mtime，清理按 mtime 判断新旧
+        for name in os.listdir(tmp_path):
+            if f".{versions[-1]}." in name:
+                os.utime(tmp_path / name, (1000 + i, 1000 + i))
+    remaining = {name.split(".")[1] for name in os.listdir(tmp_path)}
+    assert remaining == set(versions[-2:])
+
+
+def test_concurrent_writers_never_publish_partial_files(app, snapshots, tmp_path):
+    writer, _ = snapshots
+    other = app.SnapshotWriter(str(tmp_path), debounce_seconds=0, keep_versions=2)
+    payloads = [bytes([65 + i]) * 200_000 for i in range(2)]
+    failures = []
+
+    def write(target, data):
+        for _ in range(20):
+            target._write_atomic("graph-full.v.json", data)
+
+    def read():
+        for _ in range(200):
+            path = tmp_path / "graph-full.v.json"
+            if path.exists() and path.read_bytes() not in payloads:
+                failures.append(True)
+
+    threads = [threading.Thread(target=write, args=(w, d)) for w, d in zip((writer, other), payloads)]
+    threads.append(threading.Thread(target=read))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not failures
+    assert (tmp_path / "graph-full.v.json").read_bytes() in payloads
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_route_serves_gzip_or_plain_file(app, snapshots, tmp_path):
+    writer, _ = snapshots
+    writer.write_now()
+    client = app.app.test_client()
+
+    compressed = client.get("/api/snapshots/full", headers={"Accept-Encoding": "gzip, deflate"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert compressed.headers["X-Graph-Version"] == app.graph_version.current
+    body = json.loads(gzip.decompress(compressed.data))
+
+    plain = client.get("/api/snapshots/full")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.json == body
+
+    revalidated = client.get("/api/snapshots/full", headers={"If-None-Match": plain.headers["ETag"].strip('"')})
+    assert revalidated.status_code == 304
+
+    summary = client.get("/api/snapshots/init?fields=summary").json
+    assert all("description" not in n["data"] for n in summary["nodes"])
+
+
+def test_route_builds_live_when_snapshot_is_stale_or_missing(app, snapshots, tmp_path):
+    writer, graph = snapshots
+    writer.write_now()
+    client = app.app.test_client()
+    expected = client.get("/api/graph?init=false").json
+
+    # 另一个工作进程清理掉了本进程 current 指向的文件
+    for name in os.listdir(tmp_path):
+        os.remove(tmp_path / name)
+    response = client.get("/api/snapshots/full")
+    assert response.status_code == 200
+    assert "X-Graph-Version" not in response.headers
+    assert response.json == expected
+
+    # 写入之后、新快照生成之前，旧快照不再被发送
+    writer.write_now()
+    client.post("/api/nodes", json={"label": "Concept", "properties": {"name": "c"}})
+    fresh = client.get("/api/snapshots/full")
+    assert "X-Graph-Version" not in fresh.headers
+    assert len(fresh.json["nodes"]) == 3
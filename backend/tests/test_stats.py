@@ -0,0 +1,102 @@
+"""
+图统计的增量维护：随机写操作序列后，度数分组、孤立节点与枢纽节点必须等于重新计数的结果，
+带外修改应在 recount() 时被发现。
+"""
+import random
+
+import pytest
+
+from tests.test_replica import random_change, seed_graph
+
+
+def fresh_stats(app):
+    stats = app.GraphStats()
+    stats.recount()
+    return stats
+
+
+def degree_groups(stats):
+    return {degree: set(group) for degree, group in stats.nodes_by_degree.items()}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_stats_match_recount(app, use_graph, seed):
+    rng = random.Random(seed)
+    graph = use_graph(seed_graph(rng))
+    stats = fresh_stats(app)
+
+    for counter in range(120):
+        stats.apply(random_change(rng, graph, counter))
+        if counter % 10 == 9:
+            expected = fresh_stats(app)
+            assert degree_groups(stats) == degree_groups(expected)
+            assert set(stats.orphans) == set(expected.orphans)
+            got, want = stats.snapshot(5, 1000), expected.snapshot(5, 1000)
+            assert got["degree_distribution"] == want["degree_distribution"]
+            assert got["orphan_count"] == want["orphan_count"]
+            assert sorted(hub["degree"] for hub in got["top_hubs"]) == sorted(hub["degree"] for hub in want["top_hubs"])
+
+
+def test_snapshot_limits_hubs_and_orphans(app, use_graph):
+    graph = use_graph(seed_graph(random.Random(2), nodes=40, edges=10))
+    snapshot = fresh_stats(app).snapshot(3, 2)
+    assert len(snapshot["top_hubs"]) == 3
+    assert len(snapshot["orphans"]) == 2
+    degrees = [hub["degree"] for hub in snapshot["top_hubs"]]
+    assert degrees == sorted(degrees, reverse=True)
+    assert snapshot["orphan_count"] == sum(1 for node_id in graph.nodes
+                                           if not any(node_id in rel[:2] for rel in graph.rels.values()))
+
+
+def test_recount_detects_out_of_band_change(app, use_graph, monkeypatch):
+    graph = use_graph(seed_graph(random.Random(1)))
+    stats = fresh_stats(app)
+    detected = []
+    monkeypatch.setattr(app, "record_out_of_band_change", detected.append)
+
+    stats.recount()
+    assert detected == []
+
+    graph.nodes["4:s:3"] = (("Topic",), {"name": "edited in Neo4j Browser"})
+    stats.recount()
+    assert detected == ["stats recount"]
+
+
+@pytest.mark.parametrize("name", ["", 0, False])
+def test_falsy_name_is_not_drift(app, use_graph, monkeypatch, name):
+    graph = use_graph(seed_graph(random.Random(4)))
+    stats = fresh_stats(app)
+    detected = []
+    monkeypatch.setattr(app, "record_out_of_band_change", detected.append)
+
+    # coalesce(n.name, n.title) 只跳过 null
+    props = {"name": name, "title": "fallback"}
+    graph.add_node(["Concept"], props, element_id="4:s:falsy")
+    stats.apply({"op": "node_upsert", "id": "4:s:falsy", "labels": ["Concept"], "properties": props})
+    assert stats.node_names["4:s:falsy"] == name
+
+    stats.recount()
+    assert detected == []
+
+
+def test_peer_writes_are_not_drift(app, use_graph, monkeypatch):
+    graph = use_graph(seed_graph(random.Random(5)))
+    app.graph_version.bump()
+    stats = fresh_stats(app)
+    detected = []
+    monkeypatch.setattr(app, "record_out_of_band_change", detected.append)
+    assert stats.ready
+
+    # 另一个进程经 API 写入：数据与版本号一起变化，本进程的统计没有收到变更
+    graph.add_node(["Concept"], {"name": "written by another worker"}, element_id="4:s:peer")
+    epoch, version = graph.meta
+    graph.meta = (epoch, version + 1)
+    assert not stats.ready
+    assert stats.degree_of("4:s:0") is None
+    assert stats._recount_requested.is_set()
+
+    stats.recount()
+    assert detected == []
+    assert stats.ready
+    assert stats.snapshot(1, 1)["graph_version"] == app.graph_version.current
+    assert stats.degree_of("4:s:peer") == 0
@@ -23,37 +23,154 @@ async function request(endpoint, method = 'GET', body = null) {
   return response.json()
 }
 
+// --- 本地缓存 ---
+// 图谱、搜索、展开结果按后端图版本号缓存在 IndexedDB 中，跨会话保留。
+// 每次读取前先请求 /graph/version（很小，且支持 304），版本未变时直接使用本地数据；
+// 版本变化时清空整个缓存。浏览器不支持 IndexedDB（如部分隐私模式）时退化为直接请求。
+const CACHE_DB_NAME = 'kg-lti-cache'
+const CACHE_STORE = 'responses'
+const CACHE_VERSION_KEY = '__graph_version__'
+// 短时间内的多次读取（例如连续展开节点）共用一次版本检查
+const VERSION_CHECK_INTERVAL_MS = 5000
+
+let cacheDbPromise = null
+let versionCheck = null
+let syncedVersion = null
+
+function openCacheDb() {
+  if (!cacheDbPromise) {
+    cacheDbPromise = new Promise((resolve) => {
+      if (typeof indexedDB === 'undefined') return resolve(null)
+      const req = indexedDB.open(CACHE_DB_NAME, 1)
+      req.onupgradeneeded = () => req.result.createObjectStore(CACHE_STORE)
+      req.onsuccess = () => resolve(req.result)
+      req.onerror = () => resolve(null)
+      req.onblocked = () => resolve(null)
+    })
+  }
+  return cacheDbPromise
+}
+
+function idbRequest(db, mode, operation) {
+  return new Promise((resolve, reject) => {
+    const req = operation(db.transaction(CACHE_STORE, mode).objectStore(CACHE_STORE))
+    req.onsuccess = () => resolve(req.result)
+    req.onerror = () => reject(req.error)
+  })
+}
+
+export function getGraphVersion() {
+  const now = Date.now()
+  if (!versionCheck || now - versionCheck.at > VERSION_CHECK_INTERVAL_MS) {
+    const promise = request('/graph/version').then((result) => result.version)
+    versionCheck = { promise, at: now }
+    promise.catch(() => {
+      if (versionCheck && versionCheck.promise === promise) versionCheck = null
+    })
+  }
+  return versionCheck.promise
+}
+
+// 版本号与本地缓存记录的不一致时清空缓存
+async function syncCacheVersion(db, version) {
+  if (syncedVersion === version) return
+  const stored = await idbRequest(db, 'readonly', (store) => store.get(CACHE_VERSION_KEY))
+  if (stored !== version) {
+    await idbRequest(db, 'readwrite', (store) => store.clear())
+    await idbRequest(db, 'readwrite', (store) => store.put(version, CACHE_VERSION_KEY))
+  }
+  syncedVersion = version
+}
+
+async function cachedRequest(endpoint) {
+  let version
+  let db
+  try {
+    version = await getGraphVersion()
+    db = await openCacheDb()
+    if (db) {
+      await syncCacheVersion(db, version)
+      const entry = await idbRequest(db, 'readonly', (store) => store.get(endpoint))
+      if (entry && entry.version === version) return entry.data
+    }
+  } catch (e) {
+    console.warn('Graph cache unavailable, falling back to network:', e)
+    db = null
+  }
+  const data = await request(endpoint)
+  if (db) {
+    idbRequest(db, 'readwrite', (store) => store.put({ version, data }, endpoint)).catch((e) =>
+      console.warn('Failed to store graph cache entry:', e),
+    )
+  }
+  return data
+}
+
+// 写操作会改变图版本，下一次读取必须重新检查版本
+function mutate(endpoint, method, body = null) {
+  return request(endpoint, method, body).finally(() => {
+    versionCheck = null
+  })
+}
+
+// 图接口只请求渲染所需的摘要属性，完整属性在选中节点时通过 getNodeDetails 按需获取
+const SUMMARY = 'fields=summary'
+
 export function getInitialGraph(init=true) {
   if (init) {
-    return request('/graph')
+    return cachedRequest(`/graph?${SUMMARY}`)
   } else {
-    return request('/graph?init=false')
+    return cachedRequest(`/graph?init=false&${SUMMARY}`)
   }
 }
 
+// 学生视图只读，直接读取后端生成的静态快照文件
+export function getGraphSnapshot(init = true) {
+  return cachedRequest(init ? `/snapshots/init?${SUMMARY}` : `/snapshots/full?${SUMMARY}`)
+}
+
 export function getNodeLabels() {
   return request('/schema/labels')
 }
 export function searchSubgraph(label, keyword) {
-  return request(
-    `/search?label=${encodeURIComponent(label)}&keyword=${encodeURIComponent(keyword)}`,
+  return cachedRequest(
+    `/search?label=${encodeURIComponent(label)}&keyword=${encodeURIComponent(keyword)}&${SUMMARY}`,
   )
 }
 export function expandNode(nodeId) {
-  return request(`/expand/${nodeId}`)
+  return cachedRequest(`/expand/${nodeId}?${SUMMARY}`)
+}
+export function getNodeDetails(nodeId) {
+  return cachedRequest(`/nodes/${nodeId}`)
+}
+export function getNodesDetails(nodeIds) {
+  return request('/nodes/details', 'POST', { ids: nodeIds })
 }
 export function addNode(nodePayload) {
-  return request('/nodes', 'POST', nodePayload)
+  return mutate('/nodes', 'POST', nodePayload)
 }
 export function addRelationship(relPayload) {
-  return request('/relationships', 'POST', relPayload)
+  return mutate('/relationships', 'POST', relPayload)
 }
 export function updateNodeProperty(nodeId, properties) {
-  return request(`/nodes/${nodeId}`, 'PUT', { properties })
+  return mutate(`/nodes/${nodeId}`, 'PUT', { properties })
 }
 export function deleteNode(nodeId) {
-  return request(`/nodes/${nodeId}`, 'DELETE')
+  return mutate(`/nodes/${nodeId}`, 'DELETE')
 }
 export function deleteRelationship(relId) {
-  return request(`/relationships/${relId}`, 'DELETE')
+  return mutate(`/relationships/${relId}`, 'DELETE')
+}
+export function getJob(jobId) {
+  return request(`/jobs/${jobId}`)
+}
+export function findPath(fromId, toId, { maxDepth, relTypes, k } = {}) {
+  const params = new URLSearchParams({ from: fromId, to: toId, fields: 'summary' })
+  if (maxDepth) params.set('max_depth', maxDepth)
+  if (relTypes && relTypes.length) params.set('rel_types', relTypes.join(','))
+  if (k) params.set('k', k)
+  return request(`/path?${params.toString()}`)
+}
+export function getGraphStats(top = 10) {
+  return request(`/stats?top=${top}`)
 }